@@ -0,0 +1,150 @@
+"""
+Throughput and peak memory of the `clean_chat_answer` of each adapter on the answers of the corpus, on huge answers
+made by repeating them and, for chatbots collapsing empty lines, on answers full of newlines.
+
+    python -m benchmarks.bench_clean_answer --size-mb 4
+    python -m benchmarks.bench_clean_answer --update-baseline
+
+Results are compared with the stored baseline: a case slower or using more memory than the baseline, beyond the
+tolerance, is reported and the exit status is 1. Throughput depends on the machine, record the baseline on the one
+running the comparison.
+"""
+
+import argparse
+import json
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.corpus import MEGABYTE, blank_lines_answer, load_corpus, repeat_to_size
+from chapito.registry import load_adapter
+
+BASELINE_PATH: Path = Path(__file__).resolve().parent / "baseline_clean_answer.json"
+DEFAULT_SIZE_MB: float = 2
+DEFAULT_REPEAT: int = 3
+DEFAULT_TOLERANCE: float = 0.3
+HUGE_CASE_SOURCE: str = "code"
+
+
+def build_cases(chatbots: List[str], size: int) -> List[Tuple[str, str, str]]:
+    """
+    (chatbot, case, html) of the corpus answers, then of the generated ones.
+    """
+    cases = []
+    for answer in load_corpus():
+        if answer.chatbot not in chatbots:
+            continue
+        cases.append((answer.chatbot, answer.case, answer.html))
+        if answer.case == HUGE_CASE_SOURCE:
+            cases.append((answer.chatbot, "huge", repeat_to_size(answer.html, size)))
+            if load_adapter(answer.chatbot).MARKDOWN_RULES.collapse_newlines:
+                cases.append((answer.chatbot, "blank_lines", blank_lines_answer(answer.html, size)))
+    return cases
+
+
+def measure_throughput(clean: Callable[[str], str], html: str, repeat: int) -> float:
+    """
+    Megabytes of HTML converted per second, on the fastest run.
+    """
+    timer = timeit.Timer(lambda: clean(html))
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    return len(html) / MEGABYTE / best
+
+
+def measure_peak_memory(clean: Callable[[str], str], html: str) -> float:
+    """
+    Memory allocated at the peak of the conversion, per byte of HTML.
+    """
+    tracemalloc.start()
+    try:
+        clean(html)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / len(html)
+
+
+def run(chatbots: List[str], size: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for chatbot, case, html in build_cases(chatbots, size):
+        clean = load_adapter(chatbot).clean_chat_answer
+        results[f"{chatbot}/{case}"] = {
+            "size_bytes": len(html),
+            "mb_per_second": round(measure_throughput(clean, html, repeat), 3),
+            "peak_memory_ratio": round(measure_peak_memory(clean, html), 3),
+        }
+        print(f"{chatbot}/{case}: {results[f'{chatbot}/{case}']}", file=sys.stderr)
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float
+) -> List[str]:
+    """
+    Cases slower, or using more memory, than their baseline beyond `tolerance` (a fraction of the baseline).
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if result["mb_per_second"] < reference["mb_per_second"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['mb_per_second']} MB/s, baseline {reference['mb_per_second']} MB/s")
+        if result["peak_memory_ratio"] > reference["peak_memory_ratio"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak memory {result['peak_memory_ratio']}x the HTML, "
+                f"baseline {reference['peak_memory_ratio']}x"
+            )
+    return regressions
+
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'case':<26} {'size':>10} {'MB/s':>9} {'baseline':>9} {'memory':>8} {'baseline':>9}")
+    for name, result in results.items():
+        reference = baseline.get(name)
+        reference_speed = f"{reference['mb_per_second']:.3f}" if reference else "-"
+        reference_memory = f"{reference['peak_memory_ratio']:.2f}x" if reference else "-"
+        print(
+            f"{name:<26} {result['size_bytes']:>10} {result['mb_per_second']:>9.3f} {reference_speed:>9} "
+            f"{result['peak_memory_ratio']:>7.2f}x {reference_memory:>9}"
+        )
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the conversion of answers to markdown")
+    parser.add_argument("--chatbots", help="Comma-separated chatbots to benchmark (default: all of the corpus)")
+    parser.add_argument("--size-mb", type=float, default=DEFAULT_SIZE_MB, help="Size of the generated answers")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per case, the best is kept")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed regression (fraction)")
+    parser.add_argument("--update-baseline", action="store_true", help="Save the results as the new baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    chatbots = args.chatbots.split(",") if args.chatbots else sorted({answer.chatbot for answer in load_corpus()})
+    results = run(chatbots, int(args.size_mb * MEGABYTE), args.repeat)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+            file.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if args.baseline.is_file():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    print_results(results, baseline)
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Answers of each chatbot, as HTML read from their pages, used by the tests and the benchmarks of `clean_chat_answer`.
+Each `<chatbot>/<case>.html` of `tests/fixtures/answers` comes with the markdown expected from it in `<case>.md`.
+Huge answers are generated from them instead of being stored.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+CORPUS_PATH: Path = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "answers"
+MEGABYTE: int = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Answer:
+    chatbot: str
+    case: str
+    html: str
+    markdown: str
+
+
+def load_corpus() -> List[Answer]:
+    answers = []
+    for html_path in sorted(CORPUS_PATH.glob("*/*.html")):
+        answers.append(
+            Answer(
+                chatbot=html_path.parent.name,
+                case=html_path.stem,
+                html=html_path.read_text(encoding="utf-8"),
+                markdown=html_path.with_suffix(".md").read_text(encoding="utf-8").removesuffix("\n"),
+            )
+        )
+    return answers
+
+
+def repeat_to_size(html: str, size: int) -> str:
+    """
+    Repeat an answer until it is at least `size` characters long, like a very long answer of the same chatbot.
+    """
+    return html * -(-size // len(html))
+
+
+def blank_lines_answer(answer_html: str, size: int) -> str:
+    """
+    Answer made of paragraphs separated by runs of empty lines, for chatbots collapsing consecutive newlines.
+    The answer element of `answer_html` is kept, its content is replaced.
+    """
+    root_end = answer_html.index(">") + 1
+    tag = answer_html[1:root_end].split(None, 1)[0].rstrip(">")
+    paragraph = "<p>Line of text</p>\n\n\n\n<div>\n\n</div>\n\n"
+    return answer_html[:root_end] + repeat_to_size(paragraph, size) + f"</{tag}>"
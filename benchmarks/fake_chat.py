@@ -0,0 +1,287 @@
+"""
+Local fake chatbot pages reproducing the elements each adapter looks for: prompt input, submit button, "finished"
+element (voice button, disabled submit...) and answer bubbles. Answers are written word by word on a schedule given
+in the page URL, so a benchmark knows how long the simulated generation lasts.
+
+    python -m benchmarks.fake_chat --port 8765
+    open http://127.0.0.1:8765/grok?first_token_ms=500&token_ms=20&tokens=100
+"""
+
+import argparse
+import html
+import json
+import threading
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from chapito.types import Chatbot
+
+DEFAULT_PORT: int = 8765
+DEFAULT_FIRST_TOKEN_MS: int = 500
+DEFAULT_TOKEN_MS: int = 20
+DEFAULT_TOKENS: int = 100
+# Words of the generated answers, cycled.
+WORDS: Tuple[str, ...] = ("Lorem", "ipsum", "dolor", "sit", "amet,", "consectetur", "adipiscing", "elit.")
+STOP_BUTTON: str = '<button type="button" aria-label="Stop">Stop</button>'
+
+
+@dataclass(frozen=True)
+class Skin:
+    """
+    HTML of a fake chatbot page. The controls are rendered in one of three states: prompt input empty, prompt
+    input filled, answer being written. The element clicked to submit has a `data-fake-submit` attribute.
+    """
+
+    input: str
+    empty: str
+    ready: str
+    busy: str
+    answer: str
+
+
+def submit_states(button: str) -> Dict[str, str]:
+    """
+    Controls of sites where the submit button stays displayed, disabled while the prompt is empty.
+    """
+    return {
+        "empty": button.format(attributes="disabled"),
+        "ready": button.format(attributes="data-fake-submit"),
+        "busy": STOP_BUTTON,
+    }
+
+
+SKINS: Dict[str, Skin] = {
+    Chatbot.AI_STUDIO: Skin(
+        input="<textarea></textarea>",
+        **submit_states('<button class="run-button" {attributes}>Run</button>'),
+        answer='<div class="turn-content"></div>',
+    ),
+    Chatbot.ANTHROPIC: Skin(
+        input='<div contenteditable="true"></div>',
+        **submit_states('<button type="button" aria-label="Send Message" {attributes}>Send</button>'),
+        answer='<div class="font-claude-message"></div>',
+    ),
+    Chatbot.DEEPSEEK: Skin(
+        input="<textarea></textarea>",
+        empty='<div role="button" aria-disabled="true">Send</div>',
+        ready='<div role="button" aria-disabled="false" data-fake-submit>Send</div>',
+        busy='<div role="button" aria-disabled="false">Stop</div>',
+        answer='<div class="ds-markdown ds-markdown--block"></div>',
+    ),
+    Chatbot.DUCKDUCKGO: Skin(
+        input="<textarea></textarea>",
+        **submit_states('<button type="submit" aria-label="Send" {attributes}>Send</button>'),
+        answer='<div heading="GPT-4o mini"></div>',
+    ),
+    Chatbot.GEMINI: Skin(
+        input='<div class="textarea" contenteditable="true"></div>',
+        empty='<div class="mic-button-container"><button>Mic</button></div>'
+        '<button class="submit" disabled>Send</button>',
+        ready='<div class="mic-button-container hidden"></div><button class="submit" data-fake-submit>Send</button>',
+        busy='<div class="mic-button-container hidden"></div>'
+        '<button class="submit"><div class="stop-icon"></div></button>',
+        answer="<message-content></message-content>",
+    ),
+    Chatbot.GROK: Skin(
+        input="<textarea></textarea>",
+        empty='<button type="submit" aria-label="Submit" disabled>Submit</button>'
+        '<button tabindex="0" aria-label="Enter voice mode">Voice</button>',
+        ready='<button type="submit" aria-label="Submit" data-fake-submit>Submit</button>',
+        busy=STOP_BUTTON,
+        answer='<div dir="auto" class="message-bubble"></div>',
+    ),
+    Chatbot.KIMI: Skin(
+        input='<div class="chat-input-editor" contenteditable="true"></div>',
+        empty='<div class="send-button-container disabled">Send</div>',
+        ready='<div class="send-button-container" data-fake-submit>Send</div>',
+        busy='<div class="send-button-container stop">Stop</div>',
+        answer='<div class="markdown-container"></div>',
+    ),
+    Chatbot.MISTRAL: Skin(
+        input='<textarea name="message.text"></textarea>',
+        **submit_states('<button type="submit" {attributes}>Send</button>'),
+        answer='<div class="prose"></div>',
+    ),
+    Chatbot.OPENAI: Skin(
+        input='<div contenteditable="true"></div>',
+        empty='<button data-testid="composer-speech-button">Voice</button>',
+        ready='<button data-testid="send-button" data-fake-submit>Send</button>',
+        busy=STOP_BUTTON,
+        answer='<div data-message-author-role="assistant"></div>',
+    ),
+    Chatbot.PERPLEXITY: Skin(
+        input="<textarea></textarea>",
+        **submit_states('<button type="button" aria-label="Submit" {attributes}>Submit</button>'),
+        answer='<div class="prose"></div>',
+    ),
+    Chatbot.QWEN: Skin(
+        input='<textarea id="chat-input"></textarea>',
+        **submit_states('<button id="send-message-button" {attributes}>Send</button>'),
+        answer='<div id="response-content-container"></div>',
+    ),
+}
+
+PAGE_TEMPLATE: str = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Fake {chatbot}</title></head>
+<body>
+<div id="messages"></div>
+<form autocomplete="off" onsubmit="return false"><div id="prompt-input">{input}</div><div id="controls"></div></form>
+<script>
+const SKIN = {skin};
+const WORDS = {words};
+const params = new URLSearchParams(location.search);
+const firstTokenMs = Number(params.get("first_token_ms") ?? {first_token_ms});
+const tokenMs = Number(params.get("token_ms") ?? {token_ms});
+const tokens = Number(params.get("tokens") ?? {tokens});
+const input = document.querySelector("#prompt-input > *");
+const controls = document.getElementById("controls");
+const messages = document.getElementById("messages");
+let busy = false;
+let state = null;
+
+const promptText = () => (input.isContentEditable ? input.innerText : input.value).trim();
+const render = () => {{
+    const newState = busy ? "busy" : promptText() ? "ready" : "empty";
+    // Controls are only replaced when their state changes, like a real page would re-render them.
+    if (newState !== state) {{
+        state = newState;
+        controls.innerHTML = SKIN[state];
+    }}
+}};
+const submit = () => {{
+    const text = promptText();
+    if (busy || !text) {{
+        return;
+    }}
+    if (input.isContentEditable) {{
+        input.innerHTML = "";
+    }} else {{
+        input.value = "";
+    }}
+    busy = true;
+    render();
+    const question = document.createElement("div");
+    question.className = "user-message";
+    question.textContent = text;
+    messages.appendChild(question);
+    const template = document.createElement("template");
+    template.innerHTML = SKIN.answer;
+    const answer = template.content.firstElementChild;
+    messages.appendChild(answer);
+    const paragraph = document.createElement("p");
+    answer.appendChild(paragraph);
+    let sent = 0;
+    const next = () => {{
+        if (sent < tokens) {{
+            paragraph.append((sent ? " " : "") + WORDS[sent % WORDS.length]);
+            sent++;
+            setTimeout(next, tokenMs);
+        }} else {{
+            busy = false;
+            render();
+        }}
+    }};
+    setTimeout(next, firstTokenMs);
+}};
+input.addEventListener("input", render);
+controls.addEventListener("click", (event) => {{
+    if (event.target.closest("[data-fake-submit]")) {{
+        submit();
+    }}
+}});
+render();
+</script>
+</body>
+</html>
+"""
+
+
+def expected_answer(tokens: int) -> str:
+    return " ".join(WORDS[index % len(WORDS)] for index in range(tokens))
+
+
+def generation_seconds(first_token_ms: int, token_ms: int, tokens: int) -> float:
+    """
+    Time from the submission to the end of the simulated answer.
+    """
+    return (first_token_ms + tokens * token_ms) / 1000
+
+
+def render_page(chatbot: str) -> str:
+    skin = SKINS[chatbot]
+    return PAGE_TEMPLATE.format(
+        chatbot=html.escape(chatbot),
+        input=skin.input,
+        skin=json.dumps(asdict(skin)),
+        words=json.dumps(WORDS),
+        first_token_ms=DEFAULT_FIRST_TOKEN_MS,
+        token_ms=DEFAULT_TOKEN_MS,
+        tokens=DEFAULT_TOKENS,
+    )
+
+
+class FakeChatHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        chatbot = urlsplit(self.path).path.strip("/")
+        if chatbot in SKINS:
+            body = render_page(chatbot)
+            status = 200
+        elif not chatbot:
+            links = "".join(f'<li><a href="/{name}">{name}</a></li>' for name in SKINS)
+            body = f"<!DOCTYPE html><html><body><ul>{links}</ul></body></html>"
+            status = 200
+        else:
+            body = "Unknown chatbot"
+            status = 404
+        content = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class FakeChatServer:
+    """
+    Serve the fake pages from a background thread. `port` 0 picks a free port.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = ThreadingHTTPServer((host, port), FakeChatHandler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-chat", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, chatbot: str, first_token_ms: int, token_ms: int, tokens: int) -> str:
+        query = urlencode({"first_token_ms": first_token_ms, "token_ms": token_ms, "tokens": tokens})
+        return f"{self.base_url}/{chatbot}?{query}"
+
+    def __enter__(self) -> "FakeChatServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve fake chatbot pages")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    with FakeChatServer(port=args.port) as server:
+        print(f"Fake chatbots served at {server.base_url}/")
+        threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
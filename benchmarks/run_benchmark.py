@@ -0,0 +1,148 @@
+"""
+Offline benchmark of the adapters: each one drives a headless Chrome on its fake page (see `fake_chat`), so the
+time spent by Chapito itself can be measured without any account, network or rate limit.
+
+    python -m benchmarks.run_benchmark --chatbots grok,mistral --requests 10
+
+The overhead of a request is its duration minus the simulated generation time: prompt transfer, wait for the submit
+button, completion detection (including the quiet period) and answer extraction.
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from benchmarks.fake_chat import SKINS, FakeChatServer, expected_answer, generation_seconds
+from chapito.config import Config
+from chapito.registry import load_adapter
+from chapito.tools.completion import set_quiet_period
+from chapito.tools.extract import set_extract_in_browser
+from chapito.tools.plan import set_interaction_plans
+from chapito.tools.tools import create_driver
+
+DEFAULT_REQUESTS: int = 5
+PAGE_LOAD_TIMEOUT_SECONDS: int = 30
+PROMPT: str = "Benchmark prompt"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def benchmark_config(cdp_transport: bool = False) -> Config:
+    """
+    Default config, without reading `config.ini` nor the command line.
+    """
+    config = Config.__new__(Config)
+    config.headless = True
+    config.use_browser_profile = False
+    config.blocked_resources = []
+    config.cdp_transport = cdp_transport
+    return config
+
+
+def ask(adapter, driver, stream: bool) -> str:
+    if stream:
+        return "".join(adapter.send_request_and_stream_response(driver, PROMPT))
+    return adapter.send_request_and_get_response(driver, PROMPT)
+
+
+def run_chatbot(driver, server: FakeChatServer, chatbot: str, args: argparse.Namespace) -> Dict[str, Any]:
+    adapter = load_adapter(chatbot)
+    driver.get(server.url(chatbot, args.first_token_ms, args.token_ms, args.tokens))
+    WebDriverWait(driver, PAGE_LOAD_TIMEOUT_SECONDS).until(adapter.check_if_chat_loaded)
+    simulated = generation_seconds(args.first_token_ms, args.token_ms, args.tokens)
+    expected = expected_answer(args.tokens)
+    durations: List[float] = []
+    errors: List[str] = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        try:
+            answer = ask(adapter, driver, args.stream)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            continue
+        durations.append(time.perf_counter() - start)
+        if answer.strip() != expected:
+            errors.append(f"Unexpected answer: {answer[:100]!r}")
+    result: Dict[str, Any] = {"chatbot": chatbot, "requests": args.requests, "errors": errors}
+    if durations:
+        overheads = [duration - simulated for duration in durations]
+        result.update(
+            median_seconds=statistics.median(durations),
+            p95_seconds=percentile(durations, 0.95),
+            median_overhead_seconds=statistics.median(overheads),
+            p95_overhead_seconds=percentile(overheads, 0.95),
+        )
+    return result
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"{'chatbot':<12} {'ok':>5} {'median':>8} {'p95':>8} {'overhead':>9} {'p95 ovh':>8}")
+    for result in results:
+        ok = f"{result['requests'] - len(result['errors'])}/{result['requests']}"
+        if "median_seconds" in result:
+            print(
+                f"{result['chatbot']:<12} {ok:>5} {result['median_seconds']:>8.3f} {result['p95_seconds']:>8.3f} "
+                f"{result['median_overhead_seconds']:>9.3f} {result['p95_overhead_seconds']:>8.3f}"
+            )
+        else:
+            print(f"{result['chatbot']:<12} {ok:>5}")
+        for error in result["errors"]:
+            print(f"    {error}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the adapters against local fake chatbots")
+    parser.add_argument("--chatbots", help="Comma-separated chatbots to benchmark (default: all)")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="Requests per chatbot")
+    parser.add_argument("--first-token-ms", type=int, default=500, help="Simulated time to the first word")
+    parser.add_argument("--token-ms", type=int, default=20, help="Simulated time between words")
+    parser.add_argument("--tokens", type=int, default=100, help="Words per answer")
+    parser.add_argument("--quiet-period", type=float, help="Seconds without change before an answer is finished")
+    parser.add_argument("--stream", action="store_true", help="Stream the answers")
+    parser.add_argument("--extract-in-browser", action="store_true", help="Convert the answers in the page")
+    parser.add_argument("--interaction-plans", action="store_true", help="Send each prompt in one script")
+    parser.add_argument("--cdp-transport", action="store_true", help="Send scripts over the DevTools websocket")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    chatbots = args.chatbots.split(",") if args.chatbots else list(SKINS)
+    unknown = [chatbot for chatbot in chatbots if chatbot not in SKINS]
+    if unknown:
+        print(f"No fake page for: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    if args.quiet_period is not None:
+        set_quiet_period(args.quiet_period)
+    set_extract_in_browser(args.extract_in_browser)
+    set_interaction_plans(args.interaction_plans)
+
+    results = []
+    with FakeChatServer() as server:
+        driver = create_driver(benchmark_config(args.cdp_transport))
+        try:
+            for chatbot in chatbots:
+                results.append(run_chatbot(driver, server, chatbot, args))
+        finally:
+            driver.quit()
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    return 1 if any(result["errors"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import copy
+import logging
+from typing import Callable, Dict, Iterable, List, Optional
+
+from chapito.config import DEFAULT_MAX_QUEUE_SIZE, DEFAULT_REQUESTS_PER_MINUTE, Config
+from chapito.executor import BrowserExecutor
+from chapito.health import BackendHealth
+from chapito.pool import DriverPool, create_driver_pool
+from chapito.registry import load_adapter
+from chapito.throttle import Throttle
+
+
+class Backend:
+    """
+    Chatbot served by the proxy: its browsers, the functions of its adapter sending requests, and the executor
+    running them. Each backend has its own browsers and queue, a busy chatbot doesn't hold requests to the others.
+    Requests are paced by `throttle`, at most `requests_per_minute` (0 = until the chatbot reports a limit).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        driver_pool: DriverPool,
+        send_request_and_get_response: Callable,
+        send_request_and_stream_response: Optional[Callable] = None,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+    ):
+        self.name = name
+        self.driver_pool = driver_pool
+        self.send_request_and_get_response = send_request_and_get_response
+        self.send_request_and_stream_response = send_request_and_stream_response
+        self.executor = BrowserExecutor(len(driver_pool), max_queue_size)
+        self.health = BackendHealth()
+        self.throttle = Throttle(requests_per_minute)
+
+    def expected_seconds(self) -> float:
+        return self.throttle.delay() + self.health.expected_seconds(self.executor.pending, self.executor.workers)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
+        self.driver_pool.quit()
+
+
+def rank_backends(backends: Iterable[Backend], preferred: Optional[Backend] = None) -> List[Backend]:
+    """
+    Order in which backends are tried: `preferred` first when it is available, then the fastest expected answer.
+    Backends failing repeatedly come last.
+    """
+    return sorted(
+        backends,
+        key=lambda backend: (
+            not backend.health.is_available(),
+            backend is not preferred,
+            backend.expected_seconds(),
+        ),
+    )
+
+
+def get_backend_config(config: Config, name: str) -> Config:
+    """
+    The browsers of the other chatbots use their own profile folder, named after the chatbot, and don't attach to
+    `debugger_address`.
+    """
+    if name == config.chatbot:
+        return config
+    backend_config = copy.copy(config)
+    backend_config.chatbot = name
+    backend_config.browser_profile_path = f"{config.browser_profile_path}_{name}"
+    backend_config.debugger_address = ""
+    return backend_config
+
+
+def create_backend(config: Config, name: str) -> Backend:
+    adapter = load_adapter(name)
+    driver_pool = create_driver_pool(adapter.initialize_driver, get_backend_config(config, name), adapter.open_new_chat)
+    return Backend(
+        str(name),
+        driver_pool,
+        adapter.send_request_and_get_response,
+        getattr(adapter, "send_request_and_stream_response", None),
+        config.max_queue_size,
+        config.requests_per_minute,
+    )
+
+
+def create_backends(config: Config) -> Dict[str, Backend]:
+    """
+    Start `chatbot` and the other `chatbots`. A chatbot failing to start is left out, the others are still served.
+    """
+    backends: Dict[str, Backend] = {}
+    for name in [config.chatbot, *config.chatbots]:
+        logging.info(f"Starting chatbot {name}...")
+        try:
+            backends[str(name)] = create_backend(config, name)
+        except Exception as e:
+            logging.error(f"Can't start chatbot {name}: {e}")
+    return backends
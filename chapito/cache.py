@@ -0,0 +1,82 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of chatbot answers, with a time-to-live.
+    When `path` is given, entries are saved to this JSON file and reloaded at startup.
+    """
+
+    def __init__(self, max_size: int, ttl: float, path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if path:
+            self.load()
+
+    @staticmethod
+    def make_key(chatbot: str, model: str, prompt: str) -> str:
+        return hashlib.sha256("\0".join((chatbot, model, prompt)).encode()).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, value = entry
+            if time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        if self.path:
+            self._save()
+
+    def load(self) -> None:
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                entries = json.load(file)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Can't read response cache {self.path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, created, value in entries[-self.max_size :]:
+                if now - created <= self.ttl:
+                    self._entries[key] = (created, value)
+        logging.info(f"{len(self._entries)} responses loaded from cache")
+
+    def _save(self) -> None:
+        temporary_path = f"{self.path}.tmp"
+        # The file is written without holding the entries lock, so reads are not delayed by the disk.
+        with self._save_lock:
+            with self._lock:
+                entries = [[key, created, value] for key, (created, value) in self._entries.items()]
+            try:
+                with open(temporary_path, "w", encoding="utf-8") as file:
+                    json.dump(entries, file)
+                os.replace(temporary_path, self.path)
+            except OSError as e:
+                logging.warning(f"Can't write response cache {self.path}: {e}")
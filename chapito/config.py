@@ -5,7 +5,9 @@ import logging
 import os.path
 from shutil import copy
 import sys
+from typing import List, Tuple
 
+from chapito.registry import ADAPTERS, is_available
 from chapito.tools.log import setup_logging_verbosity
 from chapito.types import Chatbot
 
@@ -18,7 +20,32 @@ DEFAULT_BROWSER_USER_AGENT: str = (
 )
 DEFAULT_VERBOSITY: int = 1
 DEFAULT_CHATBOT: Chatbot = Chatbot.GROK
+DEFAULT_CHATBOTS: str = ""
+DEFAULT_FAILOVER: bool = False
+DEFAULT_ANSWER_TIMEOUT: float = 0
+DEFAULT_REQUESTS_PER_MINUTE: float = 0
 DEFAULT_STREAM: bool = False
+DEFAULT_POOL_SIZE: int = 1
+DEFAULT_MAX_QUEUE_SIZE: int = 10
+DEFAULT_RETRY_AFTER: int = 10
+DEFAULT_COMPLETION_QUIET_PERIOD: float = 1.0
+DEFAULT_CACHE_SIZE: int = 0
+DEFAULT_CACHE_TTL: int = 3600
+DEFAULT_CACHE_PATH: str = ""
+DEFAULT_HISTORY_SIZE: int = 1000
+DEFAULT_COALESCE_REQUESTS: bool = True
+DEFAULT_MAX_TABS: int = 1
+DEFAULT_UPLOAD_THRESHOLD: int = 0
+DEFAULT_EXTRACT_IN_BROWSER: bool = False
+DEFAULT_INTERACTION_PLANS: bool = False
+DEFAULT_CHECK_VERSION: bool = True
+DEFAULT_DEBUGGER_ADDRESS: str = ""
+DEFAULT_HEADLESS: bool = False
+DEFAULT_CDP_TRANSPORT: bool = False
+DEFAULT_TRACE_BUFFER_SIZE: int = 0
+DEFAULT_BLOCKED_RESOURCES: str = ""
+# Kinds of resources the browser can be prevented from loading.
+RESOURCE_TYPES: Tuple[str, ...] = ("image", "font", "media", "tracker")
 
 DEFAULT_HOST = "127.0.0.1"
 DEFAULT_PORT = 5001
@@ -34,8 +61,33 @@ class Config:
     browser_profile_path: str = DEFAULT_BROWSER_PROFILE_PATH
     browser_user_agent: str = DEFAULT_BROWSER_USER_AGENT
     verbosity: int = DEFAULT_VERBOSITY
-    chatbot: Chatbot = DEFAULT_CHATBOT
+    # A `Chatbot`, or the name of a chatbot added by another package.
+    chatbot: str = DEFAULT_CHATBOT
+    # Other chatbots served at the same time, selected by the model of the request.
+    chatbots: List[str] = []
+    failover: bool = DEFAULT_FAILOVER
+    answer_timeout: float = DEFAULT_ANSWER_TIMEOUT
+    requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE
     stream: bool = DEFAULT_STREAM
+    pool_size: int = DEFAULT_POOL_SIZE
+    max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE
+    retry_after: int = DEFAULT_RETRY_AFTER
+    completion_quiet_period: float = DEFAULT_COMPLETION_QUIET_PERIOD
+    cache_size: int = DEFAULT_CACHE_SIZE
+    cache_ttl: int = DEFAULT_CACHE_TTL
+    cache_path: str = DEFAULT_CACHE_PATH
+    history_size: int = DEFAULT_HISTORY_SIZE
+    coalesce_requests: bool = DEFAULT_COALESCE_REQUESTS
+    max_tabs: int = DEFAULT_MAX_TABS
+    upload_threshold: int = DEFAULT_UPLOAD_THRESHOLD
+    extract_in_browser: bool = DEFAULT_EXTRACT_IN_BROWSER
+    interaction_plans: bool = DEFAULT_INTERACTION_PLANS
+    check_version: bool = DEFAULT_CHECK_VERSION
+    debugger_address: str = DEFAULT_DEBUGGER_ADDRESS
+    headless: bool = DEFAULT_HEADLESS
+    cdp_transport: bool = DEFAULT_CDP_TRANSPORT
+    trace_buffer_size: int = DEFAULT_TRACE_BUFFER_SIZE
+    blocked_resources: List[str] = []
     host: str = DEFAULT_HOST
     port: int = DEFAULT_PORT
 
@@ -47,7 +99,17 @@ class Config:
         parser.add_argument(
             "--config", type=str, help="Path to the config file (default: config.ini)", default=DEFAULT_CONFIG_PATH
         )
-        parser.add_argument("--chatbot", type=str, help="Chatbot to connect to (available: grok, mistral)")
+        parser.add_argument("--chatbot", type=str, help=f"Chatbot to connect to (available: {', '.join(ADAPTERS)})")
+        parser.add_argument(
+            "--chatbots", type=str, help="Other chatbots to serve at the same time, separated by commas"
+        )
+        parser.add_argument(
+            "--failover", action="store_true", help="Send requests to the healthiest chatbot, and to another on failure"
+        )
+        parser.add_argument("--answer-timeout", type=float, help="Seconds to wait for an answer (0 = chatbot's own)")
+        parser.add_argument(
+            "--requests-per-minute", type=float, help="Highest pace of requests to each chatbot (0 = not limited)"
+        )
         parser.add_argument("--stream", action="store_true", help="Send response as stream")
         parser.add_argument("--no-stream", action="store_true", help="Don't send response as stream")
         parser.add_argument("--use-browser-profile", action="store_true", help="Use a browser profile")
@@ -56,6 +118,32 @@ class Config:
         parser.add_argument("--verbosity", type=int, help="Verbosity level")
         parser.add_argument("--host", type=str, help="Host/IP to bind to")
         parser.add_argument("--port", type=int, help="Port to listen on")
+        parser.add_argument("--pool-size", type=int, help="Number of browsers handling requests in parallel")
+        parser.add_argument("--max-queue-size", type=int, help="Number of requests allowed to wait for a browser")
+        parser.add_argument("--max-tabs", type=int, help="Number of tabs per browser, one per conversation")
+        parser.add_argument(
+            "--upload-threshold", type=int, help="Prompts longer than this are attached as a file (0 = never)"
+        )
+        parser.add_argument("--cache-size", type=int, help="Number of responses kept in cache (0 = no cache)")
+        parser.add_argument("--cache-path", type=str, help="File where cached responses are saved")
+        parser.add_argument(
+            "--no-coalesce", action="store_true", help="Send identical simultaneous requests to the chatbot each"
+        )
+        parser.add_argument(
+            "--extract-in-browser", action="store_true", help="Convert answers to markdown inside the browser"
+        )
+        parser.add_argument(
+            "--interaction-plans", action="store_true", help="Send each prompt and wait for its answer in one script"
+        )
+        parser.add_argument("--no-version-check", action="store_true", help="Don't check for a new version")
+        parser.add_argument("--debugger-address", type=str, help="Address of a running browser to attach to")
+        parser.add_argument("--headless", action="store_true", help="Run the browser without window")
+        parser.add_argument(
+            "--cdp-transport", action="store_true", help="Send scripts to the browser over its DevTools websocket"
+        )
+        parser.add_argument(
+            "--blocked-resources", type=str, help=f"Resources the browser doesn't load ({', '.join(RESOURCE_TYPES)})"
+        )
         args = parser.parse_args()
         self.config_path = args.config or DEFAULT_CONFIG_PATH
         config = configparser.ConfigParser()
@@ -80,15 +168,92 @@ class Config:
             "DEFAULT", "browser_user_agent", fallback=DEFAULT_BROWSER_USER_AGENT
         )
         chatbot_str = args.chatbot or config.get("DEFAULT", "chatbot", fallback=DEFAULT_CHATBOT)
-        try:
-            chatbot = Chatbot(chatbot_str)
-        except ValueError as e:
+        if not is_available(chatbot_str):
             logging.error(f"Invalid chatbot specified: {chatbot_str}")
-            chatbot = DEFAULT_CHATBOT
-
-        self.chatbot = Chatbot(chatbot)
+            chatbot_str = DEFAULT_CHATBOT
+        self.chatbot = Chatbot(chatbot_str) if chatbot_str in Chatbot else chatbot_str
+        chatbots_str = args.chatbots or config.get("DEFAULT", "chatbots", fallback=DEFAULT_CHATBOTS)
+        self.chatbots = []
+        for name in chatbots_str.split(","):
+            name = name.strip()
+            if not name or name == self.chatbot or name in self.chatbots:
+                continue
+            if is_available(name):
+                self.chatbots.append(Chatbot(name) if name in Chatbot else name)
+            else:
+                logging.error(f"Invalid chatbot specified: {name}")
+        self.failover = args.failover or config.getboolean("DEFAULT", "failover", fallback=DEFAULT_FAILOVER)
+        self.answer_timeout = args.answer_timeout
+        if self.answer_timeout is None:
+            self.answer_timeout = config.getfloat("DEFAULT", "answer_timeout", fallback=DEFAULT_ANSWER_TIMEOUT)
+        if self.answer_timeout < 0:
+            logging.error(f"Invalid answer timeout: {self.answer_timeout}")
+            self.answer_timeout = DEFAULT_ANSWER_TIMEOUT
+        self.requests_per_minute = args.requests_per_minute
+        if self.requests_per_minute is None:
+            self.requests_per_minute = config.getfloat(
+                "DEFAULT", "requests_per_minute", fallback=DEFAULT_REQUESTS_PER_MINUTE
+            )
+        if self.requests_per_minute < 0:
+            logging.error(f"Invalid requests per minute: {self.requests_per_minute}")
+            self.requests_per_minute = DEFAULT_REQUESTS_PER_MINUTE
 
         self.host = args.host or config.get("DEFAULT", "host", fallback=DEFAULT_HOST)
         self.port = args.port or config.getint("DEFAULT", "port", fallback=DEFAULT_PORT)
+        self.pool_size = args.pool_size or config.getint("DEFAULT", "pool_size", fallback=DEFAULT_POOL_SIZE)
+        if self.pool_size < 1:
+            logging.error(f"Invalid pool size: {self.pool_size}")
+            self.pool_size = DEFAULT_POOL_SIZE
+        self.max_queue_size = args.max_queue_size
+        if self.max_queue_size is None:
+            self.max_queue_size = config.getint("DEFAULT", "max_queue_size", fallback=DEFAULT_MAX_QUEUE_SIZE)
+        if self.max_queue_size < 0:
+            logging.error(f"Invalid max queue size: {self.max_queue_size}")
+            self.max_queue_size = DEFAULT_MAX_QUEUE_SIZE
+        self.retry_after = config.getint("DEFAULT", "retry_after", fallback=DEFAULT_RETRY_AFTER)
+        self.completion_quiet_period = config.getfloat(
+            "DEFAULT", "completion_quiet_period", fallback=DEFAULT_COMPLETION_QUIET_PERIOD
+        )
+        self.cache_size = args.cache_size or config.getint("DEFAULT", "cache_size", fallback=DEFAULT_CACHE_SIZE)
+        self.cache_ttl = config.getint("DEFAULT", "cache_ttl", fallback=DEFAULT_CACHE_TTL)
+        self.cache_path = args.cache_path or config.get("DEFAULT", "cache_path", fallback=DEFAULT_CACHE_PATH)
+        self.history_size = config.getint("DEFAULT", "history_size", fallback=DEFAULT_HISTORY_SIZE)
+        self.coalesce_requests = not args.no_coalesce and config.getboolean(
+            "DEFAULT", "coalesce_requests", fallback=DEFAULT_COALESCE_REQUESTS
+        )
+        self.max_tabs = args.max_tabs or config.getint("DEFAULT", "max_tabs", fallback=DEFAULT_MAX_TABS)
+        self.upload_threshold = args.upload_threshold
+        if self.upload_threshold is None:
+            self.upload_threshold = config.getint("DEFAULT", "upload_threshold", fallback=DEFAULT_UPLOAD_THRESHOLD)
+        if self.upload_threshold < 0:
+            logging.error(f"Invalid upload threshold: {self.upload_threshold}")
+            self.upload_threshold = DEFAULT_UPLOAD_THRESHOLD
+        self.extract_in_browser = args.extract_in_browser or config.getboolean(
+            "DEFAULT", "extract_in_browser", fallback=DEFAULT_EXTRACT_IN_BROWSER
+        )
+        self.interaction_plans = args.interaction_plans or config.getboolean(
+            "DEFAULT", "interaction_plans", fallback=DEFAULT_INTERACTION_PLANS
+        )
+        self.check_version = not args.no_version_check and config.getboolean(
+            "DEFAULT", "check_version", fallback=DEFAULT_CHECK_VERSION
+        )
+        self.debugger_address = args.debugger_address or config.get(
+            "DEFAULT", "debugger_address", fallback=DEFAULT_DEBUGGER_ADDRESS
+        )
+        self.trace_buffer_size = config.getint("DEFAULT", "trace_buffer_size", fallback=DEFAULT_TRACE_BUFFER_SIZE)
+        self.headless = args.headless or config.getboolean("DEFAULT", "headless", fallback=DEFAULT_HEADLESS)
+        self.cdp_transport = args.cdp_transport or config.getboolean(
+            "DEFAULT", "cdp_transport", fallback=DEFAULT_CDP_TRANSPORT
+        )
+        blocked_resources_str = args.blocked_resources or config.get(
+            "DEFAULT", "blocked_resources", fallback=DEFAULT_BLOCKED_RESOURCES
+        )
+        self.blocked_resources = []
+        for resource_type in blocked_resources_str.split(","):
+            resource_type = resource_type.strip()
+            if resource_type in RESOURCE_TYPES:
+                self.blocked_resources.append(resource_type)
+            elif resource_type:
+                logging.error(f"Invalid resource type to block: {resource_type}")
 
         logging.debug(f"Config initialized: {self.__dict__}")
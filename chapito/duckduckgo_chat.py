@@ -1,19 +1,33 @@
-import time
 import logging
-import pyperclip
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from typing import Tuple
 from selenium.webdriver.common.by import By
-from bs4 import BeautifulSoup, Tag
 
 from chapito.config import Config
-from chapito.tools.tools import create_driver, transfer_prompt
+from chapito.tools.completion import start_completion_detector, wait_for_completion, wait_for_submit_button
+from chapito.tools.extract import extract_last_answer
+from chapito.tools.markdown import CODE_FENCES_ON_NEW_LINE, INLINE_CODE, MarkdownRules, Selector, html_to_markdown
+from chapito.tools.plan import InteractionPlan, run_interaction_plan
+from chapito.tools.tools import create_driver, open_chat, reuse_chat_tab, transfer_prompt
 
 URL: str = "https://duck.ai/"
 TIMEOUT_SECONDS: int = 120
 SUBMIT_CSS_SELECTOR: str = 'button[type="submit"][aria-label="Send"]'
 ANSWER_XPATH: str = "//div[@heading]"
 
+MARKDOWN_RULES: MarkdownRules = MarkdownRules(
+    code_block=Selector("pre"),
+    code=Selector("code"),
+    code_wrap=CODE_FENCES_ON_NEW_LINE,
+    # Paragraphs and list items have no whitespace between them in the page.
+    wrap={"code": INLINE_CODE, "p": ("", "\n"), "li": ("", "\n")},
+    # Copy and feedback buttons of the answer.
+    drop=(Selector("button"),),
+)
+
+INTERACTION_PLAN: InteractionPlan = InteractionPlan(
+    By.TAG_NAME, "textarea", SUBMIT_CSS_SELECTOR, SUBMIT_CSS_SELECTOR, submit_index=-1
+)
+
 
 def check_if_chat_loaded(driver) -> bool:
     driver.implicitly_wait(5)
@@ -28,76 +42,49 @@ def check_if_chat_loaded(driver) -> bool:
 def initialize_driver(config: Config):
     logging.info("Initializing browser for DeepSeek...")
     driver = create_driver(config)
-    driver.get(URL)
-
-    while not check_if_chat_loaded(driver):
-        logging.info("Waiting for chat interface to load...")
-        time.sleep(5)
+    if not reuse_chat_tab(driver, config, URL, check_if_chat_loaded):
+        open_new_chat(driver)
     logging.info("Browser initialized")
     return driver
 
 
-def send_request_and_get_response(driver, message):
-    logging.debug("Send request to chatbot interface")
-    driver.implicitly_wait(10)
-    textarea = driver.find_element(By.TAG_NAME, "textarea")
-    transfer_prompt(message, textarea)
-    wait = WebDriverWait(driver, TIMEOUT_SECONDS)
-    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, SUBMIT_CSS_SELECTOR)))
-    time.sleep(1)
-    submit_buttons = driver.find_elements(By.CSS_SELECTOR, SUBMIT_CSS_SELECTOR)
-    submit_button = submit_buttons[-1]
-    logging.debug("Push submit button")
-    submit_button.click()
-
-    # Wait a little time to avoid early fail.
-    time.sleep(1)
-
-    # Wait for submit button to be available. It means answer is finished.
-    wait = WebDriverWait(driver, TIMEOUT_SECONDS)
-    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, SUBMIT_CSS_SELECTOR)))
-    scroll_down(driver)
-    message = ""
-    remaining_attemps = 5
-    while not message and remaining_attemps > 0:
-        time.sleep(1)
-        message = get_answer_from_copy_button(driver)
-        remaining_attemps -= 1
-
-    if not message:
-        logging.warning("No message found.")
-        return ""
-    clean_message = clean_chat_answer(message)
-    logging.debug(f"Clean message ends with: {clean_message[-100:]}")
-    return clean_message
+def open_new_chat(driver) -> None:
+    open_chat(driver, URL, check_if_chat_loaded)
 
 
-def scroll_down(driver):
-    form_element = driver.find_element(By.XPATH, "//form[@autocomplete='off']")
-    div_element = form_element.find_element(By.XPATH, "./ancestor::div[1]")
-    if scrollable_div := div_element.find_element(By.TAG_NAME, "div"):
-        driver.execute_script("arguments[0].scrollTop = arguments[0].scrollHeight", scrollable_div)
-    else:
-        logging.warning("No scrollable div found.")
+def read_last_answer(driver) -> Tuple[int, str]:
+    return extract_last_answer(driver, By.XPATH, ANSWER_XPATH, MARKDOWN_RULES)
 
 
-def get_answer_from_copy_button(driver) -> str:
-    message_bubbles = driver.find_elements(By.XPATH, ANSWER_XPATH)
-    if not message_bubbles:
+def send_request_and_get_response(driver, message):
+    if not run_interaction_plan(driver, message, INTERACTION_PLAN, TIMEOUT_SECONDS):
+        logging.debug("Send request to chatbot interface")
+        driver.implicitly_wait(10)
+        textarea = driver.find_element(By.TAG_NAME, "textarea")
+        # Files can't be attached to DuckDuckGo chats.
+        transfer_prompt(message, textarea, None)
+        submit_button = wait_for_submit_button(driver, SUBMIT_CSS_SELECTOR, TIMEOUT_SECONDS, index=-1)
+        start_completion_detector(driver, SUBMIT_CSS_SELECTOR)
+        logging.debug("Push submit button")
+        submit_button.click()
+
+        # Wait for the answer to be finished and stable.
+        wait_for_completion(driver, TIMEOUT_SECONDS)
+
+    count, clean_message = read_last_answer(driver)
+    if not count:
         logging.warning("No message found.")
         return ""
-    last_message_bubble = message_bubbles[-1]
-    copy_button = last_message_bubble.find_element(By.XPATH, "//*[@data-copyairesponse='true']")
-    try:
-        copy_button.click()
-    except Exception as e:
-        logging.warning("Error clicking copy button:", e)
-        return ""
-    return pyperclip.paste()
+    logging.debug(f"Clean message ends with: {clean_message[-100:]}")
+    return clean_message
 
 
-def clean_chat_answer(text: str) -> str:
-    return text.replace("\r\n", "\n").strip()
+def clean_chat_answer(html: str) -> str:
+    """
+    Read the answer from its HTML instead of the copy button, the system clipboard being shared by all browsers.
+    """
+    logging.debug("Clean chat answer")
+    return html_to_markdown(html, MARKDOWN_RULES)
 
 
 def main():
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class QueueFullError(Exception):
+    """Too many requests are already waiting for a browser."""
+
+
+class BrowserExecutor:
+    """
+    Runs blocking Selenium work outside of the event loop.
+    One worker per browser, and at most `max_queue_size` requests waiting for a worker.
+    """
+
+    def __init__(self, workers: int, max_queue_size: int):
+        self.workers = workers
+        self.capacity = workers + max_queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="browser")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def is_full(self) -> bool:
+        return self._pending >= self.capacity
+
+    @property
+    def queued(self) -> int:
+        return max(0, self._pending - self.workers)
+
+    def submit(self, func: Callable, *args: Any) -> Future:
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise QueueFullError(f"{self._pending} requests already pending")
+            self._pending += 1
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    def _release(self, _: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
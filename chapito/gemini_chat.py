@@ -1,13 +1,20 @@
 import logging
-import time
+from typing import Iterator, List, Tuple
 
-from bs4 import BeautifulSoup, Tag
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 
 from chapito.config import Config
-from chapito.tools.tools import create_driver, transfer_prompt
+from chapito.tools.completion import (
+    is_generation_finished,
+    start_completion_detector,
+    wait_for_completion,
+    wait_for_submit_button,
+)
+from chapito.tools.extract import extract_last_answer
+from chapito.tools.markdown import CODE_FENCES_ON_NEW_LINE, MarkdownRules, Selector, html_to_markdown
+from chapito.tools.plan import InteractionPlan, run_interaction_plan
+from chapito.tools.stream import stream_answer
+from chapito.tools.tools import create_driver, open_chat, reuse_chat_tab, transfer_prompt
 
 URL: str = "https://gemini.google.com/app"
 TIMEOUT_SECONDS: int = 1000
@@ -15,6 +22,20 @@ SUBMIT_CSS_SELECTOR: str = "button.submit"
 STOP_CSS_SELECTOR: str = "div.stop-icon"
 MICROPHONE_CSS_SELECTOR: str = "div.mic-button-container:not(.hidden)"
 ANSWER_XPATH: str = "//message-content"
+TRACKER_URLS: List[str] = ["*play.google.com/log*", "*ogads-pa.clients6.google.com*"]
+
+MARKDOWN_RULES: MarkdownRules = MarkdownRules(
+    code_block=Selector("div", "code-block"),
+    code=Selector("div", "formatted-code-block-internal-container"),
+    flatten_code=True,
+    code_block_wrap=CODE_FENCES_ON_NEW_LINE,
+    separator="\n",
+    collapse_newlines=True,
+)
+
+INTERACTION_PLAN: InteractionPlan = InteractionPlan(
+    By.CLASS_NAME, "textarea", SUBMIT_CSS_SELECTOR, MICROPHONE_CSS_SELECTOR, input_index=-1
+)
 
 
 def check_if_chat_loaded(driver) -> bool:
@@ -29,69 +50,66 @@ def check_if_chat_loaded(driver) -> bool:
 
 def initialize_driver(config: Config):
     logging.info("Initializing browser for Gemini...")
-    driver = create_driver(config)
-    driver.get(URL)
-
-    while not check_if_chat_loaded(driver):
-        logging.info("Waiting for chat interface to load...")
-        time.sleep(5)
+    driver = create_driver(config, TRACKER_URLS)
+    if not reuse_chat_tab(driver, config, URL, check_if_chat_loaded):
+        open_new_chat(driver)
     logging.info("Browser initialized")
     return driver
 
 
-def send_request_and_get_response(driver, message):
+def open_new_chat(driver) -> None:
+    open_chat(driver, URL, check_if_chat_loaded)
+
+
+def find_message_bubbles(driver) -> list:
+    return driver.find_elements(By.XPATH, ANSWER_XPATH)
+
+
+def read_last_answer(driver) -> Tuple[int, str]:
+    return extract_last_answer(driver, By.XPATH, ANSWER_XPATH, MARKDOWN_RULES)
+
+
+def submit_request(driver, message) -> None:
     logging.debug("Send request to chatbot interface")
     driver.implicitly_wait(10)
     textareas = driver.find_elements(By.CLASS_NAME, "textarea")
     print(len(textareas))
     textarea = textareas[-1]
     transfer_prompt(message, textarea)
-    wait = WebDriverWait(driver, TIMEOUT_SECONDS)
-    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, SUBMIT_CSS_SELECTOR)))
-    submit_button = driver.find_element(By.CSS_SELECTOR, SUBMIT_CSS_SELECTOR)
+    submit_button = wait_for_submit_button(driver, SUBMIT_CSS_SELECTOR, TIMEOUT_SECONDS)
+    start_completion_detector(driver, MICROPHONE_CSS_SELECTOR)
     logging.debug("Push submit button")
     submit_button.click()
 
-    # Wait a little time to avoid early fail.
-    time.sleep(1)
 
-    # Wait for stop button to be hidden. It means answer is finished.
-    wait = WebDriverWait(driver, TIMEOUT_SECONDS)
-    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, MICROPHONE_CSS_SELECTOR)))
+def send_request_and_get_response(driver, message):
+    if not run_interaction_plan(driver, message, INTERACTION_PLAN, TIMEOUT_SECONDS):
+        submit_request(driver, message)
+        # Wait for the answer to be finished and stable.
+        wait_for_completion(driver, TIMEOUT_SECONDS)
 
-    message_bubbles = driver.find_elements(By.XPATH, ANSWER_XPATH)
-    if not message_bubbles:
+    count, clean_message = read_last_answer(driver)
+    if not count:
         logging.warning("No message found.")
         return ""
-    last_message_bubble = message_bubbles[-1]
-    html = last_message_bubble.get_attribute("outerHTML")
-    clean_message = clean_chat_answer(html)
     logging.debug(f"Clean message ends with: {clean_message[-100:]}")
     return clean_message
 
 
+def send_request_and_stream_response(driver, message) -> Iterator[str]:
+    driver.implicitly_wait(0)
+    previous_count = len(find_message_bubbles(driver))
+    if not run_interaction_plan(driver, message, INTERACTION_PLAN, TIMEOUT_SECONDS, wait_for_answer=False):
+        submit_request(driver, message)
+    yield from stream_answer(driver, previous_count, read_last_answer, is_generation_finished, TIMEOUT_SECONDS)
+
+
 def clean_chat_answer(html: str) -> str:
     """
     Find all DIVs containing code and remove unecessary decorations."
     """
     logging.debug("Clean chat answer")
-    soup = BeautifulSoup(html, "html.parser")
-    no_prose_divs = soup.find_all("div", class_="code-block")
-    for div in no_prose_divs:
-        if isinstance(div, Tag):
-            code_tags = div.find_all("div", class_="formatted-code-block-internal-container")
-            div.clear()
-            for code in code_tags:
-                div.append(code.get_text())
-                div.insert_before("\n```\n")
-                div.insert_after("\n```\n")
-        else:
-            code_tags = []
-
-    clean_answer = soup.get_text(separator="\n").strip()
-    while "\n\n" in clean_answer:
-        clean_answer = clean_answer.replace("\n\n", "\n")
-    return clean_answer
+    return html_to_markdown(html, MARKDOWN_RULES)
 
 
 def main():
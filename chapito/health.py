@@ -0,0 +1,65 @@
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# Number of last requests the latency and error rate are computed from.
+HEALTH_WINDOW: int = 20
+# A chatbot failing this many requests in a row is avoided for `COOLDOWN_SECONDS`.
+MAX_CONSECUTIVE_FAILURES: int = 3
+COOLDOWN_SECONDS: float = 60
+# Highest error rate used in the score, so that a failing chatbot still gets a finite one.
+MAX_ERROR_RATE: float = 0.9
+
+
+class BackendHealth:
+    """
+    Rolling latency and error rate of a chatbot, from its last requests. A failure is a timeout, a browser error or
+    an empty answer.
+    """
+
+    def __init__(self, window: int = HEALTH_WINDOW):
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._failures: deque[bool] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.unavailable_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_success(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+            self._failures.append(False)
+            self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures.append(True)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                self.unavailable_until = time.monotonic() + COOLDOWN_SECONDS
+
+    @property
+    def latency(self) -> Optional[float]:
+        """
+        Median duration of the last successful requests, `None` before the first one.
+        """
+        with self._lock:
+            return statistics.median(self._latencies) if self._latencies else None
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return sum(self._failures) / len(self._failures) if self._failures else 0.0
+
+    def is_available(self) -> bool:
+        return time.monotonic() >= self.unavailable_until
+
+    def expected_seconds(self, pending: int, workers: int) -> float:
+        """
+        Estimated time to get an answer: the requests already pending are answered first, and failed requests have
+        to be sent again. A chatbot without any answer yet is estimated as immediate, so it gets tried.
+        """
+        latency = self.latency or 0.0
+        error_rate = min(self.error_rate, MAX_ERROR_RATE)
+        return latency * (1 + pending / max(1, workers)) / (1 - error_rate)
@@ -0,0 +1,30 @@
+import hashlib
+from collections import OrderedDict
+
+
+class ChatHistory:
+    """
+    Messages already exchanged in a chat session, stored as hashes of their content.
+    Membership checks are O(1) and only the `max_size` most recent messages are kept.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._hashes: OrderedDict[bytes, None] = OrderedDict()
+
+    @staticmethod
+    def _hash(content: str) -> bytes:
+        return hashlib.blake2b(content.strip().encode(), digest_size=16).digest()
+
+    def __contains__(self, content: str) -> bool:
+        return self._hash(content) in self._hashes
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def add(self, content: str) -> None:
+        content_hash = self._hash(content)
+        self._hashes[content_hash] = None
+        self._hashes.move_to_end(content_hash)
+        while len(self._hashes) > self.max_size:
+            self._hashes.popitem(last=False)
@@ -1,12 +1,19 @@
-import time
 import logging
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from typing import Iterator, Tuple
 from selenium.webdriver.common.by import By
-from bs4 import BeautifulSoup, Tag
 
 from chapito.config import Config
-from chapito.tools.tools import create_driver, transfer_prompt
+from chapito.tools.completion import (
+    is_generation_finished,
+    start_completion_detector,
+    wait_for_completion,
+    wait_for_submit_button,
+)
+from chapito.tools.extract import extract_last_answer
+from chapito.tools.markdown import CODE_FENCES_ON_NEW_LINE, MarkdownRules, Selector, html_to_markdown
+from chapito.tools.plan import InteractionPlan, run_interaction_plan
+from chapito.tools.stream import stream_answer
+from chapito.tools.tools import create_driver, open_chat, reuse_chat_tab, transfer_prompt
 
 URL: str = "https://www.kimi.com/chat/"
 TIMEOUT_SECONDS: int = 120
@@ -15,6 +22,18 @@ SUBMIT_CSS_SELECTOR: str = ".send-button-container"
 SUBMIT_DISABLE_CSS_SELECTOR: str = "div.send-button-container.disabled:not(.stop)"
 ANSWER_XPATH: str = "//div[@class='markdown-container']"
 
+MARKDOWN_RULES: MarkdownRules = MarkdownRules(
+    code_block=Selector("div", "segment-code"),
+    code=Selector("div", "segment-code-content"),
+    code_wrap=CODE_FENCES_ON_NEW_LINE,
+    separator="\n",
+    collapse_newlines=True,
+)
+
+INTERACTION_PLAN: InteractionPlan = InteractionPlan(
+    By.XPATH, QUESTION_XPATH, SUBMIT_CSS_SELECTOR, SUBMIT_DISABLE_CSS_SELECTOR, submit_index=-1
+)
+
 
 def check_if_chat_loaded(driver) -> bool:
     driver.implicitly_wait(5)
@@ -29,67 +48,63 @@ def check_if_chat_loaded(driver) -> bool:
 def initialize_driver(config: Config):
     logging.info("Initializing browser for Kimi...")
     driver = create_driver(config)
-    driver.get(URL)
-
-    while not check_if_chat_loaded(driver):
-        logging.info("Waiting for chat interface to load...")
-        time.sleep(5)
+    if not reuse_chat_tab(driver, config, URL, check_if_chat_loaded):
+        open_new_chat(driver)
     logging.info("Browser initialized")
     return driver
 
 
-def send_request_and_get_response(driver, message):
+def open_new_chat(driver) -> None:
+    open_chat(driver, URL, check_if_chat_loaded)
+
+
+def find_message_bubbles(driver) -> list:
+    return driver.find_elements(By.XPATH, ANSWER_XPATH)
+
+
+def read_last_answer(driver) -> Tuple[int, str]:
+    return extract_last_answer(driver, By.XPATH, ANSWER_XPATH, MARKDOWN_RULES)
+
+
+def submit_request(driver, message) -> None:
     logging.debug("Send request to chatbot interface")
     driver.implicitly_wait(10)
     textarea = driver.find_element(By.XPATH, QUESTION_XPATH)
     transfer_prompt(message, textarea)
-    wait = WebDriverWait(driver, TIMEOUT_SECONDS)
-    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, SUBMIT_CSS_SELECTOR)))
-    time.sleep(1)
-    submit_buttons = driver.find_elements(By.CSS_SELECTOR, SUBMIT_CSS_SELECTOR)
-    submit_button = submit_buttons[-1]
+    submit_button = wait_for_submit_button(driver, SUBMIT_CSS_SELECTOR, TIMEOUT_SECONDS, index=-1)
+    start_completion_detector(driver, SUBMIT_DISABLE_CSS_SELECTOR)
     logging.debug("Push submit button")
     submit_button.click()
 
-    # Wait a little time to avoid early fail.
-    time.sleep(3)
 
-    # Wait for submit button to be available. It means answer is finished.
-    wait = WebDriverWait(driver, TIMEOUT_SECONDS)
-    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, SUBMIT_DISABLE_CSS_SELECTOR)))
+def send_request_and_get_response(driver, message):
+    if not run_interaction_plan(driver, message, INTERACTION_PLAN, TIMEOUT_SECONDS):
+        submit_request(driver, message)
+        # Wait for the answer to be finished and stable.
+        wait_for_completion(driver, TIMEOUT_SECONDS)
 
-    time.sleep(1)
-    message_bubbles = driver.find_elements(By.XPATH, ANSWER_XPATH)
-    if not message_bubbles:
+    count, clean_message = read_last_answer(driver)
+    if not count:
         logging.warning("No message found.")
         return ""
-    last_message_bubble = message_bubbles[-1]
-    html = last_message_bubble.get_attribute("outerHTML")
-    clean_message = clean_chat_answer(html)
     logging.debug(f"Clean message ends with: {clean_message[-100:]}")
     return clean_message
 
 
+def send_request_and_stream_response(driver, message) -> Iterator[str]:
+    driver.implicitly_wait(0)
+    previous_count = len(find_message_bubbles(driver))
+    if not run_interaction_plan(driver, message, INTERACTION_PLAN, TIMEOUT_SECONDS, wait_for_answer=False):
+        submit_request(driver, message)
+    yield from stream_answer(driver, previous_count, read_last_answer, is_generation_finished, TIMEOUT_SECONDS)
+
+
 def clean_chat_answer(html: str) -> str:
     """
     Find all DIVs containing code and remove unecessary decorations."
     """
     logging.debug("Clean chat answer")
-    soup = BeautifulSoup(html, "html.parser")
-
-    no_prose_divs = soup.find_all("div", class_="segment-code")
-    for div in no_prose_divs:
-        if isinstance(div, Tag):
-            code_tags = div.find_all("div", class_="segment-code-content")
-            div.clear()
-            for code in code_tags:
-                div.append(code)
-                code.insert_before("\n```\n")
-                code.insert_after("\n```\n")
-    clean_answer = soup.get_text(separator="\n").strip()
-    while "\n\n" in clean_answer:
-        clean_answer = clean_answer.replace("\n\n", "\n")
-    return clean_answer
+    return html_to_markdown(html, MARKDOWN_RULES)
 
 
 def main():
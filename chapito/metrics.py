@@ -0,0 +1,193 @@
+import copy
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from chapito.tracing import span
+
+# Chatbot of the request being handled, labels the metrics recorded by the tools shared between adapters.
+current_chatbot: ContextVar[str] = ContextVar("current_chatbot", default="")
+# Last duration of the phases measured inside a polling loop, see `measure_last_poll`.
+polled_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar("polled_phases", default=None)
+
+PHASE_BUCKETS: Tuple[float, ...] = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(label_names: Sequence[str], label_values: Sequence[str]) -> str:
+    if not label_names:
+        return ""
+    labels = ",".join(f'{name}="{escape_label_value(value)}"' for name, value in zip(label_names, label_values))
+    return f"{{{labels}}}"
+
+
+class Metric:
+    """
+    Metric in the Prometheus text format, with one value per combination of labels.
+    """
+
+    kind: str = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ("chatbot",)):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        METRICS.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _snapshot(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return [(key, copy.copy(value)) for key, value in sorted(self._values.items())]
+
+    def samples(self) -> Iterator[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        for key, value in self._snapshot():
+            yield self.name, self.label_names, key, value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, label_names, label_values, value in self.samples():
+            lines.append(f"{name}{format_labels(label_names, label_values)} {format_value(value)}")
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = ("chatbot",),
+        buckets: Sequence[float] = PHASE_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # Count per bucket, then sum and number of observations.
+            counts = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            counts[-2] += value
+            counts[-1] += 1
+
+    def get_count(self, **labels: str) -> int:
+        counts = self._values.get(self._key(labels))
+        return counts[-1] if counts else 0
+
+    def samples(self) -> Iterator[Tuple[str, Tuple[str, ...], Tuple[str, ...], float]]:
+        bucket_label_names = self.label_names + ("le",)
+        for label_values, counts in self._snapshot():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", bucket_label_names, label_values + (format_value(bound),), cumulative
+            yield f"{self.name}_sum", self.label_names, label_values, counts[-2]
+            yield f"{self.name}_count", self.label_names, label_values, counts[-1]
+
+
+METRICS: List[Metric] = []
+
+PHASE_SECONDS = Histogram(
+    "chapito_phase_seconds", "Duration of each phase of a request to the chatbot.", ("chatbot", "phase")
+)
+REQUESTS = Counter("chapito_requests_total", "Requests sent to the chatbot.")
+TIMEOUTS = Counter("chapito_timeouts_total", "Requests whose answer was not finished in time.")
+EMPTY_ANSWERS = Counter("chapito_empty_answers_total", "Requests without answer found in the page.")
+PROMPT_CHARACTERS = Counter("chapito_prompt_characters_total", "Characters of the prompts sent to the chatbot.")
+RESPONSE_CHARACTERS = Counter("chapito_response_characters_total", "Characters of the answers of the chatbot.")
+QUEUE_DEPTH = Gauge("chapito_queue_depth", "Requests waiting for a free browser.")
+LATENCY = Gauge("chapito_latency_seconds", "Median duration of the last answers of the chatbot.")
+ERROR_RATE = Gauge("chapito_error_rate", "Share of failed requests among the last ones sent to the chatbot.")
+FAILOVERS = Counter("chapito_failovers_total", "Requests sent to another chatbot after this one failed.")
+COALESCED_REQUESTS = Counter(
+    "chapito_coalesced_requests_total", "Requests given the answer of an identical request already being answered."
+)
+RATE_LIMITS = Counter("chapito_rate_limits_total", "Requests answered by a rate limit notice.")
+ALLOWED_PACE = Gauge("chapito_requests_per_minute", "Pace of requests allowed to the chatbot (0 = not paced).")
+
+
+@contextmanager
+def measure_phase(phase: str) -> Iterator[None]:
+    """
+    Record the duration of a phase for the current chatbot, and a span in the current trace.
+    Can also decorate a function.
+    """
+    start = time.perf_counter()
+    try:
+        with span(phase):
+            yield
+    finally:
+        duration = time.perf_counter() - start
+        if (durations := polled_phases.get()) is not None:
+            durations[phase] = duration
+        else:
+            PHASE_SECONDS.observe(duration, chatbot=current_chatbot.get(), phase=phase)
+
+
+@contextmanager
+def measure_last_poll() -> Iterator[None]:
+    """
+    Phases repeated by a polling loop are recorded once, with the duration of their last run (eg. the fetch of the
+    complete answer).
+    """
+    durations: Dict[str, float] = {}
+    token = polled_phases.set(durations)
+    try:
+        yield
+    finally:
+        polled_phases.reset(token)
+        for phase, duration in durations.items():
+            PHASE_SECONDS.observe(duration, chatbot=current_chatbot.get(), phase=phase)
+
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in METRICS) + "\n"
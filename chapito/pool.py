@@ -0,0 +1,149 @@
+import copy
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from chapito.config import DEFAULT_HISTORY_SIZE, Config
+from chapito.history import ChatHistory
+from chapito.tools.tools import open_tab
+
+
+class ChatTab:
+    def __init__(self, handle: Optional[str], history_size: int):
+        self.handle = handle
+        self.history = ChatHistory(history_size)
+
+
+class ChatTabs:
+    """
+    Browser tabs of a driver, each one pinned to a conversation.
+    When all `max_tabs` tabs are used, the least recently used one is recycled with a new chat.
+    """
+
+    def __init__(self, driver, open_new_chat: Optional[Callable], max_tabs: int, history_size: int):
+        self.driver = driver
+        self.open_new_chat = open_new_chat
+        self.max_tabs = max(1, max_tabs)
+        self.history_size = history_size
+        self._tabs: OrderedDict[Optional[str], ChatTab] = OrderedDict()
+        self._current: Optional[ChatTab] = None
+
+    def __contains__(self, conversation_id: Optional[str]) -> bool:
+        return conversation_id in self._tabs
+
+    def __len__(self) -> int:
+        return len(self._tabs)
+
+    def switch_to(self, conversation_id: Optional[str]) -> ChatTab:
+        if tab := self._tabs.get(conversation_id):
+            self._tabs.move_to_end(conversation_id)
+        elif not self._tabs:
+            # First conversation uses the tab opened with the browser.
+            tab = ChatTab(None, self.history_size)
+            self._current = tab
+        elif len(self._tabs) < self.max_tabs:
+            logging.debug(f"Open a new tab for conversation {conversation_id}")
+            self._remember_current_handle()
+            open_tab(self.driver)
+            tab = ChatTab(self.driver.current_window_handle, self.history_size)
+            self._current = tab
+            self.open_new_chat(self.driver)
+        else:
+            evicted_conversation_id, evicted_tab = self._tabs.popitem(last=False)
+            logging.debug(f"Recycle tab of conversation {evicted_conversation_id} for conversation {conversation_id}")
+            self._remember_current_handle()
+            tab = ChatTab(evicted_tab.handle, self.history_size)
+            self._activate(tab)
+            self.open_new_chat(self.driver)
+        self._tabs[conversation_id] = tab
+        self._activate(tab)
+        return tab
+
+    def _remember_current_handle(self) -> None:
+        if self._current and self._current.handle is None:
+            self._current.handle = self.driver.current_window_handle
+
+    def _activate(self, tab: ChatTab) -> None:
+        if tab is not self._current:
+            self.driver.switch_to.window(tab.handle)
+            self._current = tab
+
+
+class DriverPool:
+    """
+    Set of browser drivers shared by the proxy. A request checks out an idle driver and gives it back when done.
+    A driver already having a tab for the request's conversation is preferred.
+    """
+
+    def __init__(
+        self,
+        drivers: List[Any],
+        open_new_chat: Optional[Callable] = None,
+        max_tabs: int = 1,
+        history_size: int = DEFAULT_HISTORY_SIZE,
+    ):
+        if not drivers:
+            raise ValueError("A driver pool needs at least one driver")
+        self.drivers = list(drivers)
+        self.tabs: Dict[Any, ChatTabs] = {
+            driver: ChatTabs(driver, open_new_chat, max_tabs, history_size) for driver in self.drivers
+        }
+        self._idle: List[Any] = list(self.drivers)
+        self._condition = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self.drivers)
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    @contextmanager
+    def checkout(self, conversation_id: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[Any]:
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._idle, timeout):
+                raise queue.Empty()
+            driver = next((driver for driver in self._idle if conversation_id in self.tabs[driver]), self._idle[0])
+            self._idle.remove(driver)
+        try:
+            yield driver
+        finally:
+            with self._condition:
+                self._idle.append(driver)
+                self._condition.notify()
+
+    def quit(self) -> None:
+        for driver in self.drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                logging.warning(f"Error closing browser: {e}")
+
+
+def get_driver_config(config: Config, index: int) -> Config:
+    """
+    Chrome can't share a profile between two running instances, so each extra driver gets its own profile folder.
+    `debugger_address` may list several running browsers separated by commas, one per driver. Drivers without
+    one start their own browser.
+    """
+    debugger_addresses = [address.strip() for address in config.debugger_address.split(",") if address.strip()]
+    if index == 0 and len(debugger_addresses) <= 1:
+        return config
+    driver_config = copy.copy(config)
+    driver_config.debugger_address = debugger_addresses[index] if index < len(debugger_addresses) else ""
+    if index > 0:
+        driver_config.browser_profile_path = f"{config.browser_profile_path}_{index}"
+    return driver_config
+
+
+def create_driver_pool(
+    initialize_driver: Callable, config: Config, open_new_chat: Optional[Callable] = None
+) -> DriverPool:
+    drivers = []
+    for index in range(config.pool_size):
+        logging.info(f"Initializing browser {index + 1}/{config.pool_size}...")
+        drivers.append(initialize_driver(get_driver_config(config, index)))
+    return DriverPool(drivers, open_new_chat, config.max_tabs, config.history_size)
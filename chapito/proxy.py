@@ -1,15 +1,47 @@
+import asyncio
+import hashlib
 import json
-from typing import Callable, List, Optional
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+import math
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 
 import time
 import uuid
 from pydantic import BaseModel, field_validator
 import uvicorn
 import logging
+from selenium.common.exceptions import TimeoutException, WebDriverException
 
+from chapito.backends import Backend, rank_backends
+from chapito.cache import ResponseCache
 from chapito.config import Config
+from chapito.executor import QueueFullError
+from chapito.history import ChatHistory
+from chapito.metrics import (
+    ALLOWED_PACE,
+    COALESCED_REQUESTS,
+    EMPTY_ANSWERS,
+    ERROR_RATE,
+    FAILOVERS,
+    LATENCY,
+    PROMPT_CHARACTERS,
+    QUEUE_DEPTH,
+    RATE_LIMITS,
+    REQUESTS,
+    RESPONSE_CHARACTERS,
+    TIMEOUTS,
+    current_chatbot,
+    render_metrics,
+)
+from chapito.singleflight import InFlightRequests, SharedAnswer
+from chapito.throttle import MAX_WAIT_SECONDS, RATE_LIMIT_COOLDOWN_SECONDS
+from chapito.tools.ratelimit import RateLimitError
+from chapito.tracing import Trace, TraceBuffer, current_trace, span, to_chrome_trace
+
+TRACE_ID_HEADER: str = "X-Trace-Id"
 
 
 async def generate_json_stream(data: dict):
@@ -19,6 +51,35 @@ async def generate_json_stream(data: dict):
     yield "data: [DONE]\n\n"
 
 
+async def generate_live_stream(model: str, future: asyncio.Future, deltas: asyncio.Queue):
+    """
+    Send each part of the answer as soon as the browser sees it. `deltas` ends with `None`.
+    When the browser fails, the stream ends with an error event instead of a `stop`, so the client knows the answer
+    is incomplete.
+    """
+    chunk = {
+        "id": f"chatcmpl-{uuid.uuid4()}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+    }
+
+    def event(delta: dict, finish_reason: Optional[str] = None) -> str:
+        choice = {"index": 0, "delta": delta, "finish_reason": finish_reason}
+        return f"data: {json.dumps({**chunk, 'choices': [choice]})}\n\n"
+
+    yield event({"role": "assistant", "content": ""})
+    while (content := await deltas.get()) is not None:
+        yield event({"content": content})
+    if error := future.exception():
+        logging.error(f"Error while streaming answer: {error}")
+        error_event = {"error": {"message": f"Answer interrupted: {error}", "type": type(error).__name__}}
+        yield f"data: {json.dumps(error_event)}\n\n"
+    else:
+        yield event({}, "stop")
+    yield "data: [DONE]\n\n"
+
+
 class Message(BaseModel):
     role: str
     content: str
@@ -43,13 +104,14 @@ class ChatRequest(BaseModel):
 
 app = FastAPI()
 
-last_chat_messages: List[str] = []
+def build_prompt(messages: List[Message]) -> str:
+    return "\n\n".join(f"[{message.role}] {message.content}" for message in messages)
 
 
-def find_index_from_end(lst: List[Message], values: List[str]) -> int:
+def find_index_from_end(lst: List[Message], history: ChatHistory) -> int:
     for i in range(len(lst) - 1, -1, -1):
         message = lst[i]
-        if message.content.strip() in values:
+        if message.content in history:
             return i
     return -1
 
@@ -58,22 +120,265 @@ def find_index_from_end(lst: List[Message], values: List[str]) -> int:
 async def not_found_handler(request: Request, exc: HTTPException):
     return JSONResponse(status_code=404, content={"message": "Undefined route", "requested_url": request.url.path})
 
+
+@app.exception_handler(RateLimitError)
+async def rate_limit_handler(request: Request, exc: RateLimitError):
+    retry_after = exc.retry_after or RATE_LIMIT_COOLDOWN_SECONDS
+    return JSONResponse(
+        status_code=429, content={"detail": exc.msg}, headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
 @app.get("/models")
-async def get_models(): 
+async def get_models():
+    """
+    Chatbots being served, to use as `model` of a request.
+    """
     return [
         {
-            "name": "chapito",
+            "name": name,
             "type": "chat",
             "censored": True,
-            "description": "Chapito",
-            "baseModel": True
+            "description": f"Chapito - {name}",
+            "baseModel": True,
         }
+        for name in app.state.backends
     ]
 
+
+@app.get("/metrics")
+async def get_metrics():
+    for name, backend in app.state.backends.items():
+        QUEUE_DEPTH.set(backend.executor.queued, chatbot=name)
+        LATENCY.set(backend.health.latency or 0, chatbot=name)
+        ERROR_RATE.set(backend.health.error_rate, chatbot=name)
+        ALLOWED_PACE.set(backend.throttle.requests_per_minute, chatbot=name)
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/traces")
+async def get_traces(output_format: str = Query(default="json", alias="format")):
+    """
+    Last traced requests, most recent first. With `?format=chrome`, as Chrome trace events.
+    """
+    traces = app.state.traces.list() if app.state.traces is not None else []
+    if output_format == "chrome":
+        return JSONResponse(to_chrome_trace(traces))
+    return JSONResponse([trace.to_dict() for trace in traces])
+
+
+@app.get("/debug/traces/{trace_id}")
+async def get_trace(trace_id: str, output_format: str = Query(default="json", alias="format")):
+    trace = app.state.traces.get(trace_id) if app.state.traces is not None else None
+    if trace is None:
+        return JSONResponse(status_code=404, content={"message": "Trace not found", "trace_id": trace_id})
+    if output_format == "chrome":
+        return JSONResponse(to_chrome_trace([trace]))
+    return JSONResponse(trace.to_dict())
+
+
+def get_conversation_id(messages: List[Message], header_value: Optional[str]) -> Optional[str]:
+    """
+    Identify a conversation by the `X-Conversation-Id` header, or by its messages up to the first user message.
+    """
+    if app.state.config.max_tabs <= 1:
+        return None
+    if header_value:
+        return header_value
+    first_user_message = next((i for i, message in enumerate(messages) if message.role == "user"), 0)
+    return hashlib.sha256(build_prompt(messages[: first_user_message + 1]).encode()).hexdigest()[:16]
+
+
+def get_backend(model: str) -> Backend:
+    """
+    Chatbot named by the model of a request, or the default chatbot when the model is not one of them.
+    """
+    backends: Dict[str, Backend] = app.state.backends
+    return backends.get(model.strip().lower()) or backends[app.state.default_backend]
+
+
+def get_candidate_backends(model: str) -> List[Backend]:
+    """
+    Backends to try for a request, in order. Without `failover`, only the chatbot of the request. With it, a
+    request naming a chatbot tries it first, other requests go to the healthiest chatbot, and the other chatbots
+    are tried next.
+    """
+    if not app.state.config.failover:
+        return [get_backend(model)]
+    backends: Dict[str, Backend] = app.state.backends
+    return rank_backends(backends.values(), backends.get(model.strip().lower()))
+
+
+def send_to_chatbot(
+    backend: Backend,
+    messages: List[Message],
+    conversation_id: Optional[str] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    trace: Optional[Trace] = None,
+) -> Tuple[str, str]:
+    """
+    Run the browser round trip on an idle driver, in the tab of the conversation. Blocks until the chatbot has answered.
+    When `on_delta` is given, it receives each part of the answer while it's being written (or the whole answer at
+    once, when the chatbot can't stream).
+    """
+    chatbot = backend.name
+    current_chatbot.set(chatbot)
+    current_trace.set(trace)
+    driver_pool = backend.driver_pool
+    with driver_pool.checkout(conversation_id) as driver:
+        with span("switch_tab"):
+            chat_messages = driver_pool.tabs[driver].switch_to(conversation_id).history
+        with span("find_index_from_end"):
+            index_of_last_message = find_index_from_end(messages, chat_messages)
+        with span("build_prompt"):
+            prompt = build_prompt(messages[index_of_last_message + 1 :])
+        chat_messages.add(messages[-1].content)
+        if not prompt:
+            logging.debug("Can't determine latest messages, sending the whole chat session")
+            prompt = build_prompt(messages)
+
+        REQUESTS.inc(chatbot=chatbot)
+        PROMPT_CHARACTERS.inc(len(prompt), chatbot=chatbot)
+        try:
+            if on_delta and backend.send_request_and_stream_response:
+                response_content = ""
+                for delta in backend.send_request_and_stream_response(driver, prompt):
+                    response_content += delta
+                    on_delta(delta)
+            else:
+                response_content = backend.send_request_and_get_response(driver, prompt)
+                if on_delta and response_content:
+                    on_delta(response_content)
+        except TimeoutException:
+            TIMEOUTS.inc(chatbot=chatbot)
+            raise
+        except RateLimitError as e:
+            RATE_LIMITS.inc(chatbot=chatbot)
+            logging.warning(f"Chatbot {chatbot} is rate limited: {e.notice}")
+            raise
+        RESPONSE_CHARACTERS.inc(len(response_content), chatbot=chatbot)
+        if response_content:
+            chat_messages.add(response_content)
+        else:
+            EMPTY_ANSWERS.inc(chatbot=chatbot)
+    return prompt, response_content
+
+
+def browsers_busy_error() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="All browsers are busy, retry later",
+        headers={"Retry-After": str(app.state.config.retry_after)},
+    )
+
+
+def submit_to_browser(backend: Backend, func: Callable, *args) -> Future:
+    try:
+        return backend.executor.submit(func, *args)
+    except QueueFullError as e:
+        logging.warning(f"Request rejected, browsers of {backend.name} are busy: {e}")
+        raise browsers_busy_error()
+
+
+def rate_limited_error(seconds: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Chatbot is rate limited, retry later",
+        headers={"Retry-After": str(math.ceil(seconds))},
+    )
+
+
+async def ask_backends(
+    backends: List[Backend],
+    cache_keys: Dict[str, str],
+    messages: List[Message],
+    conversation_id: Optional[str] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    trace: Optional[Trace] = None,
+) -> Tuple[str, str]:
+    """
+    Send the request to the first backend, and to the next one when it is busy, rate limited, fails or gives an
+    empty answer. Requests are delayed by the throttle of the backend, up to `MAX_WAIT_SECONDS`.
+    The answer is cached with the key of the backend that gave it in `cache_keys` (empty without cache).
+    Once a part of the answer has been streamed, the request can't be sent again.
+    """
+    streamed = False
+
+    def forward_delta(delta: str) -> None:
+        nonlocal streamed
+        streamed = True
+        on_delta(delta)
+
+    result: Optional[Tuple[str, str]] = None
+    error: Optional[Exception] = None
+    failed: Optional[Backend] = None
+    for backend in backends:
+        if failed is not None:
+            logging.warning(f"Chatbot {failed.name} failed, sending the request to {backend.name}")
+            FAILOVERS.inc(chatbot=failed.name)
+        delay = backend.throttle.reserve(MAX_WAIT_SECONDS)
+        if delay is None:
+            logging.warning(f"Chatbot {backend.name} is paused after a rate limit, request not sent")
+            error = rate_limited_error(backend.throttle.delay())
+            continue
+        if delay:
+            logging.debug(f"Request to {backend.name} delayed by {delay:.1f} seconds to stay under its rate limit")
+            await asyncio.sleep(delay)
+        try:
+            future = submit_to_browser(
+                backend,
+                send_to_chatbot_and_cache,
+                cache_keys.get(backend.name),
+                backend,
+                messages,
+                conversation_id,
+                forward_delta if on_delta else None,
+                trace,
+            )
+        except HTTPException as e:
+            error = e
+            continue
+        try:
+            result = await asyncio.wrap_future(future)
+        except WebDriverException as e:
+            if streamed:
+                raise
+            logging.warning(f"Request to {backend.name} failed: {e.msg}")
+            error = e
+            failed = backend
+            continue
+        if result[1] or streamed:
+            return result
+        failed = backend
+    if result is not None:
+        return result
+    raise error
+
+
+def record_trace(trace: Optional[Trace]) -> None:
+    if trace is not None:
+        app.state.traces.add(trace)
+
+
 @app.post("/chat/completions")
-async def chat_completions(request: ChatRequest):
-    global last_chat_messages
+async def chat_completions(request: ChatRequest, x_conversation_id: Optional[str] = Header(default=None)):
+    """
+    Traced when `trace_buffer_size` is positive: the trace ID is sent in the `X-Trace-Id` header and the trace is
+    recorded once the response has been sent.
+    """
+    trace = Trace("chat_completions") if app.state.traces is not None else None
+    current_trace.set(trace)
+    try:
+        response = await complete_chat(request, x_conversation_id)
+    except Exception:
+        record_trace(trace)
+        raise
+    if trace is not None:
+        response.headers[TRACE_ID_HEADER] = trace.trace_id
+        response.background = BackgroundTask(record_trace, trace)
+    return response
+
 
+async def complete_chat(request: ChatRequest, x_conversation_id: Optional[str]) -> Response:
     logging.debug(f"Request received: {request}")
 
     if not request.messages:
@@ -83,26 +388,66 @@ async def chat_completions(request: ChatRequest):
     if len(request.messages) > 0:
         logging.debug(f"Last relevant message in request: {request.messages[last_revelant_message_position]}")
 
-    index_of_last_message = find_index_from_end(request.messages, last_chat_messages)
-    prompt = "\n\n".join(
-        f"[{message.role}] {message.content}" for message in request.messages[index_of_last_message + 1 :]
-    )
-    last_chat_messages.append(request.messages[-1].content.strip())
-    if not prompt:
-        logging.debug("Can't determine latest messages, sending the whole chat session")
-        prompt = "\n\n".join(f"[{message.role}] {message.content}" for message in request.messages)
-
-    response_content = app.state.send_request_and_get_response(app.state.driver, prompt)
-    if response_content:
-        last_chat_messages.append(response_content)
+    candidates = get_candidate_backends(request.model)
+    conversation_id = get_conversation_id(request.messages, x_conversation_id)
+    chatbot = get_backend(request.model).name
+    with span("build_prompt"):
+        full_prompt = build_prompt(request.messages)
+    cache_keys: Dict[str, str] = {}
+    if app.state.cache is not None:
+        # With failover, the answer may come from another chatbot: it is cached as an answer of that one.
+        cache_keys = {
+            backend.name: ResponseCache.make_key(backend.name, request.model, full_prompt) for backend in candidates
+        }
+        cache_key = ResponseCache.make_key(chatbot, request.model, full_prompt)
+        if (cached_content := app.state.cache.get(cache_key)) is not None:
+            logging.debug("Response found in cache")
+            return send_completion(build_completion(request.model, full_prompt, cached_content))
+
+    stream = bool(app.state.config.stream and candidates[0].send_request_and_stream_response)
+    in_flight: InFlightRequests = app.state.in_flight
+    flight_key = None
+    if app.state.config.coalesce_requests:
+        flight_key = InFlightRequests.make_key(chatbot, full_prompt, stream)
+    if (answer := in_flight.get(flight_key)) is not None:
+        logging.debug("Identical request already being answered, sharing its answer")
+        COALESCED_REQUESTS.inc(chatbot=chatbot)
+    else:
+        if stream:
+            # Once the stream has started, a rejected request can only be reported as an error event.
+            if all(backend.executor.is_full for backend in candidates):
+                raise browsers_busy_error()
+            if (delay := min(backend.throttle.delay() for backend in candidates)) > MAX_WAIT_SECONDS:
+                raise rate_limited_error(delay)
+        loop = asyncio.get_running_loop()
+
+        def send(answer: SharedAnswer):
+            on_delta = (lambda delta: loop.call_soon_threadsafe(answer.publish, delta)) if stream else None
+            return ask_backends(
+                candidates, cache_keys, request.messages, conversation_id, on_delta, current_trace.get()
+            )
+
+        answer = in_flight.start(flight_key, send)
+
+    if stream:
+        logging.debug("Send live StreamingResponse")
+        return StreamingResponse(
+            generate_live_stream(request.model, answer.future, answer.subscribe()), media_type="text/event-stream"
+        )
+
+    # The request goes on for the identical ones if this client leaves.
+    prompt, response_content = await asyncio.shield(answer.future)
     logging.debug(f"Response from chat ends with: {response_content[-100:]}")
     logging.debug("Sending response")
+    return send_completion(build_completion(request.model, prompt, response_content))
+
 
-    data = {
+def build_completion(model: str, prompt: str, response_content: str) -> dict:
+    return {
         "id": f"chatcmpl-{uuid.uuid4()}",
         "object": "chat.completion",
         "created": int(time.time()),
-        "model": request.model,
+        "model": model,
         "choices": [
             {
                 "index": 0,
@@ -118,6 +463,9 @@ async def chat_completions(request: ChatRequest):
             "cost": 0,
         },
     }
+
+
+def send_completion(data: dict):
     if app.state.config.stream:
         logging.debug("Send StreamingResponse")
         return StreamingResponse(generate_json_stream(data), media_type="text/event-stream")
@@ -126,10 +474,45 @@ async def chat_completions(request: ChatRequest):
         return JSONResponse(data)
 
 
-def init_proxy(driver, send_request_and_get_response: Callable, config: Config) -> None:
-    app.state.driver = driver
-    app.state.send_request_and_get_response = send_request_and_get_response
+def send_to_chatbot_and_cache(cache_key: Optional[str], backend: Backend, *args) -> Tuple[str, str]:
+    """
+    Cache the answer from the browser thread: saving the cache file must not block the event loop.
+    The health of the backend is updated with the duration of the round trip, or its failure, and its throttle with
+    the rate limits reported by the chatbot.
+    """
+    start = time.perf_counter()
+    try:
+        prompt, response_content = send_to_chatbot(backend, *args)
+    except RateLimitError as e:
+        backend.throttle.record_rate_limit(e.retry_after)
+        backend.health.record_failure()
+        raise
+    except WebDriverException:
+        backend.health.record_failure()
+        raise
+    if not response_content:
+        backend.health.record_failure()
+        return prompt, response_content
+    backend.health.record_success(time.perf_counter() - start)
+    backend.throttle.record_success()
+    if cache_key:
+        app.state.cache.set(cache_key, response_content)
+    return prompt, response_content
+
+
+def init_proxy(backends: Dict[str, Backend], config: Config) -> None:
+    """
+    Serve the started chatbots. Requests naming none of them go to `config.chatbot`, or to the first one when it
+    couldn't be started.
+    """
+    app.state.backends = backends
+    app.state.default_backend = str(config.chatbot) if config.chatbot in backends else next(iter(backends))
+    app.state.cache = (
+        ResponseCache(config.cache_size, config.cache_ttl, config.cache_path or None) if config.cache_size > 0 else None
+    )
     app.state.config = config
+    app.state.traces = TraceBuffer(config.trace_buffer_size) if config.trace_buffer_size > 0 else None
+    app.state.in_flight = InFlightRequests()
 
     logging.debug(f"Listening on: {config.host}:{config.port}")
 
@@ -0,0 +1,53 @@
+import importlib
+import logging
+from importlib.metadata import EntryPoint, entry_points
+from types import ModuleType
+from typing import Dict, List
+
+from chapito.types import Chatbot
+
+# Other packages can add chatbots by declaring an entry point in this group, named after the chatbot and pointing
+# to their adapter module.
+ENTRY_POINT_GROUP: str = "chapito.adapters"
+
+# Adapters shipped with Chapito, only imported when used.
+ADAPTERS: Dict[str, str] = {
+    Chatbot.AI_STUDIO: "chapito.ai_studio_chat",
+    Chatbot.ANTHROPIC: "chapito.anthropic_chat",
+    Chatbot.DEEPSEEK: "chapito.deepseek_chat",
+    Chatbot.DUCKDUCKGO: "chapito.duckduckgo_chat",
+    Chatbot.GEMINI: "chapito.gemini_chat",
+    Chatbot.GROK: "chapito.grok_chat",
+    Chatbot.KIMI: "chapito.kimi_chat",
+    Chatbot.MISTRAL: "chapito.mistral_chat",
+    Chatbot.OPENAI: "chapito.openai_chat",
+    Chatbot.PERPLEXITY: "chapito.perplexity_chat",
+    Chatbot.QWEN: "chapito.qwen_chat",
+}
+
+
+def get_plugin_adapters() -> Dict[str, EntryPoint]:
+    return {entry_point.name: entry_point for entry_point in entry_points(group=ENTRY_POINT_GROUP)}
+
+
+def is_available(name: str) -> bool:
+    return name in ADAPTERS or name in get_plugin_adapters()
+
+
+def get_adapter_names() -> List[str]:
+    return sorted(set(ADAPTERS) | set(get_plugin_adapters()))
+
+
+def load_adapter(name: str) -> ModuleType:
+    """
+    Import the adapter of a chatbot. An adapter is a module providing `initialize_driver(config)`,
+    `open_new_chat(driver)`, `send_request_and_get_response(driver, message)` and optionally
+    `send_request_and_stream_response(driver, message)`.
+    """
+    if name in ADAPTERS:
+        return importlib.import_module(ADAPTERS[name])
+    entry_point = get_plugin_adapters().get(name)
+    if entry_point is None:
+        raise ValueError(f"No adapter for chatbot: {name}")
+    logging.info(f"Loading adapter {entry_point.value} for chatbot {name}")
+    return entry_point.load()
@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class SharedAnswer:
+    """
+    Answer of a request being sent to a chatbot, shared with the identical requests received meanwhile.
+    The parts of a streamed answer are kept, so that a request joining late still gets all of them.
+    """
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.future: Optional[asyncio.Future] = None
+        self._listeners: List[asyncio.Queue] = []
+
+    def publish(self, part: str) -> None:
+        self.parts.append(part)
+        for listener in self._listeners:
+            listener.put_nowait(part)
+
+    def finish(self) -> None:
+        for listener in self._listeners:
+            listener.put_nowait(None)
+        self._listeners.clear()
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        Queue receiving every part of the answer, the ones already published first, and `None` at the end.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for part in self.parts:
+            queue.put_nowait(part)
+        if self.future is not None and self.future.done():
+            queue.put_nowait(None)
+        else:
+            self._listeners.append(queue)
+        return queue
+
+
+class InFlightRequests:
+    """
+    Answers being sent by the chatbots, by chatbot and prompt, so that identical requests cost one generation.
+    Only used from the event loop.
+    """
+
+    def __init__(self):
+        self._answers: Dict[str, SharedAnswer] = {}
+
+    @staticmethod
+    def make_key(chatbot: str, prompt: str, stream: bool) -> str:
+        return hashlib.sha256("\0".join((chatbot, prompt, str(stream))).encode()).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def get(self, key: Optional[str]) -> Optional[SharedAnswer]:
+        return self._answers.get(key) if key else None
+
+    def start(self, key: Optional[str], send: Callable[[SharedAnswer], Awaitable[Tuple[str, str]]]) -> SharedAnswer:
+        """
+        Send a request with `send`, which publishes the parts of the answer. Identical requests received before its
+        end get the same answer, unless `key` is `None`.
+        """
+        answer = SharedAnswer()
+        answer.future = asyncio.ensure_future(send(answer))
+        if key:
+            self._answers[key] = answer
+
+        def done(future: asyncio.Future) -> None:
+            if key and self._answers.get(key) is answer:
+                del self._answers[key]
+            # The error is reported to each request, not as an unretrieved exception when they all left.
+            if not future.cancelled():
+                future.exception()
+            answer.finish()
+
+        answer.future.add_done_callback(done)
+        return answer
@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# Requests allowed at once, before being paced.
+THROTTLE_BURST: int = 3
+# Longest wait of a request for its turn, requests that would wait longer are rejected.
+MAX_WAIT_SECONDS: float = 30
+# Pause after a rate limit notice that doesn't tell how long to wait.
+RATE_LIMIT_COOLDOWN_SECONDS: float = 300
+# The rate observed over this period, when the chatbot reported a limit, is the base of the new pacing.
+OBSERVATION_SECONDS: float = 600
+# After a rate limit, the pace is lowered to this fraction of the observed rate, then raised at each success.
+RATE_DECREASE_FACTOR: float = 0.5
+RATE_INCREASE_FACTOR: float = 1.1
+MIN_REQUESTS_PER_MINUTE: float = 0.1
+
+
+class Throttle:
+    """
+    Token bucket pacing the requests sent to a chatbot. `requests_per_minute` is the highest pace (0 = not paced
+    until the chatbot reports a limit). When the chatbot shows a rate limit notice, requests are paused for the
+    announced delay and the pace is lowered below the observed rate, then raised again while requests succeed.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, burst: int = THROTTLE_BURST):
+        self.max_requests_per_minute = requests_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._sent: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.requests_per_minute / 60)
+            self.updated = now
+        while self._sent and self._sent[0] < now - OBSERVATION_SECONDS:
+            self._sent.popleft()
+
+    def _delay(self, now: float) -> float:
+        self._refill(now)
+        delay = max(0.0, self.blocked_until - now)
+        if self.requests_per_minute and self.tokens < 1:
+            delay = max(delay, self.updated - now) + (1 - self.tokens) * 60 / self.requests_per_minute
+        return delay
+
+    def delay(self) -> float:
+        """
+        Seconds before a request could be sent now.
+        """
+        with self._lock:
+            return self._delay(time.monotonic())
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        Book the sending of a request and return the seconds to wait before sending it, or `None` (nothing booked)
+        when it would wait longer than `max_wait`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay = self._delay(now)
+            if delay > max_wait:
+                return None
+            if self.requests_per_minute:
+                self.tokens -= 1
+            self._sent.append(now + delay)
+            return delay
+
+    def record_rate_limit(self, retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            observed = len(self._sent) * 60 / OBSERVATION_SECONDS
+            if self.requests_per_minute:
+                observed = min(observed, self.requests_per_minute)
+            self.requests_per_minute = max(MIN_REQUESTS_PER_MINUTE, observed * RATE_DECREASE_FACTOR)
+            self.blocked_until = now + (retry_after or RATE_LIMIT_COOLDOWN_SECONDS)
+            # Requests resume one at a time once the pause is over.
+            self.tokens = 1.0
+            self.updated = self.blocked_until
+
+    def record_success(self) -> None:
+        with self._lock:
+            if not self.requests_per_minute:
+                return
+            self.requests_per_minute *= RATE_INCREASE_FACTOR
+            if self.max_requests_per_minute:
+                self.requests_per_minute = min(self.requests_per_minute, self.max_requests_per_minute)
@@ -0,0 +1,210 @@
+import itertools
+import json
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+import websocket
+from selenium.common.exceptions import JavascriptException, TimeoutException, WebDriverException
+from selenium.webdriver.remote.command import Command
+
+from chapito.tracing import span
+
+CONNECT_TIMEOUT_SECONDS: float = 5
+# Extra time given to a command over the script timeout, before considering the connection lost.
+RECEIVE_MARGIN_SECONDS: float = 10
+DEFAULT_SCRIPT_TIMEOUT_SECONDS: float = 30
+# DevTools commands without state in the DevTools session, that can be sent over any session.
+STATELESS_CDP_COMMANDS = frozenset({"Input.insertText", "Input.dispatchKeyEvent"})
+
+# Run a WebDriver script with its arguments, like `execute_script` and `execute_async_script` do.
+SCRIPT_EXPRESSION: str = "(function() {{ {script}\n}}).apply(null, {arguments})"
+ASYNC_SCRIPT_EXPRESSION: str = """
+new Promise((resolve, reject) => {{
+    const timer = setTimeout(() => reject(new Error("{timeout_message}")), {timeout_ms});
+    const done = (value) => {{
+        clearTimeout(timer);
+        resolve(value);
+    }};
+    (function() {{ {script}\n}}).apply(null, [...{arguments}, done]);
+}})
+"""
+SCRIPT_TIMEOUT_MESSAGE: str = "Chapito script timeout"
+
+
+class CommandLostError(WebDriverException):
+    """
+    The DevTools connection was lost after a command was sent. The command may have run (eg. a prompt submitted), so
+    it must not be sent again.
+    """
+
+
+class CdpConnection:
+    """
+    Persistent DevTools websocket to a browser, with one session per tab. Commands are sent one at a time.
+    """
+
+    def __init__(self, websocket_url: str):
+        self._socket = websocket.create_connection(
+            websocket_url, timeout=CONNECT_TIMEOUT_SECONDS, suppress_origin=True
+        )
+        self._ids = itertools.count(1)
+        self._sessions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, debugger_address: str) -> "CdpConnection":
+        response = requests.get(f"http://{debugger_address}/json/version", timeout=CONNECT_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        return cls(response.json()["webSocketDebuggerUrl"])
+
+    def send(self, method: str, params: dict, session_id: Optional[str] = None, timeout: float = 0) -> dict:
+        """
+        Send a DevTools command and wait for its result. Events received meanwhile are ignored.
+        """
+        with self._lock:
+            message_id = next(self._ids)
+            message: Dict[str, Any] = {"id": message_id, "method": method, "params": params}
+            if session_id:
+                message["sessionId"] = session_id
+            self._socket.settimeout((timeout or DEFAULT_SCRIPT_TIMEOUT_SECONDS) + RECEIVE_MARGIN_SECONDS)
+            self._socket.send(json.dumps(message))
+            try:
+                while True:
+                    response = json.loads(self._socket.recv())
+                    if response.get("id") == message_id:
+                        break
+            except (websocket.WebSocketException, OSError) as e:
+                raise CommandLostError(f"{method} sent but its result was lost: {e}") from e
+        if "error" in response:
+            raise WebDriverException(f"{method} failed: {response['error'].get('message')}")
+        return response["result"]
+
+    def session(self, target_id: str) -> str:
+        """
+        DevTools session of a tab. WebDriver window handles of Chrome are the IDs of their DevTools targets.
+        """
+        if target_id not in self._sessions:
+            result = self.send("Target.attachToTarget", {"targetId": target_id, "flatten": True})
+            self._sessions[target_id] = result["sessionId"]
+        return self._sessions[target_id]
+
+    def evaluate(self, session_id: str, expression: str, timeout: float) -> Any:
+        result = self.send(
+            "Runtime.evaluate",
+            {"expression": expression, "awaitPromise": True, "returnByValue": True},
+            session_id,
+            timeout,
+        )
+        if details := result.get("exceptionDetails"):
+            message = details.get("exception", {}).get("description") or details.get("text", "")
+            if SCRIPT_TIMEOUT_MESSAGE in message:
+                raise TimeoutException(f"Script not finished after {timeout} seconds")
+            raise JavascriptException(message)
+        return result["result"].get("value")
+
+    def close(self) -> None:
+        self._socket.close()
+
+
+def build_script_expression(script: str, args: list, asynchronous: bool, timeout: float) -> str:
+    if asynchronous:
+        return ASYNC_SCRIPT_EXPRESSION.format(
+            script=script,
+            arguments=json.dumps(args),
+            timeout_ms=int(timeout * 1000),
+            timeout_message=SCRIPT_TIMEOUT_MESSAGE,
+        )
+    return SCRIPT_EXPRESSION.format(script=script, arguments=json.dumps(args))
+
+
+def is_json(value: Any) -> bool:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(is_json(item) for item in value)
+    if isinstance(value, dict):
+        return all(isinstance(key, str) and is_json(item) for key, item in value.items())
+    return False
+
+
+def use_cdp_transport(driver) -> bool:
+    """
+    Send scripts and stateless DevTools commands of `driver` over a persistent DevTools websocket, instead of one
+    HTTP request to chromedriver each. Commands on elements (find, click...) and scripts taking elements still go
+    through chromedriver. Return `False` when the browser can't be reached, commands are then left as is.
+    """
+    debugger_address = (driver.capabilities.get("goog:chromeOptions") or {}).get("debuggerAddress")
+    if not debugger_address:
+        logging.warning("Browser has no DevTools address, commands are sent through chromedriver.")
+        return False
+    try:
+        connection = CdpConnection.connect(debugger_address)
+    except (requests.RequestException, websocket.WebSocketException, OSError, KeyError) as e:
+        logging.warning(f"Can't connect to the browser DevTools, commands are sent through chromedriver: {e}")
+        return False
+    logging.info(f"Sending scripts over the DevTools websocket of {debugger_address}")
+
+    execute = driver.execute
+    state: Dict[str, Any] = {
+        "handle": driver.current_window_handle,
+        "script_timeout": DEFAULT_SCRIPT_TIMEOUT_SECONDS,
+        "connected": True,
+    }
+
+    def can_send_over_cdp(driver_command: str, params: dict) -> bool:
+        if not state["connected"] or not state["handle"]:
+            return False
+        if driver_command in (Command.W3C_EXECUTE_SCRIPT, Command.W3C_EXECUTE_SCRIPT_ASYNC):
+            return is_json(params["args"])
+        return driver_command == "executeCdpCommand" and params["cmd"] in STATELESS_CDP_COMMANDS
+
+    def send_over_cdp(driver_command: str, params: dict, session_id: str) -> Any:
+        if driver_command == "executeCdpCommand":
+            with span(f"cdp.{params['cmd']}"):
+                return connection.send(params["cmd"], params["params"], session_id)
+        asynchronous = driver_command == Command.W3C_EXECUTE_SCRIPT_ASYNC
+        timeout = state["script_timeout"]
+        expression = build_script_expression(params["script"], params["args"], asynchronous, timeout)
+        with span("cdp.Runtime.evaluate"):
+            return connection.evaluate(session_id, expression, timeout)
+
+    def cdp_execute(driver_command: str, params: Optional[dict] = None):
+        params = params or {}
+        session_id = None
+        if can_send_over_cdp(driver_command, params):
+            try:
+                session_id = connection.session(state["handle"])
+                return {"value": send_over_cdp(driver_command, params, session_id)}
+            except (websocket.WebSocketException, OSError) as e:
+                # The command couldn't be sent, it can go through chromedriver instead.
+                logging.warning(f"DevTools connection lost, commands are sent through chromedriver again: {e}")
+                state["connected"] = False
+            except CommandLostError as e:
+                logging.warning(f"DevTools connection lost, commands are sent through chromedriver again: {e.msg}")
+                state["connected"] = False
+                # The command may have run, sending it again could eg. submit the prompt twice. Only the attachment
+                # to the tab may have been lost, the command then goes through chromedriver.
+                if session_id is not None:
+                    raise
+            except WebDriverException as e:
+                if session_id is not None:
+                    raise
+                logging.warning(f"Can't attach to the tab over DevTools, commands are sent through chromedriver: {e}")
+                state["connected"] = False
+        response = execute(driver_command, params)
+        if driver_command == Command.SWITCH_TO_WINDOW:
+            state["handle"] = params["handle"]
+        elif driver_command == Command.NEW_WINDOW:
+            state["handle"] = response["value"]["handle"]
+        elif driver_command == Command.CLOSE:
+            state["handle"] = None
+        elif driver_command == Command.SET_TIMEOUTS and params.get("script") is not None:
+            state["script_timeout"] = params["script"] / 1000
+        elif driver_command == Command.QUIT:
+            connection.close()
+        return response
+
+    driver.execute = cdp_execute
+    return True
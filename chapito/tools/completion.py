@@ -0,0 +1,164 @@
+import logging
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+from chapito.metrics import measure_phase
+from chapito.tools.ratelimit import DEFAULT_RATE_LIMIT_RULES, RateLimitError, RateLimitRules
+
+DEFAULT_QUIET_PERIOD_SECONDS: float = 1.0
+quiet_period_seconds: float = DEFAULT_QUIET_PERIOD_SECONDS
+# Longest wait for an answer, whatever the timeout of the chatbot (0 = no limit).
+answer_timeout_seconds: float = 0
+
+# Watches the page with a MutationObserver. `busy` is set once the "finished" element has disappeared after the
+# prompt was submitted (the chatbot started to answer), `lastMutation` tells how long the page has been stable.
+# `findRateLimit` returns the text of a rate limit notice shown in the page, if any.
+START_DETECTOR_SCRIPT: str = """
+const [selector, rateLimitSelector, rateLimitPatterns] = arguments;
+let state = window.__chapitoCompletion;
+if (!state) {
+    state = {listeners: new Set()};
+    state.observer = new MutationObserver(() => {
+        state.lastMutation = Date.now();
+        if (state.selector && !document.querySelector(state.selector)) {
+            state.busy = true;
+        }
+        state.listeners.forEach((listener) => listener());
+    });
+    state.observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+    window.__chapitoCompletion = state;
+}
+state.selector = selector;
+state.lastMutation = Date.now();
+state.busy = false;
+state.findRateLimit = () => {
+    for (const element of document.querySelectorAll(rateLimitSelector)) {
+        const text = (element.innerText || "").trim();
+        if (rateLimitPatterns.some((pattern) => text.toLowerCase().includes(pattern))) {
+            return text.slice(0, 500);
+        }
+    }
+    return null;
+};
+"""
+
+IS_FINISHED_SCRIPT: str = """
+const state = window.__chapitoCompletion;
+if (!state) {
+    return true;
+}
+const rateLimit = state.findRateLimit && state.findRateLimit();
+if (rateLimit) {
+    return rateLimit;
+}
+return state.busy && Date.now() - state.lastMutation >= arguments[0] && !!document.querySelector(state.selector);
+"""
+
+WAIT_FOR_COMPLETION_SCRIPT: str = """
+const [quietMs, timeoutMs, done] = arguments;
+const state = window.__chapitoCompletion;
+if (!state) {
+    done(true);
+    return;
+}
+let timer = null;
+const finish = (result) => {
+    clearTimeout(timer);
+    clearTimeout(deadline);
+    state.listeners.delete(arm);
+    done(result);
+};
+const check = () => {
+    const rateLimit = state.findRateLimit && state.findRateLimit();
+    if (rateLimit) {
+        finish(rateLimit);
+        return;
+    }
+    const quietFor = Date.now() - state.lastMutation;
+    if (state.busy && quietFor >= quietMs && document.querySelector(state.selector)) {
+        finish(true);
+    } else {
+        timer = setTimeout(check, Math.max(quietMs - quietFor, 50));
+    }
+};
+const arm = () => {
+    clearTimeout(timer);
+    timer = setTimeout(check, quietMs);
+};
+const deadline = setTimeout(() => finish((state.findRateLimit && state.findRateLimit()) || false), timeoutMs);
+state.listeners.add(arm);
+check();
+"""
+
+
+def set_quiet_period(seconds: float) -> None:
+    global quiet_period_seconds
+    quiet_period_seconds = seconds
+
+
+def set_answer_timeout(seconds: float) -> None:
+    global answer_timeout_seconds
+    answer_timeout_seconds = seconds
+
+
+def get_answer_timeout(timeout: float) -> float:
+    return min(timeout, answer_timeout_seconds) if answer_timeout_seconds > 0 else timeout
+
+
+@measure_phase("submit_button")
+def wait_for_submit_button(driver, css_selector: str, timeout: float, index: int = 0):
+    """
+    Wait for the submit button to be enabled (chatbots enable it once the prompt is processed) and return it.
+    """
+
+    def enabled_button(driver):
+        buttons = driver.find_elements(By.CSS_SELECTOR, css_selector)
+        if not buttons:
+            return False
+        button = buttons[index]
+        if button.get_attribute("disabled") is not None or button.get_attribute("aria-disabled") == "true":
+            return False
+        return button
+
+    return WebDriverWait(driver, timeout).until(enabled_button)
+
+
+def start_completion_detector(
+    driver, finished_css_selector: str, rate_limit: RateLimitRules = DEFAULT_RATE_LIMIT_RULES
+) -> None:
+    """
+    Start watching the page. Must be called right before submitting the prompt.
+    `finished_css_selector` matches an element only displayed when the chatbot isn't writing (eg. submit button).
+    `rate_limit` tells how the chatbot shows it has been sent too many messages.
+    """
+    driver.execute_script(START_DETECTOR_SCRIPT, finished_css_selector, rate_limit.selector, list(rate_limit.patterns))
+
+
+def is_generation_finished(driver) -> bool:
+    """
+    Raise `RateLimitError` when the chatbot shows a rate limit notice instead of answering.
+    """
+    finished = driver.execute_script(IS_FINISHED_SCRIPT, int(quiet_period_seconds * 1000))
+    if isinstance(finished, str):
+        raise RateLimitError(finished)
+    return bool(finished)
+
+
+@measure_phase("generation")
+def wait_for_completion(driver, timeout: float) -> None:
+    """
+    Wait until the chatbot has started writing, its "finished" element is back and the page has been stable for
+    the quiet period. Raise `RateLimitError` as soon as the chatbot shows a rate limit notice.
+    """
+    logging.debug("Wait for answer to be finished")
+    timeout = get_answer_timeout(timeout)
+    driver.set_script_timeout(timeout + 5)
+    finished = driver.execute_async_script(
+        WAIT_FOR_COMPLETION_SCRIPT, int(quiet_period_seconds * 1000), int(timeout * 1000)
+    )
+    if isinstance(finished, str):
+        raise RateLimitError(finished)
+    if not finished:
+        raise TimeoutException(f"Answer not finished after {timeout} seconds")
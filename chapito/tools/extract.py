@@ -0,0 +1,193 @@
+import dataclasses
+import logging
+from typing import Tuple
+
+from chapito.metrics import measure_phase
+from chapito.tools.markdown import MarkdownRules, html_to_markdown
+
+extract_in_browser: bool = False
+
+# Same conversion as `html_to_markdown`, done on the DOM of the last answer. Texts are joined the way the HTML
+# parser would have read them from `outerHTML`, so both ways give the same markdown.
+EXTRACT_ANSWER_SCRIPT: str = """
+const [by, locator, rules] = arguments;
+let count, answer;
+if (by === "xpath") {
+    const result = document.evaluate(locator, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    count = result.snapshotLength;
+    answer = count ? result.snapshotItem(count - 1) : null;
+} else {
+    const nodes = document.querySelectorAll(locator);
+    count = nodes.length;
+    answer = count ? nodes[count - 1] : null;
+}
+if (!answer) {
+    return [0, ""];
+}
+
+const PRESERVE_WHITESPACE = new Set(["pre", "textarea"]);
+const HIDDEN_TEXT = new Set(["rp", "rt", "script", "style", "template"]);
+const ASCII_SPACES = /^[\\x20\\n\\t\\f\\r]*$/;
+// Whitespace removed by Python's `str.strip()`.
+const SPACES = "[\\\\t\\\\n\\\\v\\\\f\\\\r\\\\x1c-\\\\x20\\\\x85\\\\xa0\\\\u1680" +
+    "\\\\u2000-\\\\u200a\\\\u2028\\\\u2029\\\\u202f\\\\u205f\\\\u3000]+";
+const STRIP = new RegExp(`^${SPACES}|${SPACES}$`, "g");
+
+const matches = (selector, tag, element) => {
+    if (!selector || selector.tag !== tag) {
+        return false;
+    }
+    if (selector.class_name !== null) {
+        const classes = element.getAttribute("class") || "";
+        if (!classes.split(/\\s+/).includes(selector.class_name) && classes !== selector.class_name) {
+            return false;
+        }
+    }
+    return selector.style === null || (element.getAttribute("style") || "").includes(selector.style);
+};
+const ruleTags = new Set(Object.keys(rules.wrap));
+for (const selector of [rules.code_block, rules.code, ...rules.drop]) {
+    if (selector) {
+        ruleTags.add(selector.tag);
+    }
+}
+
+const texts = [];
+const targets = [texts];
+const data = [];
+let block = null, kept = 0, dropped = 0, preserve = 0, hidden = 0;
+
+const emit = (text) => {
+    const target = targets[targets.length - 1];
+    if (target) {
+        target.push(text);
+    }
+};
+const flush = () => {
+    if (!data.length) {
+        return;
+    }
+    let text = data.join("");
+    data.length = 0;
+    if (!text || hidden) {
+        return;
+    }
+    if (!preserve && ASCII_SPACES.test(text)) {
+        text = text.includes("\\n") ? "\\n" : " ";
+    }
+    emit(text);
+};
+const visitChildren = (node) => {
+    const children = node.localName === "template" && node.content ? node.content.childNodes : node.childNodes;
+    for (const child of children) {
+        if (child.nodeType === Node.TEXT_NODE || child.nodeType === Node.CDATA_SECTION_NODE) {
+            data.push(child.nodeValue);
+        } else if (child.nodeType === Node.ELEMENT_NODE) {
+            visitElement(child);
+        } else {
+            flush();
+        }
+    }
+};
+const visitElement = (node) => {
+    flush();
+    const tag = node.localName.toLowerCase();
+    const element = {targets: 0, closeText: null, closeTarget: null, kept: null, block: null, dropped: false};
+    if (!dropped && ruleTags.has(tag)) {
+        if (block && matches(rules.code, tag, node)) {
+            element.kept = element.closeTarget = [];
+            block.push(element.kept);
+            targets.push(element.kept);
+            element.targets++;
+            kept++;
+            const wrap = rules.code_wrap || rules.wrap[tag];
+            if (wrap) {
+                element.kept.push(wrap[0]);
+                element.closeText = wrap[1];
+            }
+        } else if (tag in rules.wrap) {
+            emit(rules.wrap[tag][0]);
+            element.closeText = rules.wrap[tag][1];
+        }
+        if (rules.drop.some((selector) => matches(selector, tag, node))) {
+            targets.push(null);
+            element.targets++;
+            element.dropped = true;
+            dropped++;
+        }
+        if (!(rules.flatten_code && kept) && matches(rules.code_block, tag, node)) {
+            if (!block) {
+                block = element.block = [];
+            }
+            targets.push(null);
+            element.targets++;
+        }
+    }
+    const isPreserved = PRESERVE_WHITESPACE.has(tag), isHidden = HIDDEN_TEXT.has(tag);
+    preserve += isPreserved;
+    hidden += isHidden;
+    visitChildren(node);
+    flush();
+    preserve -= isPreserved;
+    hidden -= isHidden;
+    targets.length -= element.targets;
+    dropped -= element.dropped;
+    if (element.kept) {
+        kept--;
+        if (rules.flatten_code) {
+            const text = element.kept.join("");
+            element.kept.splice(0, element.kept.length, text);
+            emit(text);
+        }
+    }
+    if (element.closeText !== null) {
+        if (element.closeTarget) {
+            element.closeTarget.push(element.closeText);
+        } else {
+            emit(element.closeText);
+        }
+    }
+    if (element.block) {
+        block = null;
+        let blockTexts = element.block.flat();
+        if (rules.code_block_wrap) {
+            const keptCount = element.block.length;
+            const [before, after] = rules.code_block_wrap;
+            blockTexts = [...Array(keptCount).fill(before), ...blockTexts, ...Array(keptCount).fill(after)];
+        }
+        blockTexts.forEach(emit);
+    }
+};
+
+visitElement(answer);
+let markdown = texts.join(rules.separator).replace(STRIP, "");
+if (rules.collapse_newlines) {
+    markdown = markdown.replace(/\\n{2,}/g, "\\n");
+}
+return [count, markdown];
+"""
+
+
+def set_extract_in_browser(enabled: bool) -> None:
+    global extract_in_browser
+    extract_in_browser = enabled
+
+
+def extract_last_answer(driver, by: str, value: str, rules: MarkdownRules) -> Tuple[int, str]:
+    """
+    Return the number of answers found with the locator, and the last one converted to markdown.
+    With `extract_in_browser`, the conversion runs in the page and only the markdown goes through WebDriver.
+    """
+    if extract_in_browser:
+        # Fetch and conversion are a single call, measured as a fetch.
+        with measure_phase("answer_fetch"):
+            count, markdown = driver.execute_script(EXTRACT_ANSWER_SCRIPT, by, value, dataclasses.asdict(rules))
+        return count, markdown
+    with measure_phase("answer_fetch"):
+        message_bubbles = driver.find_elements(by, value)
+        if not message_bubbles:
+            return 0, ""
+        html = message_bubbles[-1].get_attribute("outerHTML")
+    logging.debug("Clean chat answer")
+    with measure_phase("clean_answer"):
+        return len(message_bubbles), html_to_markdown(html, rules) if html else ""
@@ -0,0 +1,263 @@
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+CODE_FENCES: Tuple[str, str] = ("```\n", "\n```\n")
+CODE_FENCES_ON_NEW_LINE: Tuple[str, str] = ("\n```\n", "\n```\n")
+INLINE_CODE: Tuple[str, str] = ("`", "`")
+
+# Elements without end tag, closed as soon as they are opened.
+VOID_ELEMENTS = frozenset(
+    {
+        "area", "base", "basefont", "bgsound", "br", "col", "command", "embed", "frame", "hr", "image", "img",
+        "input", "isindex", "keygen", "link", "menuitem", "meta", "nextid", "param", "source", "spacer", "track",
+        "wbr",
+    }
+)
+# Elements whose whitespace-only texts are kept as is.
+PRESERVE_WHITESPACE_ELEMENTS = frozenset({"pre", "textarea"})
+# Elements whose texts are not part of the answer.
+HIDDEN_TEXT_ELEMENTS = frozenset({"rp", "rt", "script", "style", "template"})
+ASCII_SPACES: str = "\x20\x0a\x09\x0c\x0d"
+MULTIPLE_NEWLINES = re.compile(r"\n{2,}")
+
+
+@dataclass(frozen=True)
+class Selector:
+    """
+    Match elements by tag, and optionally by one of their classes and a part of their `style` attribute.
+    """
+
+    tag: str
+    class_name: Optional[str] = None
+    style: Optional[str] = None
+
+    def matches(self, tag: str, attributes: Dict[str, Optional[str]]) -> bool:
+        if tag != self.tag:
+            return False
+        if self.class_name is not None:
+            classes = attributes.get("class") or ""
+            if self.class_name not in classes.split() and self.class_name != classes:
+                return False
+        if self.style is not None and self.style not in (attributes.get("style") or ""):
+            return False
+        return True
+
+
+@dataclass(frozen=True)
+class MarkdownRules:
+    """
+    How a chatbot answer is turned into markdown.
+    - `code_block`: element holding a code block and its decorations (language, copy button...).
+    - `code`: elements kept inside a code block, everything else in the block is removed.
+    - `code_wrap`: text added around each kept element.
+    - `flatten_code`: kept elements are replaced by their whole text, including nested kept elements.
+    - `code_block_wrap`: text added around the code block, once per kept element.
+    - `wrap`: text added around elements with these tags (eg. code fences or backticks), unless `code_wrap` is
+      already used.
+    - `drop`: elements whose content is removed.
+    - `separator`: text inserted between all texts of the answer, and `collapse_newlines` removes empty lines.
+    """
+
+    code_block: Optional[Selector] = None
+    code: Optional[Selector] = None
+    code_wrap: Optional[Tuple[str, str]] = None
+    flatten_code: bool = False
+    code_block_wrap: Optional[Tuple[str, str]] = None
+    wrap: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+    drop: Tuple[Selector, ...] = ()
+    separator: str = ""
+    collapse_newlines: bool = False
+
+
+class _Element:
+    __slots__ = ("tag", "targets", "close_text", "close_target", "kept", "block", "dropped", "preserve", "hidden")
+
+    def __init__(self, tag: str):
+        self.tag = tag
+        self.targets = 0
+        self.close_text: Optional[str] = None
+        self.close_target: Optional[List[str]] = None
+        self.kept: Optional[List[str]] = None
+        self.block: Optional[List[List[str]]] = None
+        self.dropped = False
+        self.preserve = tag in PRESERVE_WHITESPACE_ELEMENTS
+        self.hidden = tag in HIDDEN_TEXT_ELEMENTS
+
+
+class _MarkdownConverter(HTMLParser):
+    """
+    Single pass over the HTML: texts are written as soon as they are parsed, to the answer, to the code kept from
+    the current code block, or nowhere when they are removed.
+    Produces the same texts as `BeautifulSoup(html, "html.parser").get_text()` on the restructured answer.
+    """
+
+    def __init__(self, rules: MarkdownRules):
+        super().__init__(convert_charrefs=True)
+        self.rules = rules
+        self.texts: List[str] = []
+        self._rule_tags = set(rules.wrap) | {selector.tag for selector in rules.drop}
+        for selector in (rules.code_block, rules.code):
+            if selector is not None:
+                self._rule_tags.add(selector.tag)
+        self._data: List[str] = []
+        self._open: List[_Element] = []
+        self._open_counts: Dict[str, int] = {}
+        self._closed_void_elements: List[str] = []
+        # Where texts go: the answer, a kept element of a code block, or `None` when they are removed.
+        self._targets: List[Optional[List[str]]] = [self.texts]
+        self._block: Optional[List[List[str]]] = None
+        self._kept = 0
+        self._dropped = 0
+        self._preserve = 0
+        self._hidden = 0
+
+    def _emit(self, text: str) -> None:
+        target = self._targets[-1]
+        if target is not None:
+            target.append(text)
+
+    def _flush_data(self) -> None:
+        if not self._data:
+            return
+        text = "".join(self._data)
+        self._data.clear()
+        if self._hidden:
+            return
+        if not self._preserve and not text.strip(ASCII_SPACES):
+            text = "\n" if "\n" in text else " "
+        self._emit(text)
+
+    def _apply_rules(self, element: _Element, attributes: Dict[str, Optional[str]]) -> None:
+        rules = self.rules
+        tag = element.tag
+        if self._block is not None and rules.code is not None and rules.code.matches(tag, attributes):
+            kept: List[str] = []
+            self._block.append(kept)
+            self._targets.append(kept)
+            element.targets += 1
+            element.kept = element.close_target = kept
+            self._kept += 1
+            wrap = rules.code_wrap or rules.wrap.get(tag)
+            if wrap:
+                kept.append(wrap[0])
+                element.close_text = wrap[1]
+        elif tag in rules.wrap:
+            before, element.close_text = rules.wrap[tag]
+            self._emit(before)
+        if any(selector.matches(tag, attributes) for selector in rules.drop):
+            self._targets.append(None)
+            element.targets += 1
+            element.dropped = True
+            self._dropped += 1
+        # A flattened element keeps all its text, even from the code blocks it contains.
+        flattening = rules.flatten_code and self._kept
+        if not flattening and rules.code_block is not None and rules.code_block.matches(tag, attributes):
+            if self._block is None:
+                self._block = element.block = []
+            self._targets.append(None)
+            element.targets += 1
+
+    def _close(self, element: _Element) -> None:
+        self._open_counts[element.tag] -= 1
+        del self._targets[len(self._targets) - element.targets :]
+        self._dropped -= element.dropped
+        self._preserve -= element.preserve
+        self._hidden -= element.hidden
+        if element.kept is not None:
+            self._kept -= 1
+        if element.kept is not None and self.rules.flatten_code:
+            text = "".join(element.kept)
+            element.kept[:] = [text]
+            # The text of a kept element includes the text of the kept elements it contains.
+            self._emit(text)
+        if element.close_text is not None:
+            if element.close_target is not None:
+                element.close_target.append(element.close_text)
+            else:
+                self._emit(element.close_text)
+        if element.block is not None:
+            self._block = None
+            texts = [text for kept in element.block for text in kept]
+            if self.rules.code_block_wrap:
+                before, after = self.rules.code_block_wrap
+                count = len(element.block)
+                texts = [before] * count + texts + [after] * count
+            for text in texts:
+                self._emit(text)
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._flush_data()
+        element = _Element(tag)
+        if not self._dropped and tag in self._rule_tags:
+            self._apply_rules(element, dict(attrs))
+        self._open.append(element)
+        self._open_counts[tag] = self._open_counts.get(tag, 0) + 1
+        self._preserve += element.preserve
+        self._hidden += element.hidden
+        if tag in VOID_ELEMENTS:
+            self._close(self._open.pop())
+            # An explicit end tag may follow, it must not close another element.
+            self._closed_void_elements.append(tag)
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self.handle_starttag(tag, attrs)
+        if tag in VOID_ELEMENTS:
+            self._closed_void_elements.remove(tag)
+        else:
+            self._close_up_to(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._closed_void_elements:
+            self._closed_void_elements.remove(tag)
+            return
+        self._flush_data()
+        self._close_up_to(tag)
+
+    def _close_up_to(self, tag: str) -> None:
+        # Like browsers, an end tag also closes the elements opened after its start tag.
+        if not self._open_counts.get(tag):
+            return
+        while True:
+            element = self._open.pop()
+            self._close(element)
+            if element.tag == tag:
+                return
+
+    def handle_data(self, data: str) -> None:
+        self._data.append(data)
+
+    def unknown_decl(self, data: str) -> None:
+        self._flush_data()
+        if data.upper().startswith("CDATA["):
+            self._data.append(data[len("CDATA[") :])
+            self._flush_data()
+
+    def handle_comment(self, data: str) -> None:
+        self._flush_data()
+
+    def handle_decl(self, decl: str) -> None:
+        self._flush_data()
+
+    def handle_pi(self, data: str) -> None:
+        self._flush_data()
+
+    def close(self) -> None:
+        super().close()
+        self._flush_data()
+        while self._open:
+            self._close(self._open.pop())
+
+
+def html_to_markdown(html: str, rules: MarkdownRules) -> str:
+    """
+    Convert the HTML of a chatbot answer to markdown: code blocks are fenced and their decorations removed.
+    """
+    converter = _MarkdownConverter(rules)
+    converter.feed(html)
+    converter.close()
+    text = rules.separator.join(converter.texts).strip()
+    if rules.collapse_newlines:
+        text = MULTIPLE_NEWLINES.sub("\n", text)
+    return text
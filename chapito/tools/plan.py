@@ -0,0 +1,172 @@
+import dataclasses
+import logging
+from dataclasses import dataclass
+from typing import Dict
+
+from selenium.common.exceptions import TimeoutException
+
+from chapito.metrics import PHASE_SECONDS, current_chatbot
+from chapito.tools import completion, tools
+from chapito.tools.completion import START_DETECTOR_SCRIPT, WAIT_FOR_COMPLETION_SCRIPT, get_answer_timeout
+from chapito.tools.ratelimit import DEFAULT_RATE_LIMIT_RULES, RateLimitError, RateLimitRules
+from chapito.tools.tools import CLEAR_PROMPT_SCRIPT, COUNT_PROMPT_CHARACTERS_SCRIPT, INSERT_PROMPT_SCRIPT
+
+# Send the prompts with one script per request instead of one WebDriver command per step.
+interaction_plans: bool = False
+# Statuses of a plan stopped before anything was sent, the prompt is then sent step by step.
+NOT_SENT_STATUSES = frozenset({"no_input", "not_inserted"})
+
+
+@dataclass(frozen=True)
+class InteractionPlan:
+    """
+    How to send a prompt to a chatbot: its input found with `input_by` (a Selenium `By`) and `input_locator`, its
+    submit button, and the element only displayed when the chatbot isn't writing (see `start_completion_detector`).
+    Indexes pick an element among the matching ones, -1 for the last one.
+    """
+
+    input_by: str
+    input_locator: str
+    submit_css_selector: str
+    finished_css_selector: str
+    input_index: int = 0
+    submit_index: int = 0
+    rate_limit: RateLimitRules = DEFAULT_RATE_LIMIT_RULES
+
+
+def as_function(script: str) -> str:
+    return f"function() {{{script}}}"
+
+
+# Run the steps of `transfer_prompt`, `wait_for_submit_button`, `start_completion_detector` and `wait_for_completion`
+# inside the page, reusing their scripts. Returns the status of the plan and the duration of each phase reached.
+RUN_PLAN_SCRIPT: str = f"""
+const countCharacters = {as_function(COUNT_PROMPT_CHARACTERS_SCRIPT)};
+const insertPrompt = {as_function(INSERT_PROMPT_SCRIPT)};
+const clearPrompt = {as_function(CLEAR_PROMPT_SCRIPT)};
+const startDetector = {as_function(START_DETECTOR_SCRIPT)};
+const waitForCompletion = {as_function(WAIT_FOR_COMPLETION_SCRIPT)};
+"""
+RUN_PLAN_SCRIPT += """
+const [plan, prompt, quietMs, timeoutMs, waitForAnswer, done] = arguments;
+const durations = {};
+let phaseStart = Date.now();
+const endPhase = (phase) => {
+    durations[phase] = Date.now() - phaseStart;
+    phaseStart = Date.now();
+};
+const report = (status, notice) => done({status: status, notice: notice || null, durations: durations});
+const find = (by, locator) => {
+    if (by === "xpath") {
+        const result = document.evaluate(locator, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        return Array.from({length: result.snapshotLength}, (_, index) => result.snapshotItem(index));
+    }
+    if (by === "tag name") {
+        return Array.from(document.getElementsByTagName(locator));
+    }
+    if (by === "class name") {
+        return Array.from(document.getElementsByClassName(locator));
+    }
+    return Array.from(document.querySelectorAll(locator));
+};
+const pick = (elements, index) => elements[index < 0 ? elements.length + index : index];
+
+const input = pick(find(plan.input_by, plan.input_locator), plan.input_index);
+if (!input) {
+    report("no_input");
+    return;
+}
+const expectedCharacters = prompt.replace(/\\s/g, "").length;
+const initialCharacters = countCharacters(input);
+insertPrompt(input, prompt);
+if (countCharacters(input) - initialCharacters !== expectedCharacters) {
+    clearPrompt(input);
+    report("not_inserted");
+    return;
+}
+endPhase("transfer_prompt");
+
+const enabledButton = () => {
+    const button = pick(Array.from(document.querySelectorAll(plan.submit_css_selector)), plan.submit_index);
+    if (!button || button.disabled || button.hasAttribute("disabled")) {
+        return null;
+    }
+    return button.getAttribute("aria-disabled") === "true" ? null : button;
+};
+const submitDeadline = Date.now() + timeoutMs;
+const submit = () => {
+    const button = enabledButton();
+    if (!button) {
+        if (Date.now() > submitDeadline) {
+            report("submit_disabled");
+        } else {
+            setTimeout(submit, 50);
+        }
+        return;
+    }
+    endPhase("submit_button");
+    startDetector(plan.finished_css_selector, plan.rate_limit.selector, plan.rate_limit.patterns);
+    button.click();
+    if (!waitForAnswer) {
+        report("submitted");
+        return;
+    }
+    waitForCompletion(quietMs, timeoutMs, (finished) => {
+        endPhase("generation");
+        if (typeof finished === "string") {
+            report("rate_limited", finished);
+        } else {
+            report(finished ? "finished" : "timeout");
+        }
+    });
+};
+submit();
+"""
+
+
+def set_interaction_plans(enabled: bool) -> None:
+    global interaction_plans
+    interaction_plans = enabled
+
+
+def record_phases(durations: Dict[str, int]) -> None:
+    for phase, milliseconds in durations.items():
+        PHASE_SECONDS.observe(milliseconds / 1000, chatbot=current_chatbot.get(), phase=phase)
+
+
+def run_interaction_plan(
+    driver, message: str, plan: InteractionPlan, timeout: float, wait_for_answer: bool = True
+) -> bool:
+    """
+    Send the prompt with a single script running the steps of `plan` in the page: insert the prompt, wait for the
+    submit button, start the completion detector, submit and, with `wait_for_answer`, wait for the answer.
+    Return `False` when nothing has been sent (plans disabled, prompt to attach as a file, input not found or
+    prompt not inserted): the adapter then sends it step by step. Errors are the ones of the step by step sending.
+    """
+    if not interaction_plans or (tools.upload_threshold and len(message) > tools.upload_threshold):
+        return False
+    logging.debug("Send request to chatbot interface with its interaction plan")
+    timeout = get_answer_timeout(timeout)
+    # Waits for the submit button and for the answer.
+    driver.set_script_timeout(2 * timeout + 5)
+    result = driver.execute_async_script(
+        RUN_PLAN_SCRIPT,
+        dataclasses.asdict(plan),
+        message,
+        int(completion.quiet_period_seconds * 1000),
+        int(timeout * 1000),
+        wait_for_answer,
+    )
+    record_phases(result["durations"])
+    status = result["status"]
+    if status in NOT_SENT_STATUSES:
+        logging.debug(f"Interaction plan stopped before sending ({status}), sending the prompt step by step")
+        return False
+    if status == "submit_disabled":
+        raise TimeoutException(f"Submit button not enabled after {timeout} seconds")
+    if status == "rate_limited":
+        raise RateLimitError(result["notice"])
+    if status == "timeout":
+        raise TimeoutException(f"Answer not finished after {timeout} seconds")
+    return True
+
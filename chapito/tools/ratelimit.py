@@ -0,0 +1,59 @@
+import re
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from selenium.common.exceptions import WebDriverException
+
+# Elements where chatbots show their notices: alerts, dialogs and toasts.
+DEFAULT_RATE_LIMIT_SELECTOR: str = '[role="alert"], [role="alertdialog"], [role="dialog"], [data-sonner-toast]'
+# Texts of the notices shown when too many messages have been sent, in lower case.
+DEFAULT_RATE_LIMIT_PATTERNS: Tuple[str, ...] = (
+    "too many requests",
+    "too many messages",
+    "rate limit",
+    "limit reached",
+    "reached your limit",
+    "reached our limit",
+    "reached the limit",
+    "hit your limit",
+    "usage limit",
+    "message limit",
+)
+# Delay announced by a notice, eg. "try again in 2 hours".
+RETRY_AFTER_PATTERN = re.compile(r"(\d+)\s*(second|sec|minute|min|hour|hr)s?\b", re.IGNORECASE)
+RETRY_AFTER_UNITS = {"sec": 1, "min": 60, "hr": 3600, "second": 1, "minute": 60, "hour": 3600}
+
+
+@dataclass(frozen=True)
+class RateLimitRules:
+    """
+    How a chatbot tells it has been sent too many messages: a notice matching `selector` whose text contains one of
+    `patterns` (in lower case).
+    """
+
+    selector: str = DEFAULT_RATE_LIMIT_SELECTOR
+    patterns: Tuple[str, ...] = DEFAULT_RATE_LIMIT_PATTERNS
+
+
+DEFAULT_RATE_LIMIT_RULES: RateLimitRules = RateLimitRules()
+
+
+def parse_retry_after(text: str) -> Optional[float]:
+    """
+    Seconds to wait announced by a rate limit notice, `None` when it doesn't tell.
+    """
+    match = RETRY_AFTER_PATTERN.search(text)
+    if not match:
+        return None
+    return int(match[1]) * RETRY_AFTER_UNITS[match[2].lower()]
+
+
+class RateLimitError(WebDriverException):
+    """
+    The chatbot shows a rate limit notice instead of answering.
+    """
+
+    def __init__(self, notice: str):
+        super().__init__(f"Rate limited by the chatbot: {notice}")
+        self.notice = notice
+        self.retry_after = parse_retry_after(notice)
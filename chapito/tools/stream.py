@@ -0,0 +1,73 @@
+import logging
+import os
+import time
+from typing import Callable, Iterator
+
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+
+from chapito.metrics import measure_last_poll, measure_phase
+from chapito.tools.completion import get_answer_timeout
+from chapito.tracing import sleep
+
+POLL_INTERVAL_SECONDS: float = 0.5
+
+
+def read_new_answer(driver, previous_count: int, read_last_answer: Callable) -> str:
+    """
+    Return the current text of the answer being written, or "" while its bubble doesn't exist yet.
+    """
+    try:
+        count, answer = read_last_answer(driver)
+    except StaleElementReferenceException:
+        # The bubble is re-rendered by the chatbot, next poll will get it.
+        return ""
+    return answer if count > previous_count else ""
+
+
+def stream_answer(
+    driver,
+    previous_count: int,
+    read_last_answer: Callable,
+    is_answer_finished: Callable,
+    timeout: float,
+) -> Iterator[str]:
+    """
+    Yield the text appended to the last answer while the chatbot is still writing it.
+    The end of the answer is often rewritten during generation (eg. code blocks being closed), so text is only
+    sent once it stayed the same between two polls.
+    """
+    logging.debug("Stream answer from chatbot interface")
+    driver.implicitly_wait(0)
+    timeout = get_answer_timeout(timeout)
+    deadline = time.time() + timeout
+    sent = ""
+    previous = ""
+    try:
+        # Answer parts are fetched during the generation, only the fetch of the complete answer is recorded.
+        with measure_phase("generation"), measure_last_poll():
+            while True:
+                finished = is_answer_finished(driver)
+                current = read_new_answer(driver, previous_count, read_last_answer)
+                # An answer that stays empty once the chatbot has finished is not coming.
+                if finished and current == previous:
+                    break
+                stable = os.path.commonprefix([previous, current])
+                if len(stable) > len(sent) and stable.startswith(sent):
+                    yield stable[len(sent) :]
+                    sent = stable
+                previous = current
+                if time.time() > deadline:
+                    raise TimeoutException(f"Answer not finished after {timeout} seconds")
+                sleep(POLL_INTERVAL_SECONDS)
+    finally:
+        driver.implicitly_wait(10)
+
+    if not current:
+        logging.warning("No message found.")
+        return
+    if not current.startswith(sent):
+        logging.warning("Answer has been rewritten after being streamed, end of stream may be inconsistent.")
+        return
+    if remaining := current[len(sent) :]:
+        yield remaining
+    logging.debug(f"Streamed message ends with: {current[-100:]}")
@@ -1,17 +1,64 @@
+import atexit
+import json
 import os
 import platform
+import tempfile
+import threading
 import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
 from chapito.config import Config
+from chapito.metrics import measure_phase
+from chapito.tools.cdp import use_cdp_transport
+from chapito.tracing import sleep, trace_driver_commands
 from chapito.types import OsType
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-import pyperclip
 import logging
 import requests
 import re
+from urllib.parse import urlsplit
 from selenium_stealth import stealth
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 
+VERSION_URL: str = "https://raw.githubusercontent.com/Yajusta/Chapito/refs/heads/main/pyproject.toml"
+VERSION_CHECK_TIMEOUT_SECONDS: float = 3
+VERSION_CACHE_PATH: str = ".last_version.json"
+VERSION_CACHE_TTL_SECONDS: int = 24 * 3600
+HEADLESS_WINDOW_SIZE: str = "1920,1080"
+# File input where prompts are attached, image-only inputs are left out.
+DEFAULT_FILE_INPUT_CSS_SELECTOR: str = 'input[type="file"]:not([accept^="image"])'
+# Pasted instead of a prompt attached as a file.
+UPLOAD_INSTRUCTION: str = (
+    "The whole request is in the attached file {name}. Follow it and answer it as if it had been written here."
+)
+
+# URL patterns blocked for each resource type of the `blocked_resources` option, `*` matches any characters.
+# Adapters add the trackers specific to their site.
+BLOCKED_RESOURCE_URLS: Dict[str, List[str]] = {
+    "image": ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*", "*.ico*"],
+    "font": ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"],
+    "media": ["*.mp4*", "*.webm*", "*.mp3*", "*.ogg*", "*.wav*", "*.m4a*"],
+    "tracker": [
+        "*google-analytics.com*",
+        "*googletagmanager.com*",
+        "*doubleclick.net*",
+        "*browser-intake-datadoghq.com*",
+        "*sentry.io*",
+        "*segment.io*",
+        "*cdn.segment.com*",
+        "*hotjar.com*",
+    ],
+}
+
+# URL patterns blocked in the tabs of each driver created by `create_driver`.
+driver_blocked_urls: Dict[Any, List[str]] = {}
+# Prompts longer than this number of characters are attached as a file (0 = always pasted).
+upload_threshold: int = 0
+# Last prompt file attached by each driver, removed when the next one is written.
+driver_prompt_files: Dict[Any, str] = {}
+
 
 def get_os() -> OsType:
     os_name = os.name
@@ -22,37 +69,246 @@ def get_os() -> OsType:
     return OsType.MACOS if platform.system() == "Darwin" else OsType.LINUX
 
 
-def paste(textarea):
-    logging.debug("Paste prompt")
+# Characters matched by `\s` in JavaScript, not counted when checking that a prompt has been entirely inserted.
+JS_WHITESPACE = re.compile("[\t\n\v\f\r \u00a0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000\ufeff]")
+
+# Number of visible characters in the prompt field, used to check that a prompt has been entirely inserted.
+COUNT_PROMPT_CHARACTERS_SCRIPT: str = """
+const element = arguments[0];
+const text = element.isContentEditable ? element.innerText : element.value;
+return text.replace(/\\s/g, "").length;
+"""
+
+# Insert text like the browser does when typing, so that the chat framework sees an "input" event.
+INSERT_PROMPT_SCRIPT: str = """
+const [element, text] = arguments;
+element.focus();
+if (element.isContentEditable) {
+    const selection = window.getSelection();
+    selection.selectAllChildren(element);
+    selection.collapseToEnd();
+    document.execCommand("insertText", false, text);
+} else {
+    const setValue = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(element), "value").set;
+    setValue.call(element, element.value + text);
+    element.dispatchEvent(new Event("input", {bubbles: true}));
+}
+"""
+
+CLEAR_PROMPT_SCRIPT: str = """
+const element = arguments[0];
+element.focus();
+if (element.isContentEditable) {
+    window.getSelection().selectAllChildren(element);
+    document.execCommand("delete");
+} else {
+    const setValue = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(element), "value").set;
+    setValue.call(element, "");
+    element.dispatchEvent(new Event("input", {bubbles: true}));
+}
+"""
+
+
+def count_visible_characters(text: str) -> int:
+    """
+    Characters counted like `COUNT_PROMPT_CHARACTERS_SCRIPT` does, Python and JavaScript don't agree on whitespace.
+    """
+    return len(JS_WHITESPACE.sub("", text))
+
+
+def count_prompt_characters(textarea) -> int:
+    return textarea.parent.execute_script(COUNT_PROMPT_CHARACTERS_SCRIPT, textarea)
+
+
+def insert_with_cdp(message, textarea) -> None:
     textarea.click()
-    if get_os() == OsType.MACOS:
-        textarea.send_keys(Keys.COMMAND, "v")
-    else:
-        textarea.send_keys(Keys.CONTROL, "v")
+    textarea.parent.execute_cdp_cmd("Input.insertText", {"text": message})
 
 
-def transfer_prompt(message, textarea) -> None:
+def insert_with_script(message, textarea) -> None:
+    textarea.parent.execute_script(INSERT_PROMPT_SCRIPT, textarea, message)
+
+
+def type_line_by_line(message, textarea) -> None:
+    for line in message.split("\n"):
+        # Don't send "\t" to browser to avoid focus change.
+        textarea.send_keys(line.replace("\t", "    "))
+        # Don't send "\n" to browser to avoid early submition.
+        textarea.send_keys(Keys.SHIFT, Keys.ENTER)
+
+
+def set_upload_threshold(characters: int) -> None:
+    global upload_threshold
+    upload_threshold = characters
+
+
+def write_prompt_file(driver, message: str) -> str:
+    if previous_path := driver_prompt_files.pop(driver, None):
+        remove_prompt_file(previous_path)
+    file_descriptor, path = tempfile.mkstemp(prefix="chapito_prompt_", suffix=".txt")
+    with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+        file.write(message)
+    driver_prompt_files[driver] = path
+    return path
+
+
+def remove_prompt_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError as e:
+        logging.debug(f"Can't remove prompt file: {e}")
+
+
+@atexit.register
+def remove_prompt_files() -> None:
+    while driver_prompt_files:
+        remove_prompt_file(driver_prompt_files.popitem()[1])
+
+
+def upload_prompt(message, textarea, file_input_css_selector: str) -> Optional[str]:
+    """
+    Attach the prompt to the chat as a text file, and return its path. `None` when the page has no file input.
+    The file is kept until the next prompt of the browser, the page may read it until the prompt is submitted.
+    """
+    driver = textarea.parent
+    driver.implicitly_wait(0)
+    try:
+        file_inputs = driver.find_elements(By.CSS_SELECTOR, file_input_css_selector)
+    finally:
+        driver.implicitly_wait(10)
+    if not file_inputs:
+        logging.warning("Can't find where to attach the prompt, pasting it instead.")
+        return None
+    path = write_prompt_file(driver, message)
+    try:
+        file_inputs[0].send_keys(path)
+    except WebDriverException as e:
+        logging.warning(f"Can't attach the prompt, pasting it instead: {e.msg}")
+        return None
+    logging.debug(f"Prompt attached as {path}")
+    return path
+
+
+@measure_phase("transfer_prompt")
+def transfer_prompt(
+    message, textarea, file_input_css_selector: Optional[str] = DEFAULT_FILE_INPUT_CSS_SELECTOR
+) -> None:
+    """
+    Insert the prompt directly in the chat input, without using the system clipboard.
+    Each method is checked by counting inserted characters, the next one is tried when it failed.
+    A prompt longer than `upload_threshold` is attached as a file, when the chatbot has a file input matching
+    `file_input_css_selector`, and only an instruction to follow it is inserted.
+    """
+    if upload_threshold and len(message) > upload_threshold and file_input_css_selector:
+        if path := upload_prompt(message, textarea, file_input_css_selector):
+            message = UPLOAD_INSTRUCTION.format(name=os.path.basename(path))
     logging.debug("Transfering prompt to chatbot interface")
-    usePaste = True
-    if usePaste:
-        pyperclip.copy(message)
-        paste(textarea)
-    else:
-        # Send message line by line
-        for line in message.split("\n"):
-            # Don't send "\t" to browser to avoid focus change.
-            textarea.send_keys(line.replace("\t", "    "))
-            # Don't send "\n" to browser to avoid early submition.
-            textarea.send_keys(Keys.SHIFT, Keys.ENTER)
-    time.sleep(0.5)
+    expected_characters = count_visible_characters(message)
+    initial_characters = count_prompt_characters(textarea)
+    for insert in (insert_with_cdp, insert_with_script):
+        try:
+            insert(message, textarea)
+        except Exception as e:
+            logging.debug(f"Can't insert prompt with {insert.__name__}: {e}")
+        else:
+            inserted_characters = count_prompt_characters(textarea) - initial_characters
+            if inserted_characters == expected_characters:
+                logging.debug("Prompt transfered")
+                return
+            logging.debug(f"{insert.__name__} inserted {inserted_characters}/{expected_characters} characters")
+        textarea.parent.execute_script(CLEAR_PROMPT_SCRIPT, textarea)
+        initial_characters = 0
+    logging.warning("Can't insert prompt directly, typing it instead.")
+    type_line_by_line(message, textarea)
     logging.debug("Prompt transfered")
 
 
-def create_driver(config: Config) -> webdriver.Chrome | webdriver.Firefox:
+def open_chat(driver, url: str, check_if_chat_loaded: Callable) -> None:
+    """
+    Load a new chat in the current tab and wait for it to be usable.
+    """
+    driver.get(url)
+    while not check_if_chat_loaded(driver):
+        logging.info("Waiting for chat interface to load...")
+        sleep(5)
+
+
+def reuse_chat_tab(driver, config: Config, url: str, check_if_chat_loaded: Callable) -> bool:
+    """
+    When attached to a running browser, switch to a tab where the chat is already loaded instead of loading it again.
+    """
+    if not config.debugger_address:
+        return False
+    url_parts = urlsplit(url)
+    site = f"{url_parts.scheme}://{url_parts.netloc}/"
+    for handle in driver.window_handles:
+        driver.switch_to.window(handle)
+        if driver.current_url.startswith(site) and check_if_chat_loaded(driver):
+            logging.info(f"Reusing chat already loaded in the browser: {driver.current_url}")
+            return True
+    # The chat will be loaded in a new tab, other tabs of the browser are left untouched.
+    open_tab(driver)
+    return False
+
+
+def get_blocked_urls(config: Config, tracker_urls: Sequence[str] = ()) -> List[str]:
+    blocked_urls = []
+    for resource_type in config.blocked_resources:
+        blocked_urls.extend(BLOCKED_RESOURCE_URLS[resource_type])
+        if resource_type == "tracker":
+            blocked_urls.extend(tracker_urls)
+    return blocked_urls
+
+
+def setup_tab(driver) -> None:
+    """
+    CDP commands only apply to the tab they are sent to, so each tab opened by Chapito is set up again.
+    Drivers not created by `create_driver` are left as is.
+    """
+    if driver not in driver_blocked_urls:
+        return
+    apply_stealth(driver)
+    if blocked_urls := driver_blocked_urls[driver]:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked_urls})
+
+
+def open_tab(driver) -> None:
+    driver.switch_to.new_window("tab")
+    setup_tab(driver)
+
+
+def create_driver(config: Config, tracker_urls: Sequence[str] = ()) -> webdriver.Chrome | webdriver.Firefox:
+    """
+    Start Chrome, or attach to the one at `debugger_address`. `tracker_urls` are URL patterns of the site's
+    trackers, blocked along with the common ones when `blocked_resources` includes trackers.
+    """
+    driver = launch_browser(config)
+    if config.cdp_transport:
+        use_cdp_transport(driver)
+    trace_driver_commands(driver)
+    driver_blocked_urls[driver] = get_blocked_urls(config, tracker_urls)
+    if driver_blocked_urls[driver]:
+        logging.info(f"Blocking resources: {', '.join(config.blocked_resources)}")
+    setup_tab(driver)
+    return driver
+
+
+def launch_browser(config: Config) -> webdriver.Chrome:
+    if config.debugger_address:
+        logging.info(f"Attaching to browser at {config.debugger_address}")
+        chrome_options = Options()
+        chrome_options.add_experimental_option("debuggerAddress", config.debugger_address)
+        return webdriver.Chrome(options=chrome_options)
+
     chrome_options = Options()
     chrome_options.add_argument("--disable-blink-features=AutomationControlled")
     chrome_options.add_argument(f"user-agent={config.browser_user_agent}")
-    chrome_options.add_argument("--start-maximized")
+    if config.headless:
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument(f"--window-size={HEADLESS_WINDOW_SIZE}")
+    else:
+        chrome_options.add_argument("--start-maximized")
     chrome_options.add_argument("--log-level=1")
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
     chrome_options.add_experimental_option("useAutomationExtension", False)
@@ -61,7 +317,10 @@ def create_driver(config: Config) -> webdriver.Chrome | webdriver.Firefox:
         os.makedirs(browser_profile_path, exist_ok=True)
         chrome_options.add_argument(f"user-data-dir={browser_profile_path}")
 
-    driver = webdriver.Chrome(options=chrome_options)
+    return webdriver.Chrome(options=chrome_options)
+
+
+def apply_stealth(driver) -> None:
     stealth(
         driver,
         languages=["en-US", "en"],
@@ -71,12 +330,13 @@ def create_driver(config: Config) -> webdriver.Chrome | webdriver.Firefox:
         renderer="Intel Iris OpenGL Engine",
         fix_hairline=True,
     )
-    return driver
 
 
 def check_official_version(version: str) -> bool:
     try:
         official_version = get_last_version()
+        if official_version is None:
+            return False
         if version == official_version:
             return True
         logging.info(f"Official version: {official_version}")
@@ -88,12 +348,51 @@ def check_official_version(version: str) -> bool:
         return False
 
 
-def get_last_version() -> str:
-    response = requests.get("https://raw.githubusercontent.com/Yajusta/Chapito/refs/heads/main/pyproject.toml")
-    response.raise_for_status()
-    if match := re.search(r'version\s*=\s*"([^"]+)"', response.text):
-        return match[1]
-    return "0.0.0"
+def check_official_version_in_background(version: str) -> threading.Thread:
+    """
+    Check the version without delaying startup, the result is only logged.
+    """
+    thread = threading.Thread(target=check_official_version, args=(version,), name="version-check", daemon=True)
+    thread.start()
+    return thread
+
+
+def read_cached_version() -> Optional[str]:
+    try:
+        with open(VERSION_CACHE_PATH, encoding="utf-8") as file:
+            cache = json.load(file)
+        if time.time() - cache["checked_at"] <= VERSION_CACHE_TTL_SECONDS:
+            return cache["version"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def save_cached_version(version: str) -> None:
+    try:
+        with open(VERSION_CACHE_PATH, "w", encoding="utf-8") as file:
+            json.dump({"version": version, "checked_at": time.time()}, file)
+    except OSError as e:
+        logging.debug(f"Can't save last version: {e}")
+
+
+def get_last_version() -> Optional[str]:
+    """
+    Return the version published on GitHub, from the cache if it has been checked recently.
+    A failed check is also cached, to not retry it at each start when there is no network.
+    """
+    if (cached_version := read_cached_version()) is not None:
+        return cached_version or None
+    try:
+        response = requests.get(VERSION_URL, timeout=VERSION_CHECK_TIMEOUT_SECONDS)
+        response.raise_for_status()
+    except requests.RequestException:
+        save_cached_version("")
+        raise
+    match = re.search(r'version\s*=\s*"([^"]+)"', response.text)
+    version = match[1] if match else "0.0.0"
+    save_cached_version(version)
+    return version
 
 
 def greeting(version: str) -> None:
@@ -0,0 +1,165 @@
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+# Polling loops (eg. streaming) would otherwise add spans to a trace for as long as the request lasts.
+MAX_SPANS_PER_TRACE: int = 1000
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "thread")
+
+    def __init__(self, name: str, start: float, end: float, thread: str):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.thread = thread
+
+
+class Trace:
+    """
+    Timeline of a request: each span records when a step started and how long it lasted.
+    Span times are `time.perf_counter()` values, converted to milliseconds from the start of the trace on export.
+    """
+
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+
+    def add_span(self, name: str, start: float, end: float) -> None:
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped_spans += 1
+            return
+        self.spans.append(Span(name, start, end, threading.current_thread().name))
+
+    def finish(self) -> None:
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def _milliseconds(self, perf_counter_value: float) -> float:
+        return round((perf_counter_value - self.start) * 1000, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": self._milliseconds(self.end) if self.end is not None else None,
+            "dropped_spans": self.dropped_spans,
+            "spans": [
+                {
+                    "name": span.name,
+                    "start_ms": self._milliseconds(span.start),
+                    "duration_ms": round((span.end - span.start) * 1000, 3),
+                    "thread": span.thread,
+                }
+                for span in list(self.spans)
+            ],
+        }
+
+    def to_trace_events(self, pid: int = 1) -> List[Dict[str, Any]]:
+        """
+        Events of the Chrome trace event format, viewable in chrome://tracing or Perfetto. Each trace is a process.
+        """
+        start_us = self.start_time * 1_000_000
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"{self.name} {self.trace_id}"}}
+        ]
+        end = self.end if self.end is not None else time.perf_counter()
+        duration_us = (end - self.start) * 1e6
+        events.append({"name": self.name, "ph": "X", "pid": pid, "tid": "request", "ts": start_us, "dur": duration_us})
+        for span in list(self.spans):
+            events.append(
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": span.thread,
+                    "ts": start_us + (span.start - self.start) * 1e6,
+                    "dur": (span.end - span.start) * 1e6,
+                }
+            )
+        return events
+
+
+class TraceBuffer:
+    """
+    Last `size` finished traces, older ones are dropped.
+    """
+
+    def __init__(self, size: int):
+        self._traces: deque[Trace] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._traces)
+
+    def add(self, trace: Trace) -> None:
+        trace.finish()
+        with self._lock:
+            self._traces.append(trace)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            return next((trace for trace in self._traces if trace.trace_id == trace_id), None)
+
+    def list(self) -> List[Trace]:
+        """
+        Most recent trace first.
+        """
+        with self._lock:
+            return list(reversed(self._traces))
+
+
+def to_chrome_trace(traces: List[Trace]) -> Dict[str, Any]:
+    events = []
+    for pid, trace in enumerate(traces, start=1):
+        events.extend(trace.to_trace_events(pid))
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+# Trace of the request being handled, `None` when tracing is disabled.
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Record a step in the trace of the current request, if any.
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, start, time.perf_counter())
+
+
+def sleep(seconds: float) -> None:
+    with span("sleep"):
+        time.sleep(seconds)
+
+
+def trace_driver_commands(driver) -> None:
+    """
+    Record each WebDriver command as a span. Element methods also go through `driver.execute`.
+    """
+    execute = driver.execute
+
+    def traced_execute(driver_command: str, params: Optional[dict] = None):
+        with span(f"selenium.{driver_command}"):
+            return execute(driver_command, params)
+
+    driver.execute = traced_execute
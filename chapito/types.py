@@ -1,4 +1,4 @@
-from enum import Enum
+from enum import Enum, StrEnum
 
 
 class OsType(Enum):
@@ -8,7 +8,7 @@ class OsType(Enum):
     MACOS = 3
 
 
-class Chatbot(Enum):
+class Chatbot(StrEnum):
     AI_STUDIO = "ai_studio"
     ANTHROPIC = "anthropic"
     DEEPSEEK = "deepseek"
@@ -0,0 +1,65 @@
+from chapito import backends
+from chapito.backends import Backend, create_backends, get_backend_config, rank_backends
+from chapito.config import Config
+from chapito.health import MAX_CONSECUTIVE_FAILURES, BackendHealth
+from chapito.pool import DriverPool
+from chapito.types import Chatbot
+
+
+def make_config() -> Config:
+    config = Config.__new__(Config)
+    config.chatbot = Chatbot.GROK
+    config.chatbots = [Chatbot.MISTRAL, Chatbot.OPENAI]
+    config.browser_profile_path = "browser_profile"
+    config.debugger_address = "127.0.0.1:9222"
+    return config
+
+
+def test_other_chatbots_get_their_own_browsers() -> None:
+    config = make_config()
+
+    assert get_backend_config(config, Chatbot.GROK) is config
+    mistral_config = get_backend_config(config, Chatbot.MISTRAL)
+    assert mistral_config.browser_profile_path == "browser_profile_mistral"
+    assert mistral_config.debugger_address == ""
+    assert config.browser_profile_path == "browser_profile"
+
+
+def test_chatbot_failing_to_start_is_left_out(monkeypatch) -> None:
+    def create_backend(config: Config, name: str) -> str:
+        if name == Chatbot.MISTRAL:
+            raise RuntimeError("chromedriver crashed")
+        return f"{name} backend"
+
+    monkeypatch.setattr(backends, "create_backend", create_backend)
+
+    assert create_backends(make_config()) == {"grok": "grok backend", "openai": "openai backend"}
+
+
+def test_health_tracks_latency_and_errors() -> None:
+    health = BackendHealth(window=4)
+    for seconds in (1, 3, 2):
+        health.record_success(seconds)
+    health.record_failure()
+
+    assert health.latency == 2
+    assert health.error_rate == 0.25
+    assert health.is_available()
+    # Pending requests are answered first, failed ones are sent again.
+    assert health.expected_seconds(pending=1, workers=1) == 2 * 2 / 0.75
+
+
+def test_chatbot_failing_repeatedly_is_tried_last() -> None:
+    grok = Backend("grok", DriverPool(["driver"]), lambda driver, prompt: "")
+    mistral = Backend("mistral", DriverPool(["driver"]), lambda driver, prompt: "")
+    grok.health.record_success(1)
+    mistral.health.record_success(10)
+
+    assert rank_backends([mistral, grok]) == [grok, mistral]
+    assert rank_backends([grok, mistral], preferred=mistral) == [mistral, grok]
+
+    for _ in range(MAX_CONSECUTIVE_FAILURES):
+        grok.health.record_failure()
+
+    assert not grok.health.is_available()
+    assert rank_backends([grok, mistral]) == [mistral, grok]
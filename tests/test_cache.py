@@ -0,0 +1,42 @@
+import time
+
+from chapito.cache import ResponseCache
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    cache = ResponseCache(max_size=2, ttl=60)
+    cache.set("a", "answer a")
+    cache.set("b", "answer b")
+    cache.get("a")
+    cache.set("c", "answer c")
+
+    assert cache.get("a") == "answer a"
+    assert cache.get("b") is None
+    assert cache.get("c") == "answer c"
+
+
+def test_expired_entry_is_ignored(monkeypatch) -> None:
+    cache = ResponseCache(max_size=2, ttl=60)
+    cache.set("a", "answer a")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_entries_are_persisted(tmp_path) -> None:
+    path = str(tmp_path / "cache.json")
+    cache = ResponseCache(max_size=2, ttl=60, path=path)
+    cache.set("a", "answer a")
+
+    assert ResponseCache(max_size=2, ttl=60, path=path).get("a") == "answer a"
+
+
+def test_key_depends_on_chatbot_model_and_prompt() -> None:
+    key = ResponseCache.make_key("grok", "gpt-4", "[user] Hi")
+
+    assert key == ResponseCache.make_key("grok", "gpt-4", "[user] Hi")
+    assert key != ResponseCache.make_key("mistral", "gpt-4", "[user] Hi")
+    assert key != ResponseCache.make_key("grok", "gpt-3.5", "[user] Hi")
+    assert key != ResponseCache.make_key("grok", "gpt-4", "[user] Hello")
@@ -0,0 +1,199 @@
+import json
+
+import pytest
+from selenium.common.exceptions import JavascriptException, TimeoutException
+from selenium.webdriver.remote.command import Command
+
+from chapito.tools import cdp
+from chapito.tools.cdp import CommandLostError, use_cdp_transport
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commands = []
+
+    def session(self, target_id: str) -> str:
+        return f"session {target_id}"
+
+    def send(self, method: str, params: dict, session_id=None, timeout: float = 0) -> dict:
+        self.commands.append((session_id, method))
+        return {}
+
+    def evaluate(self, session_id: str, expression: str, timeout: float):
+        self.commands.append((session_id, "Runtime.evaluate", timeout))
+        if "throw" in expression:
+            raise JavascriptException("Error: failed")
+        return "from cdp"
+
+    def close(self) -> None:
+        self.commands.append("close")
+
+
+class FakeElement:
+    pass
+
+
+class FakeDriver:
+    capabilities = {"goog:chromeOptions": {"debuggerAddress": "localhost:9222"}}
+    current_window_handle = "TAB1"
+
+    def __init__(self):
+        self.commands = []
+
+    def execute(self, driver_command: str, params=None):
+        self.commands.append(driver_command)
+        if driver_command == Command.NEW_WINDOW:
+            return {"value": {"handle": "TAB2", "type": "tab"}}
+        return {"value": "from chromedriver"}
+
+
+@pytest.fixture
+def connection(monkeypatch) -> FakeConnection:
+    connection = FakeConnection()
+    monkeypatch.setattr(cdp.CdpConnection, "connect", lambda debugger_address: connection)
+    return connection
+
+
+def test_scripts_are_sent_over_the_devtools_websocket(connection) -> None:
+    driver = FakeDriver()
+    assert use_cdp_transport(driver)
+
+    assert driver.execute(Command.W3C_EXECUTE_SCRIPT, {"script": "return 1", "args": ["a", {"b": [1]}]}) == {
+        "value": "from cdp"
+    }
+    # Scripts on elements need the element references of chromedriver.
+    driver.execute(Command.W3C_EXECUTE_SCRIPT, {"script": "return 1", "args": [FakeElement()]})
+    driver.execute(Command.SET_TIMEOUTS, {"script": 125000})
+    driver.execute(Command.W3C_EXECUTE_SCRIPT_ASYNC, {"script": "arguments[0]()", "args": []})
+    driver.execute("executeCdpCommand", {"cmd": "Input.insertText", "params": {"text": "Hi"}})
+    # Commands changing the state of the DevTools session of chromedriver stay in it.
+    driver.execute("executeCdpCommand", {"cmd": "Network.enable", "params": {}})
+
+    assert connection.commands == [
+        ("session TAB1", "Runtime.evaluate", 30),
+        ("session TAB1", "Runtime.evaluate", 125),
+        ("session TAB1", "Input.insertText"),
+    ]
+    assert driver.commands == [Command.W3C_EXECUTE_SCRIPT, Command.SET_TIMEOUTS, "executeCdpCommand"]
+
+
+def test_scripts_follow_the_current_tab(connection) -> None:
+    driver = FakeDriver()
+    use_cdp_transport(driver)
+    script = {"script": "return 1", "args": []}
+
+    driver.execute(Command.NEW_WINDOW, {"type": "tab"})
+    driver.execute(Command.W3C_EXECUTE_SCRIPT, script)
+    driver.execute(Command.SWITCH_TO_WINDOW, {"handle": "TAB1"})
+    driver.execute(Command.W3C_EXECUTE_SCRIPT, script)
+    driver.execute(Command.CLOSE)
+    driver.execute(Command.W3C_EXECUTE_SCRIPT, script)
+    driver.execute(Command.QUIT)
+
+    assert connection.commands == [
+        ("session TAB2", "Runtime.evaluate", 30),
+        ("session TAB1", "Runtime.evaluate", 30),
+        "close",
+    ]
+    assert driver.commands[-2:] == [Command.W3C_EXECUTE_SCRIPT, Command.QUIT]
+
+
+def test_script_errors_are_raised(connection) -> None:
+    driver = FakeDriver()
+    use_cdp_transport(driver)
+
+    with pytest.raises(JavascriptException):
+        driver.execute(Command.W3C_EXECUTE_SCRIPT, {"script": "throw new Error('failed')", "args": []})
+
+
+def test_lost_connection_falls_back_to_chromedriver(connection, monkeypatch) -> None:
+    def evaluate(session_id: str, expression: str, timeout: float):
+        raise OSError("Connection reset")
+
+    monkeypatch.setattr(connection, "evaluate", evaluate)
+    driver = FakeDriver()
+    use_cdp_transport(driver)
+
+    for _ in range(2):
+        assert driver.execute(Command.W3C_EXECUTE_SCRIPT, {"script": "return 1", "args": []}) == {
+            "value": "from chromedriver"
+        }
+
+
+def test_command_lost_after_being_sent_is_not_sent_again(connection, monkeypatch) -> None:
+    def evaluate(session_id: str, expression: str, timeout: float):
+        raise CommandLostError("Runtime.evaluate sent but its result was lost: Connection reset")
+
+    monkeypatch.setattr(connection, "evaluate", evaluate)
+    driver = FakeDriver()
+    use_cdp_transport(driver)
+    script = {"script": "arguments[0].click()", "args": []}
+
+    with pytest.raises(CommandLostError):
+        driver.execute(Command.W3C_EXECUTE_SCRIPT, script)
+    assert driver.commands == []
+    # Next commands go through chromedriver.
+    assert driver.execute(Command.W3C_EXECUTE_SCRIPT, script) == {"value": "from chromedriver"}
+
+
+def test_browser_without_devtools_address_is_left_as_is() -> None:
+    driver = FakeDriver()
+    driver.capabilities = {}
+
+    assert not use_cdp_transport(driver)
+    assert "execute" not in vars(driver)
+
+
+class FakeSocket:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def settimeout(self, seconds: float) -> None:
+        pass
+
+    def send(self, message: str) -> None:
+        self.sent.append(json.loads(message))
+
+    def recv(self) -> str:
+        return json.dumps(self.responses.pop(0))
+
+
+def test_connection_waits_for_the_result_of_its_command(monkeypatch) -> None:
+    socket = FakeSocket(
+        [
+            {"id": 1, "result": {"sessionId": "S1"}},
+            {"method": "Target.attachedToTarget", "params": {}},
+            {"id": 2, "result": {"result": {"type": "number", "value": 42}}},
+            {"id": 3, "result": {"exceptionDetails": {"exception": {"description": "Error: Chapito script timeout"}}}},
+        ]
+    )
+    monkeypatch.setattr(cdp.websocket, "create_connection", lambda url, **options: socket)
+    connection = cdp.CdpConnection("ws://localhost:9222/devtools/browser/1")
+
+    session_id = connection.session("TAB1")
+    assert connection.evaluate(session_id, "6 * 7", timeout=1) == 42
+    with pytest.raises(TimeoutException):
+        connection.evaluate(session_id, "new Promise(() => {})", timeout=1)
+
+    assert socket.sent[0] == {
+        "id": 1,
+        "method": "Target.attachToTarget",
+        "params": {"targetId": "TAB1", "flatten": True},
+    }
+    assert socket.sent[1]["sessionId"] == "S1"
+
+
+class LostSocket(FakeSocket):
+    def recv(self) -> str:
+        raise ConnectionResetError("Connection reset")
+
+
+def test_connection_lost_after_sending_reports_the_command_as_lost(monkeypatch) -> None:
+    socket = LostSocket([])
+    monkeypatch.setattr(cdp.websocket, "create_connection", lambda url, **options: socket)
+    connection = cdp.CdpConnection("ws://localhost:9222/devtools/browser/1")
+
+    with pytest.raises(CommandLostError):
+        connection.send("Input.insertText", {"text": "Hi"}, "S1")
+    assert len(socket.sent) == 1
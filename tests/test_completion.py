@@ -0,0 +1,73 @@
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from chapito.tools import completion
+from chapito.tools.completion import wait_for_completion, wait_for_submit_button
+from chapito.tools.ratelimit import RateLimitError, parse_retry_after
+
+
+class FakeButton:
+    def __init__(self, disabled: bool):
+        self.disabled = disabled
+
+    def get_attribute(self, name: str):
+        if name == "disabled":
+            return "true" if self.disabled else None
+        return None
+
+
+class FakeDriver:
+    def __init__(self, states):
+        self.states = states
+        self.script_args = None
+
+    def find_elements(self, by, selector) -> list:
+        return self.states.pop(0) if len(self.states) > 1 else self.states[0]
+
+    def set_script_timeout(self, seconds: float) -> None:
+        pass
+
+    def execute_async_script(self, script: str, *args):
+        self.script_args = args
+        return False
+
+
+def test_wait_for_submit_button_waits_until_enabled() -> None:
+    enabled = FakeButton(disabled=False)
+    driver = FakeDriver([[], [FakeButton(disabled=True)], [FakeButton(disabled=True), enabled]])
+
+    assert wait_for_submit_button(driver, "button", timeout=5, index=-1) is enabled
+
+
+def test_wait_for_completion_raises_timeout(monkeypatch) -> None:
+    monkeypatch.setattr(completion, "quiet_period_seconds", 0.5)
+    driver = FakeDriver([])
+
+    with pytest.raises(TimeoutException):
+        wait_for_completion(driver, timeout=2)
+    assert driver.script_args == (500, 2000)
+
+
+def test_answer_timeout_caps_the_wait(monkeypatch) -> None:
+    monkeypatch.setattr(completion, "quiet_period_seconds", 0.5)
+    monkeypatch.setattr(completion, "answer_timeout_seconds", 1.5)
+    driver = FakeDriver([])
+
+    with pytest.raises(TimeoutException):
+        wait_for_completion(driver, timeout=120)
+    assert driver.script_args == (500, 1500)
+
+
+def test_rate_limit_notice_stops_the_wait(monkeypatch) -> None:
+    driver = FakeDriver([])
+    driver.execute_async_script = lambda script, *args: "Too many requests, try again in 5 minutes"
+
+    with pytest.raises(RateLimitError) as error:
+        wait_for_completion(driver, timeout=2)
+    assert error.value.retry_after == 300
+
+
+def test_parse_retry_after() -> None:
+    assert parse_retry_after("You can send more messages in 45 minutes") == 2700
+    assert parse_retry_after("Try again in 1 hour") == 3600
+    assert parse_retry_after("Usage limit reached") is None
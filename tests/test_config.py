@@ -1,7 +1,8 @@
 import argparse
 import pytest
-from chapito.config import DEFAULT_BROWSER_PROFILE_PATH, DEFAULT_USE_BROWSER_PROFILE, Config
+from chapito.config import DEFAULT_BROWSER_PROFILE_PATH, DEFAULT_MAX_QUEUE_SIZE, DEFAULT_USE_BROWSER_PROFILE, Config
 from unittest.mock import patch
+from chapito.types import Chatbot
 
 
 @pytest.mark.parametrize(
@@ -114,3 +115,24 @@ browser_profile_path = {file_profile_path}
         assert config.config_path == (cli_config if cli_config == "config_test.ini" else expected_config_path)
         assert config.use_browser_profile == expected_use_browser_profile
         assert config.browser_profile_path == expected_profile_path
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch) -> None:
+    """
+    Run in a directory with an empty config file, so that `Config()` neither reads nor creates `./config.ini`.
+    """
+    (tmp_path / "config.ini").write_text("[DEFAULT]\n")
+    monkeypatch.chdir(tmp_path)
+
+
+def test_negative_max_queue_size_falls_back_to_default(config_dir, monkeypatch) -> None:
+    monkeypatch.setattr("sys.argv", ["main.py", "--max-queue-size", "-1"])
+
+    assert Config().max_queue_size == DEFAULT_MAX_QUEUE_SIZE
+
+
+def test_other_chatbots_are_validated(config_dir, monkeypatch) -> None:
+    monkeypatch.setattr("sys.argv", ["main.py", "--chatbot", "grok", "--chatbots", "mistral, grok,unknown,openai"])
+
+    assert Config().chatbots == [Chatbot.MISTRAL, Chatbot.OPENAI]
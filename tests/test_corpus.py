@@ -0,0 +1,55 @@
+import pytest
+
+from benchmarks.bench_clean_answer import compare
+from benchmarks.corpus import blank_lines_answer, load_corpus, repeat_to_size
+from chapito.registry import ADAPTERS, load_adapter
+
+CORPUS = load_corpus()
+
+
+def test_corpus_covers_every_adapter():
+    assert {answer.chatbot for answer in CORPUS} == set(ADAPTERS)
+
+
+@pytest.mark.parametrize("answer", CORPUS, ids=[f"{answer.chatbot}/{answer.case}" for answer in CORPUS])
+def test_clean_chat_answer_of_corpus(answer) -> None:
+    assert load_adapter(answer.chatbot).clean_chat_answer(answer.html) == answer.markdown
+
+
+def test_huge_answer_is_converted_like_its_parts() -> None:
+    answer = next(answer for answer in CORPUS if answer.chatbot == "anthropic" and answer.case == "short")
+    html = repeat_to_size(answer.html, 100 * len(answer.html))
+
+    markdown = load_adapter("anthropic").clean_chat_answer(html)
+
+    assert markdown.count("Use `collections.Counter` to count items & their frequency.") == 100
+
+
+@pytest.mark.parametrize("chatbot", ["gemini", "kimi", "qwen"])
+def test_blank_lines_are_collapsed_in_multi_megabyte_answers(chatbot: str) -> None:
+    answer = next(answer for answer in CORPUS if answer.chatbot == chatbot)
+    html = blank_lines_answer(answer.html, 2 * 1024 * 1024)
+
+    markdown = load_adapter(chatbot).clean_chat_answer(html)
+
+    assert "\n\n" not in markdown
+    assert markdown.count("Line of text") == html.count("Line of text")
+
+
+def test_compare_reports_regressions_beyond_tolerance() -> None:
+    baseline = {
+        "grok/huge": {"size_bytes": 10, "mb_per_second": 2.0, "peak_memory_ratio": 1.0},
+        "grok/code": {"size_bytes": 10, "mb_per_second": 2.0, "peak_memory_ratio": 1.0},
+    }
+    results = {
+        "grok/huge": {"size_bytes": 10, "mb_per_second": 1.0, "peak_memory_ratio": 1.5},
+        "grok/code": {"size_bytes": 10, "mb_per_second": 1.8, "peak_memory_ratio": 1.1},
+        "grok/short": {"size_bytes": 10, "mb_per_second": 0.1, "peak_memory_ratio": 9.0},
+    }
+
+    regressions = compare(results, baseline, tolerance=0.3)
+
+    assert regressions == [
+        "grok/huge: 1.0 MB/s, baseline 2.0 MB/s",
+        "grok/huge: peak memory 1.5x the HTML, baseline 1.0x",
+    ]
@@ -0,0 +1,39 @@
+import asyncio
+import threading
+
+import pytest
+
+from chapito.executor import BrowserExecutor, QueueFullError
+
+
+def test_executor_rejects_requests_beyond_capacity() -> None:
+    release = threading.Event()
+    executor = BrowserExecutor(workers=1, max_queue_size=1)
+
+    running = executor.submit(release.wait)
+    queued = executor.submit(release.wait)
+    assert executor.pending == 2
+    assert executor.queued == 1
+    with pytest.raises(QueueFullError):
+        executor.submit(release.wait)
+
+    release.set()
+    running.result(timeout=1)
+    queued.result(timeout=1)
+    assert executor.pending == 0
+    executor.shutdown()
+
+
+def test_run_does_not_block_event_loop() -> None:
+    release = threading.Event()
+    executor = BrowserExecutor(workers=1, max_queue_size=0)
+
+    async def scenario() -> str:
+        task = asyncio.create_task(executor.run(lambda: release.wait(1) and "answer"))
+        await asyncio.sleep(0)
+        # The loop is still free while the browser works.
+        release.set()
+        return await task
+
+    assert asyncio.run(scenario()) == "answer"
+    executor.shutdown()
@@ -0,0 +1,151 @@
+import dataclasses
+import json
+import shutil
+import subprocess
+from html.parser import HTMLParser
+
+import pytest
+
+from benchmarks.corpus import load_corpus
+from chapito.registry import load_adapter
+from chapito.tools import extract
+from chapito.tools.extract import EXTRACT_ANSWER_SCRIPT, extract_last_answer
+from chapito.tools.markdown import CODE_FENCES, VOID_ELEMENTS, MarkdownRules
+
+RULES = MarkdownRules(wrap={"code": CODE_FENCES})
+
+
+class FakeBubble:
+    def __init__(self, html: str):
+        self.html = html
+
+    def get_attribute(self, name: str) -> str:
+        return self.html
+
+
+class FakeDriver:
+    def __init__(self, bubbles):
+        self.bubbles = bubbles
+        self.scripts = []
+
+    def find_elements(self, by: str, value: str) -> list:
+        return self.bubbles
+
+    def execute_script(self, script: str, *args):
+        self.scripts.append((script, args))
+        return [len(self.bubbles), "markdown from browser"]
+
+
+@pytest.fixture
+def in_browser(monkeypatch):
+    monkeypatch.setattr(extract, "extract_in_browser", True)
+
+
+def test_extract_last_answer_converts_last_bubble() -> None:
+    driver = FakeDriver([FakeBubble("<p>old</p>"), FakeBubble("<p>Run <code>ls</code></p>")])
+
+    assert extract_last_answer(driver, "xpath", "//p", RULES) == (2, "Run ```\nls\n```")
+
+
+def test_extract_last_answer_without_bubble() -> None:
+    assert extract_last_answer(FakeDriver([]), "xpath", "//p", RULES) == (0, "")
+
+
+def test_extract_last_answer_in_browser(in_browser) -> None:
+    driver = FakeDriver([FakeBubble("<p>answer</p>")])
+
+    assert extract_last_answer(driver, "xpath", "//p", RULES) == (1, "markdown from browser")
+    [(script, (by, value, rules))] = driver.scripts
+    assert script == EXTRACT_ANSWER_SCRIPT
+    assert (by, value) == ("xpath", "//p")
+    assert rules["wrap"] == {"code": CODE_FENCES}
+
+
+class DomBuilder(HTMLParser):
+    """
+    Tree of the elements and texts of an HTML answer, like the DOM built by the browser, as JSON for node.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = {"tag": "#document", "attributes": {}, "children": []}
+        self.open = [self.root]
+
+    def add_text(self, text: str) -> None:
+        children = self.open[-1]["children"]
+        # Adjacent texts are a single text node in the DOM.
+        if children and isinstance(children[-1], str):
+            children[-1] += text
+        else:
+            children.append(text)
+
+    def handle_starttag(self, tag, attrs) -> None:
+        element = {"tag": tag, "attributes": {name: value or "" for name, value in attrs}, "children": []}
+        self.open[-1]["children"].append(element)
+        if tag not in VOID_ELEMENTS:
+            self.open.append(element)
+
+    def handle_endtag(self, tag) -> None:
+        # Like browsers, an end tag also closes the elements opened after its start tag.
+        for index in range(len(self.open) - 1, 0, -1):
+            if self.open[index]["tag"] == tag:
+                del self.open[index:]
+                return
+
+    def handle_data(self, data) -> None:
+        self.add_text(data)
+
+    def handle_comment(self, data) -> None:
+        self.open[-1]["children"].append(None)
+
+
+# Minimal DOM for `EXTRACT_ANSWER_SCRIPT`: the answer is the first element of each HTML.
+NODE_RUNNER = """
+const Node = {ELEMENT_NODE: 1, TEXT_NODE: 3, CDATA_SECTION_NODE: 4, COMMENT_NODE: 8};
+const toNode = (item) => {
+    if (item === null) {
+        return {nodeType: Node.COMMENT_NODE};
+    }
+    if (typeof item === "string") {
+        return {nodeType: Node.TEXT_NODE, nodeValue: item};
+    }
+    return {
+        nodeType: Node.ELEMENT_NODE,
+        localName: item.tag,
+        childNodes: item.children.map(toNode),
+        getAttribute: (name) => (name in item.attributes ? item.attributes[name] : null),
+    };
+};
+const extract = new Function(SCRIPT);
+const cases = JSON.parse(require("fs").readFileSync(0, "utf8"));
+const results = cases.map(([dom, rules]) => {
+    const answer = toNode(dom.children.find((child) => child && typeof child === "object"));
+    globalThis.document = {querySelectorAll: () => [answer]};
+    return extract("css selector", "answer", rules)[1];
+});
+process.stdout.write(JSON.stringify(results));
+"""
+
+
+def build_dom(html: str) -> dict:
+    builder = DomBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_extract_script_converts_the_corpus_like_html_to_markdown() -> None:
+    corpus = load_corpus()
+    cases = [
+        (build_dom(answer.html), dataclasses.asdict(load_adapter(answer.chatbot).MARKDOWN_RULES)) for answer in corpus
+    ]
+    runner = f"const SCRIPT = {json.dumps(EXTRACT_ANSWER_SCRIPT)};\n{NODE_RUNNER}"
+
+    output = subprocess.run(
+        ["node", "-e", runner], input=json.dumps(cases), capture_output=True, text=True, check=True, timeout=60
+    ).stdout
+
+    assert dict(zip((f"{answer.chatbot}/{answer.case}" for answer in corpus), json.loads(output))) == {
+        f"{answer.chatbot}/{answer.case}": answer.markdown for answer in corpus
+    }
@@ -0,0 +1,30 @@
+import requests
+
+from benchmarks.fake_chat import SKINS, FakeChatServer, expected_answer, generation_seconds
+from benchmarks.run_benchmark import percentile
+from chapito.registry import ADAPTERS
+from chapito.types import Chatbot
+
+
+def test_every_adapter_has_a_fake_page():
+    assert set(SKINS) == set(ADAPTERS)
+
+
+def test_server_serves_fake_pages():
+    with FakeChatServer() as server:
+        response = requests.get(server.url(Chatbot.GROK, first_token_ms=10, token_ms=1, tokens=3), timeout=5)
+        assert response.status_code == 200
+        assert "<textarea></textarea>" in response.text
+        assert 'aria-label=\\"Enter voice mode\\"' in response.text
+
+        assert requests.get(f"{server.base_url}/unknown", timeout=5).status_code == 404
+
+
+def test_simulated_answer():
+    assert expected_answer(3) == "Lorem ipsum dolor"
+    assert generation_seconds(first_token_ms=500, token_ms=20, tokens=100) == 2.5
+
+
+def test_percentile():
+    assert percentile([3, 1, 2], 0.5) == 2
+    assert percentile([float(value) for value in range(1, 21)], 0.95) == 19
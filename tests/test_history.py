@@ -0,0 +1,37 @@
+from chapito.history import ChatHistory
+from chapito.proxy import Message, find_index_from_end
+
+
+def test_history_ignores_surrounding_whitespaces() -> None:
+    history = ChatHistory(max_size=10)
+    history.add("  Hello\n")
+
+    assert "Hello" in history
+    assert "Hello world" not in history
+
+
+def test_history_forgets_oldest_messages() -> None:
+    history = ChatHistory(max_size=2)
+    history.add("first")
+    history.add("second")
+    history.add("first")
+    history.add("third")
+
+    assert len(history) == 2
+    assert "second" not in history
+    assert "first" in history
+    assert "third" in history
+
+
+def test_find_index_from_end_returns_last_known_message() -> None:
+    history = ChatHistory(max_size=10)
+    history.add("Hi")
+    history.add("Hello, how can I help?")
+    messages = [
+        Message(role="user", content="Hi"),
+        Message(role="assistant", content="Hello, how can I help?\n"),
+        Message(role="user", content="Write a poem"),
+    ]
+
+    assert find_index_from_end(messages, history) == 1
+    assert find_index_from_end(messages, ChatHistory(max_size=10)) == -1
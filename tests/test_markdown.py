@@ -0,0 +1,84 @@
+import pytest
+
+import chapito.anthropic_chat as anthropic_chat
+import chapito.duckduckgo_chat as duckduckgo_chat
+import chapito.gemini_chat as gemini_chat
+import chapito.grok_chat as grok_chat
+import chapito.kimi_chat as kimi_chat
+import chapito.mistral_chat as mistral_chat
+import chapito.qwen_chat as qwen_chat
+from chapito.tools.markdown import CODE_FENCES, MarkdownRules, Selector, html_to_markdown
+
+
+@pytest.mark.parametrize(
+    "chat, html, expected",
+    [
+        (
+            grok_chat,
+            '<div><p>Use it:</p>\n<div class="not-prose"><div class="flex"><span>python</span><button>Copy</button>'
+            "</div><div><code><span>print</span>(<span>sorted</span>(items))</code></div></div>\n"
+            "<p>Done &amp; dusted.</p></div>",
+            "Use it:\n```\nprint(sorted(items))\n```\n\nDone & dusted.",
+        ),
+        (
+            anthropic_chat,
+            "<div><p>Call <code>main()</code> first.</p>\n<pre><div><div>python</div><button>Copy</button><div><code>"
+            "<span>def main():\n</span><span>    return 1 &lt; 2</span></code></div></div></pre></div>",
+            "Call `main()` first.\n```\ndef main():\n    return 1 < 2\n```",
+        ),
+        (
+            mistral_chat,
+            '<div><p>Install it:</p><div><div class="sticky top-0"><span>bash</span><button>Copy</button></div>'
+            "<pre><code>pip install chapito</code></pre></div></div>",
+            "Install it:```\npip install chapito\n```",
+        ),
+        (
+            kimi_chat,
+            '<div><p>Here is the script.</p>\n\n<div class="segment-code"><div><span>python</span></div>'
+            '<div class="segment-code-content"><pre><code>x = 1\n\ny = 2</code></pre></div></div><p>Run it.</p></div>',
+            "Here is the script.\n```\nx = 1\ny = 2\n```\nRun it.",
+        ),
+        (
+            gemini_chat,
+            '<message-content><p>Example:</p><div class="code-block"><div><span>Python</span></div>'
+            '<div class="formatted-code-block-internal-container"><div><pre><code><span>a</span> = <span>1</span>\n'
+            "</code></pre></div></div></div><p>That is all.</p></message-content>",
+            "Example:\n```\na = 1\n```\nThat is all.",
+        ),
+        (
+            qwen_chat,
+            '<div><p>Result:</p><div style="display: none;">thinking...</div><div class="code-cntainer"><div>js</div>'
+            '<div class="cm-content"><div>let a = 1;</div><div>let b = a &gt; 0;</div></div></div></div>',
+            "Result:\n```\nlet a = 1;\nlet b = a > 0;\n```",
+        ),
+        (
+            duckduckgo_chat,
+            '<div heading="GPT-4o mini"><p>Run <code>ls</code>:</p><pre><div>bash</div><code>ls -la\n</code></pre>'
+            '<div><button data-copyairesponse="true"><span>Copy</span></button></div></div>',
+            "Run `ls`:\n\n```\nls -la\n\n```",
+        ),
+    ],
+)
+def test_clean_chat_answer(chat, html: str, expected: str) -> None:
+    assert chat.clean_chat_answer(html) == expected
+
+
+def test_html_to_markdown_keeps_whitespace_of_preformatted_text() -> None:
+    rules = MarkdownRules(wrap={"code": CODE_FENCES})
+
+    markdown = html_to_markdown("<p>a</p>  \n  <pre><code>  \n  </code></pre>", rules)
+
+    # Whitespace-only texts are reduced to a single character, except in <pre>.
+    assert markdown == "a\n```\n  \n  \n```"
+
+
+def test_html_to_markdown_skips_hidden_texts() -> None:
+    html = "<p>a<script>var b = 1 < 2;</script><style>p {}</style><!-- comment -->c<br>d</p>"
+
+    assert html_to_markdown(html, MarkdownRules()) == "acd"
+
+
+def test_html_to_markdown_closes_unclosed_elements() -> None:
+    rules = MarkdownRules(code_block=Selector("div", "code"), code=Selector("code"), wrap={"code": CODE_FENCES})
+
+    assert html_to_markdown('<div class="code"><span>js</span><code>a()', rules) == "```\na()\n```"
@@ -0,0 +1,44 @@
+from chapito.metrics import METRICS, PHASE_SECONDS, Counter, Histogram, current_chatbot, measure_phase
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    histogram = Histogram("test_seconds", "Test durations.", buckets=(0.1, 1))
+    METRICS.remove(histogram)
+    for value in (0.05, 0.5, 0.7, 3):
+        histogram.observe(value, chatbot="grok")
+
+    assert histogram.render().splitlines() == [
+        "# HELP test_seconds Test durations.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{chatbot="grok",le="0.1"} 1',
+        'test_seconds_bucket{chatbot="grok",le="1"} 3',
+        'test_seconds_bucket{chatbot="grok",le="+Inf"} 4',
+        'test_seconds_sum{chatbot="grok"} 4.25',
+        'test_seconds_count{chatbot="grok"} 4',
+    ]
+
+
+def test_counter_escapes_label_values() -> None:
+    counter = Counter("test_total", "Test counter.")
+    METRICS.remove(counter)
+    counter.inc(chatbot='my "bot"')
+    counter.inc(2, chatbot='my "bot"')
+
+    assert counter.render().splitlines()[-1] == 'test_total{chatbot="my \\"bot\\""} 3'
+
+
+def test_measure_phase_is_labelled_by_current_chatbot() -> None:
+    count = PHASE_SECONDS.get_count(chatbot="mistral", phase="test")
+    token = current_chatbot.set("mistral")
+    try:
+
+        @measure_phase("test")
+        def phase() -> None:
+            pass
+
+        phase()
+        phase()
+    finally:
+        current_chatbot.reset(token)
+
+    assert PHASE_SECONDS.get_count(chatbot="mistral", phase="test") == count + 2
@@ -0,0 +1,96 @@
+import pytest
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+
+from chapito import grok_chat
+from chapito.metrics import PHASE_SECONDS, current_chatbot
+from chapito.tools import plan, tools
+from chapito.tools.plan import RUN_PLAN_SCRIPT, InteractionPlan, run_interaction_plan
+from chapito.tools.ratelimit import RateLimitError
+
+PLAN = InteractionPlan(By.TAG_NAME, "textarea", "button.send", "button.voice", submit_index=-1)
+
+
+class FakeDriver:
+    def __init__(self, result: dict):
+        self.result = result
+        self.scripts = []
+        self.script_timeout = None
+
+    def set_script_timeout(self, seconds: float) -> None:
+        self.script_timeout = seconds
+
+    def execute_async_script(self, script: str, *args):
+        self.scripts.append((script, args))
+        return self.result
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch) -> None:
+    monkeypatch.setattr(plan, "interaction_plans", True)
+
+
+def test_plan_sends_the_prompt_and_waits_in_one_script() -> None:
+    driver = FakeDriver({"status": "finished", "notice": None, "durations": {"transfer_prompt": 20, "generation": 900}})
+    token = current_chatbot.set("grok")
+    count = PHASE_SECONDS.get_count(chatbot="grok", phase="generation")
+    try:
+        assert run_interaction_plan(driver, "Hello", PLAN, timeout=120)
+    finally:
+        current_chatbot.reset(token)
+
+    [(script, args)] = driver.scripts
+    assert script == RUN_PLAN_SCRIPT
+    assert args[0]["input_by"] == "tag name" and args[0]["submit_index"] == -1
+    assert args[1:] == ("Hello", 1000, 120000, True)
+    assert driver.script_timeout == 245
+    assert PHASE_SECONDS.get_count(chatbot="grok", phase="generation") == count + 1
+
+
+@pytest.mark.parametrize("status", ["no_input", "not_inserted"])
+def test_plan_stopped_before_sending_falls_back(status: str) -> None:
+    driver = FakeDriver({"status": status, "notice": None, "durations": {}})
+
+    assert not run_interaction_plan(driver, "Hello", PLAN, timeout=120)
+
+
+def test_disabled_plans_and_uploaded_prompts_are_sent_step_by_step(monkeypatch) -> None:
+    driver = FakeDriver({"status": "finished", "notice": None, "durations": {}})
+    monkeypatch.setattr(tools, "upload_threshold", 3)
+    assert not run_interaction_plan(driver, "Hello", PLAN, timeout=120)
+
+    monkeypatch.setattr(tools, "upload_threshold", 0)
+    monkeypatch.setattr(plan, "interaction_plans", False)
+    assert not run_interaction_plan(driver, "Hello", PLAN, timeout=120)
+    assert not driver.scripts
+
+
+@pytest.mark.parametrize(
+    "result, error",
+    [
+        ({"status": "submit_disabled"}, TimeoutException),
+        ({"status": "timeout"}, TimeoutException),
+        ({"status": "rate_limited", "notice": "Too many requests, try again in 2 minutes"}, RateLimitError),
+    ],
+)
+def test_plan_errors_are_the_ones_of_each_step(result: dict, error: type) -> None:
+    driver = FakeDriver({"notice": None, "durations": {}, **result})
+
+    with pytest.raises(error):
+        run_interaction_plan(driver, "Hello", PLAN, timeout=120)
+
+
+def test_adapter_sends_step_by_step_when_the_plan_stops(monkeypatch) -> None:
+    steps = []
+    monkeypatch.setattr(grok_chat, "submit_request", lambda driver, message: steps.append("submit"))
+    monkeypatch.setattr(grok_chat, "wait_for_completion", lambda driver, timeout: steps.append("wait"))
+    monkeypatch.setattr(grok_chat, "read_last_answer", lambda driver: (1, "Answer"))
+    driver = FakeDriver({"status": "no_input", "notice": None, "durations": {}})
+
+    assert grok_chat.send_request_and_get_response(driver, "Hello") == "Answer"
+    assert steps == ["submit", "wait"]
+
+    driver.result = {"status": "finished", "notice": None, "durations": {}}
+    steps.clear()
+    assert grok_chat.send_request_and_get_response(driver, "Hello") == "Answer"
+    assert steps == []
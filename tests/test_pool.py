@@ -0,0 +1,115 @@
+import queue
+
+import pytest
+
+from chapito.config import Config
+from chapito.pool import ChatTabs, DriverPool, get_driver_config
+
+
+def test_checkout_returns_driver_to_pool() -> None:
+    pool = DriverPool(["driver_1", "driver_2"])
+
+    with pool.checkout() as first:
+        assert pool.idle_count == 1
+        with pool.checkout() as second:
+            assert {first, second} == {"driver_1", "driver_2"}
+            assert pool.idle_count == 0
+            with pytest.raises(queue.Empty):
+                with pool.checkout(timeout=0.01):
+                    pass
+    assert pool.idle_count == 2
+
+
+def test_checkout_returns_driver_on_error() -> None:
+    pool = DriverPool(["driver"])
+
+    with pytest.raises(RuntimeError):
+        with pool.checkout():
+            raise RuntimeError("browser crashed")
+    assert pool.idle_count == 1
+
+
+def test_empty_pool_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        DriverPool([])
+
+
+def test_each_driver_gets_its_own_profile() -> None:
+    config = Config.__new__(Config)
+    config.browser_profile_path = "browser_profile"
+
+    assert get_driver_config(config, 0) is config
+    assert get_driver_config(config, 2).browser_profile_path == "browser_profile_2"
+    assert config.browser_profile_path == "browser_profile"
+
+
+def test_each_driver_attaches_to_its_own_browser() -> None:
+    config = Config.__new__(Config)
+    config.debugger_address = "127.0.0.1:9222, 127.0.0.1:9223"
+
+    assert get_driver_config(config, 0).debugger_address == "127.0.0.1:9222"
+    assert get_driver_config(config, 1).debugger_address == "127.0.0.1:9223"
+    # Not enough running browsers: this driver starts its own.
+    assert get_driver_config(config, 2).debugger_address == ""
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, kind: str) -> None:
+        self.driver.handles.append(f"tab_{len(self.driver.handles)}")
+        self.driver.current_window_handle = self.driver.handles[-1]
+
+    def window(self, handle: str) -> None:
+        self.driver.current_window_handle = handle
+
+
+class FakeTabDriver:
+    def __init__(self):
+        self.handles = ["tab_0"]
+        self.current_window_handle = "tab_0"
+        self.switch_to = FakeSwitchTo(self)
+        self.new_chats = []
+
+    def open_new_chat(self, driver) -> None:
+        self.new_chats.append(self.current_window_handle)
+
+
+def test_each_conversation_gets_its_own_tab() -> None:
+    driver = FakeTabDriver()
+    tabs = ChatTabs(driver, driver.open_new_chat, max_tabs=2, history_size=10)
+
+    first = tabs.switch_to("conversation_1")
+    first.history.add("Hi")
+    second = tabs.switch_to("conversation_2")
+
+    assert driver.current_window_handle == "tab_1"
+    assert tabs.switch_to("conversation_1") is first
+    assert driver.current_window_handle == "tab_0"
+    assert "Hi" in first.history
+    assert "Hi" not in second.history
+    assert driver.new_chats == ["tab_1"]
+
+
+def test_least_recently_used_tab_is_recycled() -> None:
+    driver = FakeTabDriver()
+    tabs = ChatTabs(driver, driver.open_new_chat, max_tabs=2, history_size=10)
+    tabs.switch_to("conversation_1").history.add("Hi")
+    tabs.switch_to("conversation_2")
+    tabs.switch_to("conversation_1")
+
+    third = tabs.switch_to("conversation_3")
+
+    assert "conversation_2" not in tabs
+    assert third.handle == "tab_1"
+    assert len(third.history) == 0
+    assert driver.new_chats == ["tab_1", "tab_1"]
+
+
+def test_checkout_prefers_driver_with_conversation_tab() -> None:
+    pool = DriverPool(["driver_1", "driver_2"], max_tabs=2)
+    pool.tabs["driver_2"].switch_to("conversation")
+
+    with pool.checkout("conversation") as driver:
+        assert driver == "driver_2"
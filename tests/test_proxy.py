@@ -0,0 +1,399 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from selenium.common.exceptions import TimeoutException
+
+from chapito import proxy, tracing
+from chapito.backends import Backend
+from chapito.cache import ResponseCache
+from chapito.config import Config
+from chapito.pool import DriverPool
+from chapito.singleflight import InFlightRequests
+from chapito.tools.ratelimit import RateLimitError
+from chapito.tracing import TraceBuffer, span
+from chapito.types import Chatbot
+
+
+def make_config(**overrides) -> Config:
+    config = Config.__new__(Config)
+    config.stream = False
+    config.retry_after = 10
+    config.chatbot = Chatbot.GROK
+    config.history_size = 100
+    config.max_tabs = 1
+    for name, value in overrides.items():
+        setattr(config, name, value)
+    return config
+
+
+@pytest.fixture
+def client():
+    yield TestClient(proxy.app)
+    for backend in proxy.app.state.backends.values():
+        backend.executor.shutdown()
+
+
+def setup_proxy(
+    send_request_and_get_response,
+    drivers=("driver",),
+    max_queue_size=10,
+    send_request_and_stream_response=None,
+    cache=None,
+    traces=None,
+    **config,
+) -> None:
+    proxy.app.state.config = make_config(**config)
+    name = str(proxy.app.state.config.chatbot)
+    driver_pool = DriverPool(list(drivers), max_tabs=config.get("max_tabs", 1))
+    proxy.app.state.backends = {
+        name: Backend(
+            name, driver_pool, send_request_and_get_response, send_request_and_stream_response, max_queue_size
+        )
+    }
+    proxy.app.state.default_backend = name
+    proxy.app.state.cache = cache
+    proxy.app.state.traces = traces
+    proxy.app.state.in_flight = InFlightRequests()
+
+
+def test_chat_completions_returns_answer(client) -> None:
+    setup_proxy(lambda driver, prompt: f"echo: {prompt}")
+
+    response = client.post(
+        "/chat/completions", json={"model": "chapito", "messages": [{"role": "user", "content": "Hi"}]}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["choices"][0]["message"]["content"] == "echo: [user] Hi"
+
+
+def test_chat_completions_rejects_when_browsers_are_busy(client) -> None:
+    release = threading.Event()
+    setup_proxy(lambda driver, prompt: "", max_queue_size=0)
+    proxy.app.state.backends["grok"].executor.submit(release.wait)
+
+    response = client.post(
+        "/chat/completions", json={"model": "chapito", "messages": [{"role": "user", "content": "Hi"}]}
+    )
+    release.set()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "10"
+
+
+def test_chat_completions_streams_answer_parts(client) -> None:
+    setup_proxy(
+        lambda driver, prompt: "",
+        send_request_and_stream_response=lambda driver, prompt: iter(["Hel", "lo"]),
+        stream=True,
+    )
+
+    response = client.post(
+        "/chat/completions", json={"model": "chapito", "messages": [{"role": "user", "content": "Hi"}]}
+    )
+
+    events = [line.removeprefix("data: ") for line in response.text.splitlines() if line]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    assert all(chunk["object"] == "chat.completion.chunk" for chunk in chunks)
+    assert "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks) == "Hello"
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+
+def test_chat_completions_stream_ends_with_error_when_browser_fails(client) -> None:
+    def send_request_and_stream_response(driver, prompt):
+        yield "Hel"
+        raise TimeoutException("Answer not finished after 120 seconds")
+
+    setup_proxy(
+        lambda driver, prompt: "", send_request_and_stream_response=send_request_and_stream_response, stream=True
+    )
+
+    response = client.post(
+        "/chat/completions", json={"model": "chapito", "messages": [{"role": "user", "content": "Hi"}]}
+    )
+
+    events = [line.removeprefix("data: ") for line in response.text.splitlines() if line]
+    assert events[-1] == "[DONE]"
+    events = [json.loads(event) for event in events[:-1]]
+    assert events[-1]["error"]["type"] == "TimeoutException"
+    assert all(choice["finish_reason"] != "stop" for event in events[:-1] for choice in event["choices"])
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_chat_completions_serves_cached_answer(client, stream) -> None:
+    prompts = []
+
+    def send_request_and_get_response(driver, prompt):
+        prompts.append(prompt)
+        return "cached answer"
+
+    setup_proxy(
+        send_request_and_get_response,
+        send_request_and_stream_response=lambda driver, prompt: iter([send_request_and_get_response(driver, prompt)]),
+        cache=ResponseCache(max_size=10, ttl=60),
+        stream=stream,
+    )
+    body = {"model": "chapito", "messages": [{"role": "user", "content": "Hi"}]}
+
+    first = client.post("/chat/completions", json=body)
+    second = client.post("/chat/completions", json=body)
+
+    assert len(prompts) == 1
+    assert "cached answer" in first.text
+    assert "cached answer" in second.text
+
+
+def test_chat_completions_only_sends_new_messages(client) -> None:
+    prompts = []
+    setup_proxy(lambda driver, prompt: prompts.append(prompt) or f"answer {len(prompts)}")
+    messages = [{"role": "user", "content": "Hi"}]
+
+    client.post("/chat/completions", json={"model": "chapito", "messages": messages})
+    messages += [{"role": "assistant", "content": "answer 1"}, {"role": "user", "content": "How are you?"}]
+    client.post("/chat/completions", json={"model": "chapito", "messages": messages})
+
+    assert prompts == ["[user] Hi", "[user] How are you?"]
+
+
+def test_metrics_count_requests_and_timeouts(client) -> None:
+    def send_request_and_get_response(driver, prompt: str) -> str:
+        if prompt.endswith("slow"):
+            raise TimeoutException("Answer not finished")
+        return ""
+
+    setup_proxy(send_request_and_get_response, chatbot=Chatbot.KIMI)
+    timeouts = proxy.TIMEOUTS.get(chatbot="kimi")
+    empty_answers = proxy.EMPTY_ANSWERS.get(chatbot="kimi")
+
+    client.post("/chat/completions", json={"model": "chapito", "messages": [{"role": "user", "content": "Hi"}]})
+    with pytest.raises(TimeoutException):
+        client.post("/chat/completions", json={"model": "chapito", "messages": [{"role": "user", "content": "slow"}]})
+    metrics = client.get("/metrics")
+
+    assert metrics.status_code == 200
+    assert proxy.TIMEOUTS.get(chatbot="kimi") == timeouts + 1
+    assert proxy.EMPTY_ANSWERS.get(chatbot="kimi") == empty_answers + 1
+    assert 'chapito_queue_depth{chatbot="kimi"} 0' in metrics.text
+    assert 'chapito_prompt_characters_total{chatbot="kimi"}' in metrics.text
+
+
+def test_chat_completions_are_traced(client) -> None:
+    def send_request_and_get_response(driver, prompt: str) -> str:
+        with span("selenium.executeScript"):
+            return "Hello"
+
+    traces = TraceBuffer(1)
+    setup_proxy(send_request_and_get_response, traces=traces)
+
+    response = client.post(
+        "/chat/completions", json={"model": "chapito", "messages": [{"role": "user", "content": "Hi"}]}
+    )
+    trace_id = response.headers["X-Trace-Id"]
+    client.post("/chat/completions", json={"model": "chapito", "messages": [{"role": "user", "content": "Bye"}]})
+    last_trace_id = client.get("/debug/traces").json()[0]["trace_id"]
+
+    assert len(traces) == 1
+    assert last_trace_id != trace_id
+    assert client.get(f"/debug/traces/{trace_id}").status_code == 404
+    trace = client.get(f"/debug/traces/{last_trace_id}").json()
+    assert [span["name"] for span in trace["spans"]] == [
+        "build_prompt",
+        "switch_tab",
+        "find_index_from_end",
+        "build_prompt",
+        "selenium.executeScript",
+    ]
+    events = client.get("/debug/traces", params={"format": "chrome"}).json()["traceEvents"]
+    assert {event["name"] for event in events if event["ph"] == "X"} >= {"chat_completions", "selenium.executeScript"}
+
+
+def test_trace_keeps_a_bounded_number_of_spans(monkeypatch) -> None:
+    monkeypatch.setattr(tracing, "MAX_SPANS_PER_TRACE", 3)
+    trace = tracing.Trace("chat_completions")
+    for _ in range(5):
+        trace.add_span("sleep", trace.start, trace.start)
+
+    assert len(trace.spans) == 3
+    assert trace.to_dict()["dropped_spans"] == 2
+
+
+def test_cache_is_saved_by_the_browser_thread(client, monkeypatch) -> None:
+    cache = ResponseCache(max_size=10, ttl=60)
+    saving_threads = []
+    monkeypatch.setattr(cache, "set", lambda key, value: saving_threads.append(threading.current_thread().name))
+    setup_proxy(lambda driver, prompt: "answer", cache=cache)
+
+    client.post("/chat/completions", json={"model": "chapito", "messages": [{"role": "user", "content": "Hi"}]})
+
+    assert len(saving_threads) == 1
+    assert saving_threads[0].startswith("browser")
+
+
+def add_backend(name: str, send_request_and_get_response, send_request_and_stream_response=None) -> Backend:
+    backend = Backend(
+        name, DriverPool([f"{name} driver"]), send_request_and_get_response, send_request_and_stream_response
+    )
+    proxy.app.state.backends[name] = backend
+    return backend
+
+
+def test_chat_completions_are_routed_by_model(client) -> None:
+    setup_proxy(lambda driver, prompt: "from grok")
+    add_backend("mistral", lambda driver, prompt: f"from {driver}")
+
+    def ask(model: str) -> str:
+        response = client.post(
+            "/chat/completions", json={"model": model, "messages": [{"role": "user", "content": "Hi"}]}
+        )
+        return response.json()["choices"][0]["message"]["content"]
+
+    assert ask("mistral") == "from mistral driver"
+    assert ask("Mistral") == "from mistral driver"
+    assert ask("gpt-3.5-turbo") == "from grok"
+    assert [model["name"] for model in client.get("/models").json()] == ["grok", "mistral"]
+
+
+def time_out(driver, prompt: str) -> str:
+    raise TimeoutException("Answer not finished")
+
+
+@pytest.mark.parametrize("send_request_and_get_response", [time_out, lambda driver, prompt: ""])
+def test_failed_request_is_sent_to_another_chatbot(client, send_request_and_get_response) -> None:
+    setup_proxy(send_request_and_get_response, failover=True)
+    add_backend("mistral", lambda driver, prompt: "from mistral")
+    failovers = proxy.FAILOVERS.get(chatbot="grok")
+
+    response = client.post("/chat/completions", json={"model": "grok", "messages": [{"role": "user", "content": "Hi"}]})
+
+    assert response.json()["choices"][0]["message"]["content"] == "from mistral"
+    assert proxy.FAILOVERS.get(chatbot="grok") == failovers + 1
+    assert proxy.app.state.backends["grok"].health.error_rate == 1
+    assert proxy.app.state.backends["mistral"].health.latency is not None
+
+
+def test_answer_of_another_chatbot_is_cached_as_its_own(client) -> None:
+    cache = ResponseCache(max_size=10, ttl=60)
+    setup_proxy(time_out, cache=cache, failover=True)
+    add_backend("mistral", lambda driver, prompt: "from mistral")
+
+    client.post("/chat/completions", json={"model": "grok", "messages": [{"role": "user", "content": "Hi"}]})
+
+    assert cache.get(ResponseCache.make_key("grok", "grok", "[user] Hi")) is None
+    assert cache.get(ResponseCache.make_key("mistral", "grok", "[user] Hi")) == "from mistral"
+
+
+def test_requests_go_to_the_healthiest_chatbot(client) -> None:
+    setup_proxy(lambda driver, prompt: "from grok", failover=True)
+    add_backend("mistral", lambda driver, prompt: "from mistral")
+    proxy.app.state.backends["grok"].health.record_success(30)
+    proxy.app.state.backends["mistral"].health.record_success(5)
+
+    response = client.post(
+        "/chat/completions", json={"model": "gpt-4", "messages": [{"role": "user", "content": "Hi"}]}
+    )
+
+    assert response.json()["choices"][0]["message"]["content"] == "from mistral"
+
+
+def test_stream_fails_over_before_the_first_part(client) -> None:
+    setup_proxy(lambda driver, prompt: "", send_request_and_stream_response=time_out, stream=True, failover=True)
+    add_backend("mistral", lambda driver, prompt: "", lambda driver, prompt: iter(["from ", "mistral"]))
+
+    response = client.post("/chat/completions", json={"model": "grok", "messages": [{"role": "user", "content": "Hi"}]})
+
+    events = [line.removeprefix("data: ") for line in response.text.splitlines() if line]
+    chunks = [json.loads(event) for event in events[:-1]]
+    assert "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks) == "from mistral"
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+
+def test_rate_limited_chatbot_is_paused(client) -> None:
+    calls = []
+
+    def rate_limited(driver, prompt: str) -> str:
+        calls.append(prompt)
+        raise RateLimitError("You've reached your limit. Try again in 2 hours.")
+
+    setup_proxy(rate_limited)
+    request = {"model": "grok", "messages": [{"role": "user", "content": "Hi"}]}
+
+    response = client.post("/chat/completions", json=request)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7200"
+
+    # The chatbot is not sent anything until the end of the announced delay.
+    response = client.post("/chat/completions", json=request)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 7000
+    assert len(calls) == 1
+    assert proxy.app.state.backends["grok"].throttle.requests_per_minute > 0
+
+
+def test_rate_limited_chatbot_fails_over(client) -> None:
+    def rate_limited(driver, prompt: str) -> str:
+        raise RateLimitError("Too many requests")
+
+    setup_proxy(rate_limited, failover=True)
+    add_backend("mistral", lambda driver, prompt: "from mistral")
+    request = {"model": "grok", "messages": [{"role": "user", "content": "Hi"}]}
+
+    for _ in range(2):
+        response = client.post("/chat/completions", json=request)
+        assert response.json()["choices"][0]["message"]["content"] == "from mistral"
+    assert proxy.RATE_LIMITS.get(chatbot="grok") >= 1
+
+
+def read_streamed_answer(response) -> str:
+    events = [line.removeprefix("data: ") for line in response.text.splitlines() if line]
+    return "".join(json.loads(event)["choices"][0]["delta"].get("content", "") for event in events[:-1])
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_identical_requests_share_one_answer(client, stream) -> None:
+    prompts = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def send_request_and_stream_response(driver, prompt: str):
+        prompts.append(prompt)
+        yield "Hel"
+        started.set()
+        release.wait(5)
+        yield "lo"
+
+    def send_request_and_get_response(driver, prompt: str) -> str:
+        return "".join(send_request_and_stream_response(driver, prompt))
+
+    setup_proxy(send_request_and_get_response, send_request_and_stream_response=send_request_and_stream_response)
+    proxy.app.state.config.stream = stream
+    coalesced = proxy.COALESCED_REQUESTS.get(chatbot="grok")
+    request = {"model": "grok", "messages": [{"role": "user", "content": "Summarize this commit"}]}
+
+    # Requests of a started client share one event loop, like the ones of the server.
+    with client, ThreadPoolExecutor(2) as executor:
+        try:
+            first = executor.submit(client.post, "/chat/completions", json=request)
+            assert started.wait(5)
+            # The second request joins after the first part of the answer.
+            second = executor.submit(client.post, "/chat/completions", json=request)
+            deadline = time.monotonic() + 5
+            while proxy.COALESCED_REQUESTS.get(chatbot="grok") == coalesced and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            release.set()
+        responses = [first.result(), second.result()]
+
+    assert len(prompts) == 1
+    if stream:
+        assert [read_streamed_answer(response) for response in responses] == ["Hello", "Hello"]
+    else:
+        assert [response.json()["choices"][0]["message"]["content"] for response in responses] == ["Hello", "Hello"]
+    assert len(proxy.app.state.in_flight) == 0
+    # Once answered, the same prompt is sent again.
+    client.post("/chat/completions", json=request)
+    assert len(prompts) == 2
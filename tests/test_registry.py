@@ -0,0 +1,47 @@
+import subprocess
+import sys
+from importlib.metadata import EntryPoint
+
+import pytest
+
+from chapito import registry
+from chapito.registry import ENTRY_POINT_GROUP, get_adapter_names, is_available, load_adapter
+from chapito.types import Chatbot
+
+
+@pytest.fixture
+def plugin(monkeypatch):
+    entry_point = EntryPoint(name="my_chat", value="chapito.duckduckgo_chat", group=ENTRY_POINT_GROUP)
+    monkeypatch.setattr(registry, "entry_points", lambda group: [entry_point] if group == ENTRY_POINT_GROUP else [])
+
+
+def test_load_adapter_of_each_chatbot() -> None:
+    import chapito.ai_studio_chat as ai_studio_chat
+
+    adapter = load_adapter(Chatbot.AI_STUDIO)
+
+    assert adapter is ai_studio_chat
+    assert adapter.send_request_and_get_response is ai_studio_chat.send_request_and_get_response
+
+
+def test_adapters_are_imported_on_demand() -> None:
+    code = "import sys, main; from chapito.registry import load_adapter; load_adapter('qwen'); " + (
+        "print(sorted(m for m in sys.modules if m.endswith('_chat')))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == "['chapito.qwen_chat']"
+
+
+def test_plugin_adapter(plugin) -> None:
+    import chapito.duckduckgo_chat as duckduckgo_chat
+
+    assert is_available("my_chat")
+    assert "my_chat" in get_adapter_names()
+    assert load_adapter("my_chat") is duckduckgo_chat
+
+
+def test_unknown_chatbot(plugin) -> None:
+    assert not is_available(Chatbot.GITHUB)
+    with pytest.raises(ValueError):
+        load_adapter(Chatbot.GITHUB)
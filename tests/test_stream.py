@@ -0,0 +1,85 @@
+import pytest
+
+from chapito.metrics import PHASE_SECONDS, current_chatbot, measure_phase
+from chapito.tools import stream
+from chapito.tools.stream import stream_answer
+
+
+class FakeDriver:
+    """
+    Each poll shows the next snapshot of the answer being written.
+    `None` snapshots mean the answer bubble doesn't exist yet.
+    """
+
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+        self.polls = -1
+
+    def implicitly_wait(self, seconds: float) -> None:
+        pass
+
+    def is_answer_finished(self, _) -> bool:
+        self.polls += 1
+        return self.polls >= len(self.snapshots) - 2
+
+    def read_last_answer(self, _) -> tuple:
+        if self.snapshots[self.polls] is None:
+            return 1, "previous answer"
+        return 2, self.snapshots[self.polls]
+
+
+@pytest.fixture(autouse=True)
+def no_poll_interval(monkeypatch):
+    monkeypatch.setattr(stream, "POLL_INTERVAL_SECONDS", 0)
+
+
+def test_stream_answer_only_sends_stable_text() -> None:
+    driver = FakeDriver(
+        [
+            "Hel",
+            "Hello wo",
+            "Hello world\n```\nprint(\n```",
+            "Hello world\n```\nprint(1)\n```",
+            "Hello world\n```\nprint(1)\n```",
+        ]
+    )
+
+    deltas = list(stream_answer(driver, 1, driver.read_last_answer, driver.is_answer_finished, 10))
+
+    assert "".join(deltas) == "Hello world\n```\nprint(1)\n```"
+    # The temporary closing fence is never sent.
+    assert "print(\n```" not in "".join(deltas)
+
+
+def test_stream_answer_ignores_previous_answer() -> None:
+    driver = FakeDriver([None, None, "a", "ab", "ab"])
+
+    deltas = list(stream_answer(driver, 1, driver.read_last_answer, driver.is_answer_finished, 10))
+
+    assert "".join(deltas) == "ab"
+
+
+def test_stream_answer_stops_when_finished_without_answer() -> None:
+    driver = FakeDriver([None, None, None])
+
+    deltas = list(stream_answer(driver, 1, driver.read_last_answer, driver.is_answer_finished, 10))
+
+    assert deltas == []
+    assert driver.polls == 1
+
+
+def test_stream_answer_records_each_phase_once() -> None:
+    driver = FakeDriver(["a", "ab", "abc", "abc"])
+
+    @measure_phase("answer_fetch")
+    def read_last_answer(driver_) -> tuple:
+        return driver.read_last_answer(driver_)
+
+    token = current_chatbot.set("stream-test")
+    try:
+        list(stream_answer(driver, 1, read_last_answer, driver.is_answer_finished, 10))
+    finally:
+        current_chatbot.reset(token)
+
+    assert PHASE_SECONDS.get_count(chatbot="stream-test", phase="answer_fetch") == 1
+    assert PHASE_SECONDS.get_count(chatbot="stream-test", phase="generation") == 1
@@ -0,0 +1,50 @@
+import pytest
+
+from chapito import throttle
+from chapito.throttle import RATE_DECREASE_FACTOR, Throttle
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(throttle.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_requests_are_paced_after_the_burst(clock) -> None:
+    pacing = Throttle(requests_per_minute=6, burst=2)
+
+    assert pacing.reserve(max_wait=30) == 0
+    assert pacing.reserve(max_wait=30) == 0
+    assert pacing.reserve(max_wait=30) == 10
+    assert pacing.reserve(max_wait=30) == 20
+    assert pacing.reserve(max_wait=15) is None
+
+    clock[0] += 20
+    assert pacing.reserve(max_wait=30) == 10
+
+
+def test_rate_limit_pauses_and_slows_down_requests(clock) -> None:
+    pacing = Throttle()
+    for _ in range(10):
+        assert pacing.reserve(max_wait=30) == 0
+
+    pacing.record_rate_limit(retry_after=120)
+
+    assert pacing.requests_per_minute == 10 * 60 / throttle.OBSERVATION_SECONDS * RATE_DECREASE_FACTOR
+    assert pacing.reserve(max_wait=30) is None
+    assert pacing.delay() == 120
+    clock[0] += 120
+    assert pacing.reserve(max_wait=30) == 0
+    assert pacing.delay() == pytest.approx(60 / pacing.requests_per_minute)
+
+    pace = pacing.requests_per_minute
+    pacing.record_success()
+    assert pacing.requests_per_minute > pace
+
+
+def test_pace_stays_under_the_configured_one(clock) -> None:
+    pacing = Throttle(requests_per_minute=2)
+    pacing.record_success()
+
+    assert pacing.requests_per_minute == 2
@@ -0,0 +1,247 @@
+import os
+
+import pytest
+import requests
+
+from chapito.config import Config
+from chapito.tools import tools
+from chapito.tools.tools import CLEAR_PROMPT_SCRIPT, COUNT_PROMPT_CHARACTERS_SCRIPT, INSERT_PROMPT_SCRIPT
+from chapito.tools.tools import count_visible_characters, get_last_version, reuse_chat_tab, transfer_prompt
+
+
+class FakeDriver:
+    """Browser where `Input.insertText` loses characters, like some rich text editors do."""
+
+    def __init__(self, cdp_keeps: int, file_inputs=()):
+        self.cdp_keeps = cdp_keeps
+        self.value = ""
+        self.commands = []
+        self.file_inputs = list(file_inputs)
+
+    def implicitly_wait(self, seconds: float) -> None:
+        pass
+
+    def find_elements(self, by, selector) -> list:
+        return self.file_inputs
+
+    def execute_cdp_cmd(self, command: str, params: dict) -> None:
+        self.commands.append(command)
+        self.value += params["text"][: self.cdp_keeps]
+
+    def execute_script(self, script: str, *args):
+        if script == COUNT_PROMPT_CHARACTERS_SCRIPT:
+            return count_visible_characters(self.value)
+        if script == INSERT_PROMPT_SCRIPT:
+            self.commands.append("script")
+            self.value += args[1]
+        if script == CLEAR_PROMPT_SCRIPT:
+            self.value = ""
+
+
+class FakeTextarea:
+    def __init__(self, driver: FakeDriver):
+        self.parent = driver
+
+    def click(self) -> None:
+        pass
+
+    def send_keys(self, *keys) -> None:
+        raise AssertionError("Prompt should not be typed")
+
+
+def test_transfer_prompt_uses_cdp() -> None:
+    driver = FakeDriver(cdp_keeps=1000)
+
+    transfer_prompt("def main():\n\treturn 42", FakeTextarea(driver))
+
+    assert driver.value == "def main():\n\treturn 42"
+    assert driver.commands == ["Input.insertText"]
+
+
+@pytest.mark.parametrize("message", ["Zero\ufeffwidth no-break space", "Information\x1cseparator"])
+def test_transfer_prompt_counts_whitespace_like_the_browser(message: str) -> None:
+    driver = FakeDriver(cdp_keeps=1000)
+
+    transfer_prompt(message, FakeTextarea(driver))
+
+    assert driver.commands == ["Input.insertText"]
+
+
+def test_transfer_prompt_falls_back_when_text_is_truncated() -> None:
+    driver = FakeDriver(cdp_keeps=5)
+
+    transfer_prompt("A long prompt", FakeTextarea(driver))
+
+    assert driver.value == "A long prompt"
+    assert driver.commands == ["Input.insertText", "script"]
+
+
+class FakeFileInput:
+    def __init__(self):
+        self.files = []
+
+    def send_keys(self, path: str) -> None:
+        with open(path, encoding="utf-8") as file:
+            self.files.append(file.read())
+
+
+def test_long_prompt_is_attached_as_a_file(monkeypatch) -> None:
+    monkeypatch.setattr(tools, "upload_threshold", 10)
+    file_input = FakeFileInput()
+    driver = FakeDriver(cdp_keeps=1000, file_inputs=[file_input])
+
+    transfer_prompt("Summarize this repository map", FakeTextarea(driver))
+    path = tools.driver_prompt_files[driver]
+    transfer_prompt("Summarize this other file", FakeTextarea(driver))
+
+    assert file_input.files == ["Summarize this repository map", "Summarize this other file"]
+    assert driver.value.startswith("The whole request is in the attached file chapito_prompt_")
+    assert not os.path.exists(path)
+    tools.remove_prompt_files()
+    assert not tools.driver_prompt_files
+
+
+@pytest.mark.parametrize("file_input_css_selector", [tools.DEFAULT_FILE_INPUT_CSS_SELECTOR, None])
+def test_long_prompt_is_pasted_without_file_input(monkeypatch, file_input_css_selector) -> None:
+    monkeypatch.setattr(tools, "upload_threshold", 10)
+    driver = FakeDriver(cdp_keeps=1000)
+
+    transfer_prompt("Summarize this repository map", FakeTextarea(driver), file_input_css_selector)
+
+    assert driver.value == "Summarize this repository map"
+
+
+class FakeResponse:
+    text = 'version = "9.9.9"'
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+@pytest.fixture
+def version_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(tools, "VERSION_CACHE_PATH", str(tmp_path / "last_version.json"))
+
+
+def test_get_last_version_is_cached(version_cache, monkeypatch) -> None:
+    calls = []
+
+    def get(url: str, timeout: float) -> FakeResponse:
+        calls.append(timeout)
+        return FakeResponse()
+
+    monkeypatch.setattr(requests, "get", get)
+
+    assert get_last_version() == "9.9.9"
+    assert get_last_version() == "9.9.9"
+    assert calls == [tools.VERSION_CHECK_TIMEOUT_SECONDS]
+
+
+def test_get_last_version_caches_failures(version_cache, monkeypatch) -> None:
+    def get(url: str, timeout: float):
+        raise requests.ConnectionError("No network")
+
+    monkeypatch.setattr(requests, "get", get)
+
+    with pytest.raises(requests.ConnectionError):
+        get_last_version()
+    # Not retried before the cache expires.
+    assert get_last_version() is None
+
+
+class FakeTabsSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle: str) -> None:
+        self.driver.current_handle = handle
+
+    def new_window(self, kind: str) -> None:
+        self.driver.current_handle = "new"
+
+
+class FakeBrowser:
+    def __init__(self, tabs: dict):
+        self.tabs = tabs
+        self.window_handles = list(tabs)
+        self.current_handle = self.window_handles[0]
+        self.switch_to = FakeTabsSwitchTo(self)
+
+    @property
+    def current_url(self) -> str:
+        return self.tabs[self.current_handle]
+
+
+def attached_config(address: str) -> Config:
+    config = Config.__new__(Config)
+    config.debugger_address = address
+    return config
+
+
+def test_reuse_chat_tab_of_attached_browser() -> None:
+    driver = FakeBrowser({"mail": "https://mail.example.com/", "chat": "https://grok.com/chat/1"})
+
+    assert reuse_chat_tab(driver, attached_config("127.0.0.1:9222"), "https://grok.com/", lambda driver: True)
+    assert driver.current_handle == "chat"
+
+
+def test_reuse_chat_tab_opens_new_tab_when_chat_is_not_loaded() -> None:
+    driver = FakeBrowser({"mail": "https://mail.example.com/"})
+
+    assert not reuse_chat_tab(driver, attached_config("127.0.0.1:9222"), "https://grok.com/", lambda driver: True)
+    assert driver.current_handle == "new"
+
+
+def test_reuse_chat_tab_without_attached_browser() -> None:
+    driver = FakeBrowser({"chat": "https://grok.com/"})
+
+    assert not reuse_chat_tab(driver, attached_config(""), "https://grok.com/", lambda driver: True)
+    assert driver.current_handle == "chat"
+
+
+def blocking_config(*resource_types: str) -> Config:
+    config = Config.__new__(Config)
+    config.blocked_resources = list(resource_types)
+    return config
+
+
+def test_get_blocked_urls_adds_site_trackers() -> None:
+    blocked_urls = tools.get_blocked_urls(blocking_config("font", "tracker"), ["*stats.example.com*"])
+
+    assert "*.woff2*" in blocked_urls
+    assert "*google-analytics.com*" in blocked_urls
+    assert "*stats.example.com*" in blocked_urls
+    assert "*.png*" not in blocked_urls
+    image_urls = tools.get_blocked_urls(blocking_config("image"), ["*stats.example.com*"])
+    assert image_urls == tools.BLOCKED_RESOURCE_URLS["image"]
+
+
+class FakeCdpBrowser(FakeBrowser):
+    def __init__(self, tabs: dict):
+        super().__init__(tabs)
+        self.commands = []
+
+    def execute_cdp_cmd(self, command: str, params: dict) -> None:
+        self.commands.append((self.current_handle, command, params))
+
+
+def test_open_tab_blocks_urls_in_new_tab(monkeypatch) -> None:
+    monkeypatch.setattr(tools, "apply_stealth", lambda driver: None)
+    driver = FakeCdpBrowser({"chat": "https://grok.com/"})
+    monkeypatch.setitem(tools.driver_blocked_urls, driver, ["*.png*"])
+
+    tools.open_tab(driver)
+
+    assert driver.commands == [
+        ("new", "Network.enable", {}),
+        ("new", "Network.setBlockedURLs", {"urls": ["*.png*"]}),
+    ]
+
+
+def test_open_tab_of_unknown_driver() -> None:
+    driver = FakeCdpBrowser({"chat": "https://grok.com/"})
+
+    tools.open_tab(driver)
+
+    assert driver.current_handle == "new"
+    assert driver.commands == []